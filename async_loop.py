@@ -0,0 +1,202 @@
+"""
+An asyncio variant of the main loop.
+
+Every bridge call blocks the calling thread until Node answers, and pathfinder.goto blocks until the goal is reached.  Here
+those calls run on a small thread pool and are awaited instead, so that:
+  - pathfinding runs as a background task, and is cancelled when a new goal is set or the loop stops
+  - using an item (look, hold, activate) runs in order on a thread of its own, so the pass doesn't wait for it
+  - the refreshes that are due for a tick (inventory, health, flag state, players) and my own position are read concurrently
+  - the loop waits for the next tick from the TickScheduler with asyncio.sleep instead of blocking
+
+Set RG_MAIN_LOOP=async to use this loop from start.py.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from regression_games import RGBot
+from errors import ErrorHandler
+from records import point_from_vec3
+from scheduler import TickScheduler
+from snapshot import TickSnapshot
+from world_state import WorldState
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBridge:
+    """
+    Runs blocking bridge calls on a thread pool so that they can be awaited
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='rg-bridge')
+
+    async def call(self, fn: Callable, *args, **kwargs):
+        # in a copy of the caller's context, so that the calls of a pass are timed as part of it, see CallStats.begin_pass
+        context = contextvars.copy_context()
+        return await asyncio.get_event_loop().run_in_executor(self.executor, context.run, functools.partial(fn, *args, **kwargs))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class ActionQueue:
+    """
+    Runs actions that take several blocking bridge calls, like using a potion, on a thread of their own, one at a time
+    in the order they were queued.  Installed as the EquipmentManager's background while the loop runs.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rg-actions')
+        self.errors = ErrorHandler('equipment action')
+
+    def submit(self, action: Callable[[], None]) -> Future:
+        return self.executor.submit(self._run, action)
+
+    def _run(self, action: Callable[[], None]):
+        try:
+            action()
+        except Exception as exc:
+            # the next action is a new attempt, so there is nothing to back off from
+            self.errors.handle(exc)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class BackgroundPathfinder:
+    """
+    Runs pathfinder.goto as a background task.  Installed as the MovementManager's background_goto while the loop runs,
+    so move_toward_position returns as soon as the goal is set.
+    """
+
+    def __init__(self, bridge: AsyncBridge, loop: asyncio.AbstractEventLoop):
+        self.bridge = bridge
+        self.loop = loop
+        self.task: Optional[asyncio.Task] = None
+        self.errors = ErrorHandler('pathfinding')
+
+    def goto(self, bot: RGBot, goal):
+        # called from a bridge thread while the strategies run, so hand the goal over to the event loop.  The task
+        # runs in a new context, so that the goto isn't timed as part of the pass that started it
+        contextvars.Context().run(asyncio.run_coroutine_threadsafe, self._start(bot, goal), self.loop)
+
+    async def _start(self, bot: RGBot, goal):
+        # setting the new goal rejects the previous goto with GoalChanged, which ends its task
+        self.task = asyncio.ensure_future(self._goto(bot, goal))
+
+    async def _goto(self, bot: RGBot, goal):
+        # the MovementManager hears that the goal was reached from the goal_reached event
+        try:
+            await self.bridge.call(lambda: bot.mineflayer().pathfinder.goto(goal))
+        except Exception as exc:
+            # a new goal interrupting this one is the usual way for it to end
+            self.errors.handle(exc)
+
+    async def stop(self, bot: RGBot):
+        """
+        Stop any pathfinding in progress and wait for its task to end
+        """
+        task = self.task
+        if task and not task.done():
+            try:
+                await self.bridge.call(lambda: bot.mineflayer().pathfinder.stop())
+            except Exception:
+                pass
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+async def capture_snapshot_async(world: WorldState, bridge: AsyncBridge) -> Optional[TickSnapshot]:
+    """
+    The asyncio version of snapshot.capture_snapshot.  My position and each stage of due refreshes are read concurrently.
+    """
+    position = asyncio.ensure_future(bridge.call(lambda: point_from_vec3(world.bot.position())))
+    for stage in world.begin_tick():
+        await asyncio.gather(*[bridge.call(refresh) for refresh in stage])
+    position = await position
+    if not world.match_info:
+        return None
+    return TickSnapshot(world, position)
+
+
+class AsyncMainLoop:
+    """
+    Runs main loop passes until is_active returns False.  The strategies themselves are still plain functions,
+    each pass runs them on a bridge thread.
+    """
+
+    def __init__(self, bot: RGBot, world_state: WorldState, scheduler: TickScheduler, is_active: Callable[[], bool],
+                 max_workers: int = 4):
+        self.bot = bot
+        self.world_state = world_state
+        self.scheduler = scheduler
+        self.is_active = is_active
+        self.max_workers = max_workers
+
+    def start(self, after: Optional[threading.Thread] = None) -> threading.Thread:
+        """
+        Run the loop on a new thread, so that the event handler that starts it can return.
+        If after is given, the loop waits for that thread (the previous loop) to end first.
+        """
+        def run():
+            if after:
+                after.join()
+            asyncio.run(self.run())
+
+        thread = threading.Thread(target=run, name='rg-main-loop')
+        thread.start()
+        return thread
+
+    async def run(self):
+        from start import take_action
+
+        bridge = AsyncBridge(self.max_workers)
+        pathfinder = BackgroundPathfinder(bridge, asyncio.get_event_loop())
+        movement = self.world_state.movement
+        movement.background_goto = pathfinder.goto
+        actions = ActionQueue()
+        equipment = self.world_state.equipment
+        equipment.background = actions.submit
+        errors = ErrorHandler('main loop pass')
+        self.scheduler.reset()
+        try:
+            while self.is_active():
+                # always wait for the next tick first to make sure we don't execute too frequently and waste CPU
+                delay = self.scheduler.next_delay()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.scheduler.begin_pass()
+
+                try:
+                    snapshot = await capture_snapshot_async(self.world_state, bridge)
+                    if not snapshot:
+                        logger.info('Match info not available yet, waiting')
+                        continue
+                    await bridge.call(take_action, snapshot)
+                    errors.succeeded()
+                except Exception as exc:
+                    # pathfinding interruptions carry straight on, other errors are logged and backed off from
+                    delay = errors.handle(exc)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+        finally:
+            if movement.background_goto == pathfinder.goto:
+                movement.background_goto = None
+            if equipment.background == actions.submit:
+                equipment.background = None
+            await pathfinder.stop(self.bot)
+            actions.close()
+            bridge.close()
+            logger.info('[Scheduler] %s', self.scheduler.report())
+            logger.info('[Movement] %s', movement.report())
+            logger.info('[Equipment] %s', equipment.report())
+            logger.info('[Errors] %s', errors.report())
@@ -0,0 +1,181 @@
+"""
+Decision latency benchmarks for the strategy chain, run against the simulator.
+
+Each strategy in strategy.STRATEGIES, a full world state resync, the snapshot capture and a full main loop pass are driven
+through the same set of generated game states.  The report has p50/p95/p99 latency and the number of bridge calls for each of them, and is
+written as JSON so it can be compared across commits:
+
+    python benchmark.py --states 500 --output before.json
+    ... make changes ...
+    python benchmark.py --states 500 --baseline before.json --tolerance 0.2
+
+The exit code is 1 if a threshold is exceeded, or if anything regressed by more than the tolerance against the baseline.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+os.environ['RG_BACKEND'] = 'simulator'
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+# the metrics compared against a baseline, and the absolute difference below which a change is just noise
+REGRESSION_METRICS = {'p95_ms': 0.05, 'bridge_calls_mean': 0.5}
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return 0
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(timings_ms: List[float], bridge_calls: List[int]) -> dict:
+    timings_ms = sorted(timings_ms)
+    return {
+        'samples': len(timings_ms),
+        'mean_ms': round(sum(timings_ms) / len(timings_ms), 4) if timings_ms else 0,
+        'p50_ms': round(percentile(timings_ms, 50), 4),
+        'p95_ms': round(percentile(timings_ms, 95), 4),
+        'p99_ms': round(percentile(timings_ms, 99), 4),
+        'bridge_calls_mean': round(sum(bridge_calls) / len(bridge_calls), 2) if bridge_calls else 0,
+        'bridge_calls_max': max(bridge_calls) if bridge_calls else 0,
+    }
+
+
+def run_benchmarks(states: int, seed: int, opponents: int, teammates: int) -> dict:
+    # like the output below, the strategies' log messages are not part of the report.  Set RG_LOG_LEVEL to measure them
+    os.environ.setdefault('RG_LOG_LEVEL', 'WARNING')
+    import simulator
+    from regression_games import RGCTFUtils
+    from snapshot import capture_snapshot
+    from strategy import STRATEGIES
+    from start import main_loop_pass
+    from world_state import WorldState
+
+    sim_world = simulator.create_world(opponents=opponents, teammates=teammates, speed=0, blocking_goto=False, seed=seed)
+    bot = sim_world.bot
+    world_state = WorldState(bot, RGCTFUtils(bot))
+    bridge = simulator.bridge
+
+    def generate_state(state_seed: int):
+        # the generated states don't come with events, so the world state has to re-read everything
+        sim_world.randomize(random.Random(state_seed))
+        world_state.resync()
+
+    def measure(results: Dict[str, tuple], name: str, fn: Callable):
+        timings, calls = results.setdefault(name, ([], []))
+        bridge.reset()
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+        calls.append(bridge.calls)
+
+    results: Dict[str, tuple] = {}
+    # anything the strategies print is not part of the report either
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(states):
+            state_seed = seed * 1000003 + i
+
+            sim_world.randomize(random.Random(state_seed))
+            measure(results, 'world_state_resync', world_state.resync)
+
+            generate_state(state_seed)
+            measure(results, 'capture_snapshot', lambda: capture_snapshot(world_state))
+
+            for strategy in STRATEGIES:
+                # every strategy sees exactly the same world
+                generate_state(state_seed)
+                snapshot = capture_snapshot(world_state)
+                measure(results, strategy.__name__,
+                        lambda: strategy(snapshot, snapshot.rg_ctf_utils, snapshot.opponents, snapshot.teammates))
+
+            generate_state(state_seed)
+            measure(results, 'main_loop_pass', lambda: main_loop_pass(world_state))
+
+    return {name: summarize(timings, calls) for name, (timings, calls) in results.items()}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def check_report(report: dict, max_p99_ms: float, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Returns a description of every threshold that the report exceeds
+    """
+    failures = []
+    results = report['results']
+    if max_p99_ms is not None and results['main_loop_pass']['p99_ms'] > max_p99_ms:
+        failures.append(f"main_loop_pass p99 {results['main_loop_pass']['p99_ms']}ms > {max_p99_ms}ms")
+    if baseline:
+        for name, before in baseline['results'].items():
+            after = results.get(name)
+            if not after:
+                continue
+            for metric, noise in REGRESSION_METRICS.items():
+                if after[metric] > before[metric] * (1 + tolerance) and after[metric] - before[metric] > noise:
+                    failures.append(f'{name} {metric} {before[metric]} -> {after[metric]}')
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark strategy decision latency against the simulator')
+    parser.add_argument('--states', type=int, default=200, help='number of generated game states')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--opponents', type=int, default=5)
+    parser.add_argument('--teammates', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=0, help='simulated latency per bridge round trip')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('--baseline', help='a previous JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression against the baseline, 0.2 = 20%%')
+    parser.add_argument('--max-p99-ms', type=float, default=None, help='fail if a main loop pass p99 is slower than this')
+    args = parser.parse_args(argv)
+
+    import simulator
+    simulator.bridge.latency = args.latency_ms / 1000
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'states': args.states,
+        'seed': args.seed,
+        'opponents': args.opponents,
+        'teammates': args.teammates,
+        'latency_ms': args.latency_ms,
+        'results': run_benchmarks(args.states, args.seed, args.opponents, args.teammates),
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check_report(report, args.max_p99_ms, baseline, args.tolerance)
+    report['failures'] = failures
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    for failure in failures:
+        print(f'[Benchmark] FAILED: {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,323 @@
+"""
+A team blackboard in shared memory, for sharing what each bot knows with the other bots on the team running on the same
+machine.  This replaces in-game whispers, which are slow, rate limited, and cost a server round trip.
+
+Each bot owns one fixed size slot in a multiprocessing.shared_memory segment named after its team and its match, and
+publishes its position, role, flag sighting and the opponents it can see there once per tick.  Every slot is guarded by
+a sequence lock: the owner makes the sequence number odd while it writes and even again when it is done, and readers
+retry if the number was odd or changed while they copied the slot.  So readers never take a lock, and never see a half
+written slot.  Writing the header and claiming a slot do take a lock (flock on the segment), since two bots starting
+together would otherwise both claim the same slot.
+
+It is off unless RG_BLACKBOARD=1.  The segment name is scoped to the match by the usernames of everyone in it, and to
+RG_BLACKBOARD_SCOPE (like the server's address) when that is set, so bots in other matches on the same machine don't
+share it.  The segment is deleted when the match ends.
+"""
+import contextlib
+import logging
+import os
+import struct
+import time
+import zlib
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+try:
+    import fcntl
+except ImportError:
+    # not on Windows, where slots are claimed without a lock
+    fcntl = None
+
+from records import Point, EntitySnapshot
+
+if TYPE_CHECKING:
+    from snapshot import TickSnapshot
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'RGBB'
+VERSION = 1
+MAX_SLOTS = 8
+MAX_OPPONENTS = 8
+READ_RETRIES = 5
+
+HEADER = struct.Struct('<4sHH')
+# the header of a segment that its creator hasn't written yet
+EMPTY_HEADER = (bytes(4), 0, 0)
+SEQUENCE = struct.Struct('<I')
+# timestamp, tick, username, team, role, x, y, z, health, has_flag, flag_seen, flag x, y, z, opponent count
+SLOT_BODY = struct.Struct('<dI16s16s24sffff??fffB')
+# username, x, y, z, health, has_flag
+OPPONENT = struct.Struct('<16sffff?')
+SLOT_SIZE = SEQUENCE.size + SLOT_BODY.size + MAX_OPPONENTS * OPPONENT.size
+SEGMENT_SIZE = HEADER.size + MAX_SLOTS * SLOT_SIZE
+
+
+def _encode(text: Optional[str], size: int) -> bytes:
+    return (text or '').encode('utf-8')[:size]
+
+
+def _decode(raw: bytes) -> str:
+    return raw.rstrip(b'\0').decode('utf-8', 'replace')
+
+
+class TeammateIntel:
+    """
+    What a teammate published on the blackboard.  The opponents are EntitySnapshots without an entity, since they were
+    seen by another bot: use them for positions, not for RGBot.attackEntity.
+    """
+    __slots__ = ('username', 'team', 'role', 'tick', 'timestamp', 'position', 'health', 'has_flag', 'flag_location', 'opponents', 'opponent_flag_carrier')
+
+    def __init__(self, username: str, team: str, role: str, tick: int, timestamp: float, position: Point, health: float,
+                 has_flag: bool, flag_location: Optional[Point], opponents: List[EntitySnapshot], opponent_flag_carrier: Optional[str]):
+        self.username = username
+        self.team = team
+        self.role = role
+        self.tick = tick
+        self.timestamp = timestamp
+        self.position = position
+        self.health = health
+        self.has_flag = has_flag
+        self.flag_location = flag_location
+        self.opponents = opponents
+        self.opponent_flag_carrier = opponent_flag_carrier
+
+    def __repr__(self):
+        return f'TeammateIntel({self.username!r}, {self.role!r}, {self.position!r})'
+
+
+@contextlib.contextmanager
+def _locked(memory: shared_memory.SharedMemory):
+    # an exclusive lock on the segment, shared by every process that has it open
+    fd = getattr(memory, '_fd', -1)
+    if fcntl is None or fd < 0:
+        yield
+        return
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class TeamBlackboard:
+    """
+    This bot's view of its team's blackboard.  The segment is created by whichever bot on the team gets there first,
+    and is only attached once the team is known.  If shared memory is not available, publishing and reading do nothing.
+    """
+
+    def __init__(self, name: str = None, max_age: float = 1.0, scope: str = None):
+        """
+        Args:
+            name: The prefix of the segment name, the team and match are added to it.  Defaults to RG_BLACKBOARD_NAME or rg_blackboard
+            max_age: Entries older than this many seconds are ignored.  Defaults to 1 second
+            scope: Added to the segment name, to tell apart matches with the same players, like the server's address.
+                Defaults to RG_BLACKBOARD_SCOPE or nothing
+        """
+        self.name = name or os.environ.get('RG_BLACKBOARD_NAME', 'rg_blackboard')
+        self.scope = scope if scope is not None else os.environ.get('RG_BLACKBOARD_SCOPE', '')
+        self.max_age = max_age
+        self.segment: Optional[str] = None
+        self.memory: Optional[shared_memory.SharedMemory] = None
+        self.slot: Optional[int] = None
+        self.available = True
+        # whether the match is over, so that a pass that is still running doesn't create the segment again
+        self.ended = False
+        # the team and match info that the segment name was last worked out for, and that name
+        self._named_for: tuple = (None, None)
+        self._name: Optional[str] = None
+
+    def segment_name(self, team: str, match_info: Optional[dict]) -> str:
+        """
+        The name of the segment for a team in a match
+        """
+        players = sorted(p['username'] for p in match_info.get('players', [])) if match_info else []
+        digest = zlib.crc32('\0'.join([self.scope] + players).encode('utf-8'))
+        return f'{self.name}_{team}_{digest:08x}'
+
+    def _attach(self, team: str, match_info: Optional[dict]) -> bool:
+        # the match info is only replaced when it is re-read, so most ticks reuse the name
+        named_team, named_match_info = self._named_for
+        if team != named_team or match_info is not named_match_info:
+            self._named_for = (team, match_info)
+            self._name = self.segment_name(team, match_info)
+        name = self._name
+        if self.segment == name and self.memory:
+            return True
+        if not self.available or self.ended:
+            return False
+        self.close()
+        try:
+            try:
+                memory = shared_memory.SharedMemory(name, create=True, size=SEGMENT_SIZE)
+            except FileExistsError:
+                memory = shared_memory.SharedMemory(name)
+            # before Python 3.13, opening a segment registers it to be deleted when this process exits, which would take
+            # it away from the rest of the team.  It is deleted when the match ends instead, see unlink
+            resource_tracker.unregister(memory._name, 'shared_memory')
+        except ValueError:
+            # the bot that is creating it hasn't sized it yet, try again next tick
+            return False
+        except OSError as exc:
+            logger.warning('[Blackboard] Shared memory is not available, not sharing intel with the team: %s', exc)
+            self.available = False
+            return False
+        if memory.size >= SEGMENT_SIZE and HEADER.unpack_from(memory.buf, 0) == EMPTY_HEADER:
+            # whichever bot gets here first writes the header, including the bot that created the segment
+            with _locked(memory):
+                if HEADER.unpack_from(memory.buf, 0) == EMPTY_HEADER:
+                    HEADER.pack_into(memory.buf, 0, MAGIC, VERSION, MAX_SLOTS)
+        if memory.size < SEGMENT_SIZE or HEADER.unpack_from(memory.buf, 0) != (MAGIC, VERSION, MAX_SLOTS):
+            logger.warning('[Blackboard] %s has an unexpected layout, not sharing intel with the team', name)
+            memory.close()
+            self.available = False
+            return False
+        self.memory = memory
+        self.segment = name
+        self.slot = None
+        return True
+
+    def _slot_offset(self, slot: int) -> int:
+        return HEADER.size + slot * SLOT_SIZE
+
+    def _claim_slot(self, username: str, team: str) -> Optional[int]:
+        """
+        My slot: the one with my name on it, or else the first one that is empty or stale, which gets my name put on it.
+        This is done under the segment lock, so two bots never claim the same slot.
+        """
+        buf = self.memory.buf
+        with _locked(self.memory):
+            now = time.time()
+            free = None
+            for slot in range(MAX_SLOTS):
+                offset = self._slot_offset(slot) + SEQUENCE.size
+                timestamp, _, name = SLOT_BODY.unpack_from(buf, offset)[:3]
+                if _decode(name) == username:
+                    return slot
+                if free is None and (not name.strip(b'\0') or now - timestamp > self.max_age * 10):
+                    free = slot
+            if free is not None:
+                self._write_slot(free, now, 0, username, team, None, Point(0, 0, 0), 0, False, None, [], None)
+            return free
+
+    def _write_slot(self, slot: int, timestamp: float, tick: int, username: str, team: str, role: Optional[str],
+                    position: Point, health: float, has_flag: bool, flag: Optional[Point], opponents: List[EntitySnapshot],
+                    flag_carrier: Optional[str]):
+        buf = self.memory.buf
+        offset = self._slot_offset(slot)
+        sequence = SEQUENCE.unpack_from(buf, offset)[0]
+        SEQUENCE.pack_into(buf, offset, ((sequence + 1) | 1) & 0xFFFFFFFF)
+        SLOT_BODY.pack_into(buf, offset + SEQUENCE.size, timestamp, tick, _encode(username, 16), _encode(team, 16),
+                            _encode(role, 24), position.x, position.y, position.z, health, has_flag, flag is not None,
+                            flag.x if flag else 0, flag.y if flag else 0, flag.z if flag else 0, len(opponents))
+        opponent_offset = offset + SEQUENCE.size + SLOT_BODY.size
+        for i, opponent in enumerate(opponents):
+            OPPONENT.pack_into(buf, opponent_offset + i * OPPONENT.size, _encode(opponent.name, 16), opponent.position.x,
+                               opponent.position.y, opponent.position.z, opponent.health or 0, flag_carrier == opponent.name)
+        SEQUENCE.pack_into(buf, offset, ((sequence | 1) + 1) & 0xFFFFFFFF)
+
+    def publish(self, snapshot: 'TickSnapshot', role: Optional[str]):
+        """
+        Publish what I know this tick to my slot
+        """
+        if not snapshot.my_team_name or not self._attach(snapshot.my_team_name, snapshot.match_info):
+            return
+        world = snapshot.world
+        buf = self.memory.buf
+        if self.slot is not None:
+            # another bot can take over a slot that looked stale, in which case find a new one
+            _, _, name = SLOT_BODY.unpack_from(buf, self._slot_offset(self.slot) + SEQUENCE.size)[:3]
+            if _decode(name) != snapshot.username:
+                self.slot = None
+        if self.slot is None:
+            self.slot = self._claim_slot(snapshot.username, snapshot.my_team_name)
+            if self.slot is None:
+                return
+
+        # every opponent I can see, nearest first
+        opponents = [p for name, p in world.players.items() if name in world.opponent_names]
+        opponents.sort(key=lambda p: p.position.distanceSquared(snapshot.position))
+        self._write_slot(self.slot, time.time(), world.tick, snapshot.username, snapshot.my_team_name, role,
+                         snapshot.position, snapshot.health or 0, snapshot.has_flag, snapshot.flag_location,
+                         opponents[:MAX_OPPONENTS], world.flag_carrier)
+
+    def _read_slot(self, slot: int) -> Optional[bytes]:
+        buf = self.memory.buf
+        offset = self._slot_offset(slot)
+        for _ in range(READ_RETRIES):
+            before = SEQUENCE.unpack_from(buf, offset)[0]
+            if before & 1:
+                continue
+            data = bytes(buf[offset + SEQUENCE.size:offset + SLOT_SIZE])
+            if SEQUENCE.unpack_from(buf, offset)[0] == before:
+                return data
+        return None
+
+    def read_teammates(self, username: str, team: Optional[str], match_info: Optional[dict] = None) -> List[TeammateIntel]:
+        """
+        The latest intel from every other bot on my team in this match
+        """
+        if not team or not self._attach(team, match_info):
+            return []
+        now = time.time()
+        teammates = []
+        for slot in range(MAX_SLOTS):
+            data = self._read_slot(slot)
+            if data is None:
+                continue
+            (timestamp, tick, name, slot_team, role, x, y, z, health, has_flag, flag_seen,
+             flag_x, flag_y, flag_z, opponent_count) = SLOT_BODY.unpack_from(data, 0)
+            name = _decode(name)
+            if not name or name == username or now - timestamp > self.max_age or _decode(slot_team) != team:
+                continue
+            opponents = []
+            carrier = None
+            for i in range(min(opponent_count, MAX_OPPONENTS)):
+                opponent_name, ox, oy, oz, opponent_health, opponent_has_flag = OPPONENT.unpack_from(data, SLOT_BODY.size + i * OPPONENT.size)
+                opponent_name = _decode(opponent_name)
+                opponents.append(EntitySnapshot(None, opponent_name, Point(ox, oy, oz), opponent_health))
+                if opponent_has_flag:
+                    carrier = opponent_name
+            teammates.append(TeammateIntel(name, team, _decode(role), tick, timestamp, Point(x, y, z), health, has_flag,
+                                           Point(flag_x, flag_y, flag_z) if flag_seen else None, opponents, carrier))
+        return teammates
+
+    def close(self):
+        if self.memory:
+            self.memory.close()
+        self.memory = None
+        self.segment = None
+        self.slot = None
+
+    def start_match(self):
+        self.ended = False
+
+    def unlink(self):
+        """
+        Delete the segment, when the match ends.  Only its name is removed, so a pass that is still using it can finish.
+        After start_match, the next publish or read closes it and creates or attaches a new one.  Safe to call from the
+        event thread.
+        """
+        self.ended = True
+        memory = self.memory
+        if memory:
+            # unregistered in _attach, SharedMemory.unlink expects it to be registered
+            resource_tracker.register(memory._name, 'shared_memory')
+            try:
+                memory.unlink()
+            except FileNotFoundError:
+                # a teammate deleted it first
+                resource_tracker.unregister(memory._name, 'shared_memory')
+        self.segment = None
+
+
+def remote_opponents(teammates: List[TeammateIntel], known: Dict[str, EntitySnapshot]) -> List[EntitySnapshot]:
+    """
+    The opponents that my teammates can see and that I can't, from the most recent sighting of each
+    """
+    sightings: Dict[str, tuple] = {}
+    for teammate in teammates:
+        for opponent in teammate.opponents:
+            if opponent.name not in known and (opponent.name not in sightings or sightings[opponent.name][0] < teammate.timestamp):
+                sightings[opponent.name] = (teammate.timestamp, opponent)
+    return [opponent for _, opponent in sightings.values()]
@@ -0,0 +1,89 @@
+"""
+A cache of the blocks in the regions of the arena that the strategies watch, like the bridge blockade spots.
+
+Each watched position is read with blockAt the first time it is asked about, and then kept up to date by the
+blockUpdate:(x, y, z) event that mineflayer emits for that position, so looking a block up costs nothing unless the
+world actually changed.  Only watched positions are subscribed to, so block changes elsewhere never cross the bridge.
+"""
+import math
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from regression_games import RGBot, RGEventHandler
+from records import Point
+from utilities import to_vec3
+
+AIR = 0
+
+
+def _block_position(position) -> Point:
+    return Point(math.floor(position.x), math.floor(position.y), math.floor(position.z))
+
+
+class BlockCache:
+    """
+    The block types of named regions of watched positions
+    """
+
+    def __init__(self, bot: RGBot):
+        self.bot = bot
+        # region name -> the positions in it, in the order they were given
+        self.regions: Dict[str, List[Point]] = {}
+        # block position -> block type, for every watched position that has been read.  Missing means not read yet.
+        self.types: Dict[Point, int] = {}
+        self._subscribed = set()
+
+        @RGEventHandler(bot, 'spawn')
+        def spawn(self_, *args):
+            # the chunks around me were loaded again, and may have changed while I was away
+            self.invalidate()
+
+    def watch(self, name: str, positions: Iterable[Point]):
+        """
+        Watch a region, like a choke point or a tunnel entrance.  Watching a region that is already watched does nothing.
+        """
+        if name in self.regions:
+            return
+        region = [_block_position(p) for p in positions]
+        self.regions[name] = region
+        for position in region:
+            if position not in self._subscribed:
+                self._subscribed.add(position)
+                self._subscribe(position)
+
+    def _subscribe(self, position: Point):
+        # mineflayer names the event after the position's Vec3.toString()
+        @RGEventHandler(self.bot, f'blockUpdate:({position.x}, {position.y}, {position.z})')
+        def block_update(self_, old_block, new_block, *args):
+            if new_block:
+                self.types[position] = new_block.type
+            else:
+                self.types.pop(position, None)
+
+    def invalidate(self):
+        """
+        Forget every block, so that each one is read again the next time it is asked about
+        """
+        self.types.clear()
+
+    def block_type(self, position) -> Optional[int]:
+        """
+        The type of the block at a position, or None if its chunk isn't loaded.  Positions that aren't watched are read
+        from the bot every time.
+        """
+        position = _block_position(position)
+        block_type = self.types.get(position)
+        if block_type is None:
+            block = self.bot.mineflayer().blockAt(to_vec3(position))
+            if not block:
+                return None
+            block_type = block.type
+            if position in self._subscribed:
+                self.types[position] = block_type
+        return block_type
+
+    def air(self, name: str) -> Iterator[Point]:
+        """
+        The positions in a watched region that are air (or not loaded), in the order they were given.  Positions are
+        only looked up as they are iterated, so stopping at the first one you need reads no more than that.
+        """
+        return (p for p in self.regions[name] if self.block_type(p) in (None, AIR))
@@ -0,0 +1,183 @@
+"""
+Logging for the bot.
+
+Each module logs to its own logger (logging.getLogger(__name__)) with %-style arguments, so a message that is below its
+logger's level costs a level check and nothing else.  Messages that do pass are put in a bounded ring buffer as they are,
+and a background thread formats and writes them, so the main loop never waits on stdout.  Repeats of the same message
+(with the same arguments) within a second are dropped and counted, so that lines like "Not changing movement target"
+don't flood the output.
+
+Pass plain Python values (like Points and EntitySnapshots) as arguments, not JS objects.  Debug and info messages are
+formatted when they are logged, to check for repeats, but warnings and errors are formatted later on the background
+thread.
+
+Environment variables (all optional):
+    RG_LOG_LEVEL: the level for all of our modules.  Defaults to INFO
+    RG_LOG_LEVELS: levels for individual modules, like strategy=DEBUG,utilities=WARNING
+    RG_LOG_BUFFER: how many messages the ring buffer holds before dropping the oldest.  Defaults to 10000
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+
+class RingBuffer:
+    """
+    A bounded queue for the QueueHandler / QueueListener pair.  When it is full, the oldest record is dropped
+    instead of blocking the main loop, and the drops are reported in the log.
+    """
+
+    def __init__(self, size: int):
+        self.records = deque(maxlen=size)
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._ready = threading.Condition(threading.Lock())
+
+    def put_nowait(self, record):
+        with self._ready:
+            if len(self.records) == self.records.maxlen:
+                self.dropped += 1
+            self.records.append(record)
+            self._ready.notify()
+
+    put = put_nowait
+
+    def get(self, block: bool = True, timeout: Optional[float] = None):
+        with self._ready:
+            if not self._ready.wait_for(lambda: self.records, timeout if block else 0):
+                raise queue.Empty
+            if self.dropped != self._reported_dropped:
+                count = self.dropped - self._reported_dropped
+                self._reported_dropped = self.dropped
+                return logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': 'Dropped %d log messages because the log buffer was full', 'args': (count,)})
+            return self.records.popleft()
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records in the queue without formatting them, the listener thread does that
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets the first of a repeated message through, then drops the same message (the same logger and formatted message)
+    for interval seconds.  The next one after that says how many were dropped.  Warnings and errors are never dropped.
+    """
+
+    def __init__(self, interval: float = 1.0, prune_every: float = 10.0):
+        """
+        Args:
+            interval: Seconds to drop repeats of a message for
+            prune_every: Seconds between forgetting the messages that haven't been repeated in the last interval
+        """
+        super().__init__()
+        self.interval = interval
+        self.prune_every = prune_every
+        # (logger name, message) -> [time it was last let through, how many were dropped since]
+        self.seen: Dict[tuple, list] = {}
+        self._next_prune = time.monotonic() + prune_every
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        # format it once here, so that the background thread doesn't format it again
+        try:
+            message = record.getMessage()
+        except Exception:
+            # let the handler report the bad arguments
+            return True
+        record.msg = message
+        record.args = None
+        key = (record.name, message)
+        now = time.monotonic()
+        if now >= self._next_prune:
+            self._prune(now)
+        entry = self.seen.get(key)
+        if entry is None:
+            self.seen[key] = [now, 0]
+            return True
+        if now - entry[0] < self.interval:
+            entry[1] += 1
+            return False
+        if entry[1]:
+            record.msg = f'{message} (and {entry[1]} more like this)'
+        entry[0] = now
+        entry[1] = 0
+        return True
+
+    def _prune(self, now: float):
+        # messages with arguments like positions are rarely repeated exactly, so most entries are only seen once.
+        # Drops are only counted until the entry is forgotten.
+        self._next_prune = now + self.prune_every
+        self.seen = {key: entry for key, entry in self.seen.items() if now - entry[0] < self.interval}
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """
+    Writes to whatever sys.stdout is when the record is written, so that redirecting stdout works
+    """
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    def emit(self, record):
+        self.stream = sys.stdout
+        super().emit(record)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: Optional[str] = None, module_levels: Optional[str] = None, buffer_size: Optional[int] = None,
+                  rate_limit_interval: float = 1.0):
+    """
+    Set up logging for the bot.  This is called once when start.py is imported, later calls do nothing.
+
+    Args:
+        level: The level for all of our modules.  Defaults to RG_LOG_LEVEL or INFO
+        module_levels: Levels for individual modules, like 'strategy=DEBUG,utilities=WARNING'.  Defaults to RG_LOG_LEVELS
+        buffer_size: How many messages to buffer for the background thread.  Defaults to RG_LOG_BUFFER or 10000
+        rate_limit_interval: Seconds to drop repeats of the same message for.  Defaults to 1
+    """
+    global _listener
+    if _listener:
+        return
+    level = level or os.environ.get('RG_LOG_LEVEL', 'INFO')
+    module_levels = module_levels if module_levels is not None else os.environ.get('RG_LOG_LEVELS', '')
+    buffer_size = buffer_size or int(os.environ.get('RG_LOG_BUFFER', '10000'))
+
+    # the format doesn't use the thread or process, so don't spend time looking them up for every record
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    output = _StdoutHandler()
+    output.setFormatter(logging.Formatter(FORMAT))
+    buffer = RingBuffer(buffer_size)
+    _listener = logging.handlers.QueueListener(buffer, output)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    handler = _DeferredQueueHandler(buffer)
+    handler.addFilter(RateLimitFilter(rate_limit_interval))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for setting in filter(None, module_levels.split(',')):
+        name, module_level = setting.split('=')
+        logging.getLogger(name.strip()).setLevel(module_level.strip().upper())
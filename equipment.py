@@ -0,0 +1,167 @@
+"""
+Per-bot equipment: my armor, and what I'm holding in each hand.
+
+Equipping armor every tick costs a round trip for nothing, since armor only changes when I pick something up or
+respawn.  Holding an item is a blocking call even when the item is already in my hand.  The EquipmentManager equips
+armor only after those events, remembers what is in each hand so that holding the same item again costs nothing, and
+runs the look, hold and activate of using an item as one action.
+"""
+import logging
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from regression_games import RGBot, RGEventHandler, Item
+from records import Point
+from utilities import to_vec3, name_for_item
+
+logger = logging.getLogger(__name__)
+
+# inventory window slots: the quick bar is 36-44, with the held item at the selected one, and the off-hand is 45
+QUICK_BAR_START = 36
+OFF_HAND_SLOT = 45
+
+
+class EquipmentManager:
+    """
+    What one bot has equipped, and when its armor needs equipping again
+    """
+
+    def __init__(self, bot: RGBot):
+        """
+        Args:
+            bot: The bot to equip, and to listen to inventory and respawn events on
+        """
+        self.bot = bot
+        self.username: str = bot.username()
+        # the name of the item in each hand, as far as I know, None if it is empty.  Missing means I don't know.
+        self.held: Dict[str, Optional[str]] = {}
+        # whether armor may have been picked up (or lost) since armor was last equipped
+        self.armor_due = True
+
+        # The asyncio main loop (async_loop.py) sets this so that using an item runs in the background instead of
+        # blocking the loop.  It is called with the action, runs the actions one at a time in order, and returns a
+        # future for each.
+        self.background: Optional[Callable[[Callable[[], None]], Future]] = None
+        # called with the kind of action and the item name whenever an item is held, used or unequipped, see replay.py
+        self.listener: Optional[Callable[..., None]] = None
+
+        self.armor_equips = 0
+        self.holds = 0
+        self.holds_skipped = 0
+        self.items_used = 0
+
+        self._subscribe(bot)
+
+    def _subscribe(self, bot: RGBot):
+        @RGEventHandler(bot, 'spawn')
+        def spawn(self_, *args):
+            # I respawned with an empty inventory
+            self.armor_due = True
+            self.held.clear()
+
+        @RGEventHandler(bot, 'playerCollect')
+        def player_collect(self_, collector, collected, *args):
+            if collector.username == self.username:
+                self.armor_due = True
+
+        @RGEventHandler(bot.mineflayer().inventory, 'updateSlot')
+        def update_slot(self_, slot, old_item, new_item, *args):
+            # forget a hand only when something other than what I think is in it moved there, like the item being used
+            # up, and not when it is the item I just held
+            destination = self._hand_at(slot)
+            if destination and self.held.get(destination) != (name_for_item(new_item) if new_item else None):
+                self.held.pop(destination, None)
+
+    def _hand_at(self, slot) -> Optional[str]:
+        # the hand an inventory window slot is, if it is one
+        if slot == OFF_HAND_SLOT:
+            return 'off-hand'
+        if slot is not None and QUICK_BAR_START <= slot < QUICK_BAR_START + 9:
+            return 'hand' if slot - QUICK_BAR_START == self.bot.mineflayer().quickBarSlot else None
+        return None
+
+    def equip_armor(self):
+        """
+        Equip my best armor, if it may have changed since the last time
+        """
+        if not self.armor_due:
+            return
+        self.armor_due = False
+        self.armor_equips += 1
+        self.bot.mineflayer().armorManager.equipAll()
+
+    def hold(self, item: Item, name: str, destination: str = 'hand') -> bool:
+        """
+        Hold an item, unless it is already held there.
+
+        Args:
+            item: The item, from the inventory
+            name: Its name, see utilities.name_for_item
+            destination: 'hand' or 'off-hand'. Defaults to 'hand'.
+
+        Returns: True if the item had to be equipped
+        """
+        if self.listener:
+            self.listener('hold', name, destination)
+        if self.held.get(destination) == name:
+            self.holds_skipped += 1
+            return False
+        self.held[destination] = name
+        self.holds += 1
+        bot = self.bot
+        # the strategies act with the item straight after holding it, so wait for any item still being used first
+        self._run(lambda: bot.mineflayer().equip(item, destination), wait=True)
+        return True
+
+    def unequip(self, destination: str = 'hand') -> bool:
+        """
+        Empty a hand, unless it is already known to be empty.
+
+        Args:
+            destination: 'hand' or 'off-hand'. Defaults to 'hand'.
+
+        Returns: True if something had to be unequipped
+        """
+        if self.listener:
+            self.listener('unequip', None, destination)
+        if destination in self.held and self.held[destination] is None:
+            return False
+        self.held[destination] = None
+        bot = self.bot
+        self._run(lambda: bot.mineflayer().unequip(destination), wait=True)
+        return True
+
+    def use(self, item: Item, name: str, look_at: Optional[Point] = None):
+        """
+        Hold and activate an item, like a potion, looking at a position first if one is given.  The item is used up,
+        so my hand is empty afterwards.
+        """
+        if self.listener:
+            self.listener('use', name, look_at is not None)
+        hold = self.held.get('hand') != name
+        if not hold:
+            self.holds_skipped += 1
+        self.held.pop('hand', None)
+        self.items_used += 1
+        bot = self.bot
+
+        def action():
+            mineflayer = bot.mineflayer()
+            if look_at is not None:
+                mineflayer.lookAt(to_vec3(look_at))
+            if hold:
+                bot.holdItem(item)
+            mineflayer.activateItem(False)
+        self._run(action)
+
+    def _run(self, action: Callable[[], None], wait: bool = False):
+        if self.background:
+            future = self.background(action)
+            if wait:
+                future.result()
+        else:
+            action()
+
+    def report(self) -> str:
+        return (f'{self.armor_equips} armor equips, {self.holds} holds, {self.holds_skipped} holds skipped, '
+                f'{self.items_used} items used')
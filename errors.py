@@ -0,0 +1,204 @@
+"""
+Classifies the exceptions that come out of a main loop pass, and decides how long to back off after each.
+
+Most exceptions from the bridge are expected: setting a new goal rejects the pathfinder.goto that was running with
+GoalChanged, and stopping it rejects it with PathStopped.  Those are not errors at all, and the loop should carry on
+with the next tick straight away.  Others are the bridge itself having trouble (a timeout, a dropped connection), which
+usually clears up if we wait a little, and the rest are bugs in our bot.
+
+classify puts an exception in one of those kinds from its type, or for a JavaScriptError from the name of the JS error,
+read from the error itself.  The stack text can't be trusted for that: errors that set their name after calling super,
+like mineflayer-pathfinder's, print a stack that starts with plain "Error:", so those are told apart by message when only
+the text is at hand.  ErrorHandler gives each kind its own policy: interruptions are
+counted and the loop continues, transient errors and bugs back off exponentially up to a cap, and tracebacks are only
+logged for the first error of each kind and location and then at most once a minute, with a count of the ones skipped.
+"""
+import logging
+import time
+import traceback
+from enum import Enum
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorKind(Enum):
+    # pathfinding was interrupted by a new goal, or the path was stopped
+    INTERRUPTION = 'interruption'
+    # the bridge or the connection to the server had trouble, trying again later usually works
+    TRANSIENT = 'transient'
+    # anything else, a bug in our bot
+    BUG = 'bug'
+
+
+# the JS errors that mineflayer-pathfinder rejects goto with when it is interrupted, or gives up on a goal
+INTERRUPTION_NAMES = {'GoalChanged', 'PathStopped', 'NoPath', 'Timeout'}
+
+# JS errors from the bridge or the network
+TRANSIENT_NAMES = {'TimeoutError', 'AbortError', 'ECONNRESET', 'EPIPE', 'ETIMEDOUT'}
+
+# Python errors from the bridge or the network
+TRANSIENT_TYPES = (ConnectionError, TimeoutError, EOFError)
+
+# the messages mineflayer-pathfinder rejects goto with, for errors whose name only shows up as plain Error
+INTERRUPTION_MESSAGES = {
+    'The goal was changed before it could be completed!': 'GoalChanged',
+    'Path was stopped before it could be completed!': 'PathStopped',
+    'No path to the goal!': 'NoPath',
+    'Took to long to decide path to goal!': 'Timeout',
+}
+
+# the kind of each (exception type, JS error name) seen so far
+_kinds: Dict[Tuple[type, Optional[str]], ErrorKind] = {}
+
+
+def js_error_name(exc: BaseException) -> Optional[str]:
+    """
+    The name of the JS error behind a JavaScriptError, like GoalChanged, or None if it isn't one
+    """
+    js = getattr(exc, 'js', None)
+    if js is None:
+        return None
+    if not isinstance(js, str):
+        name = _error_object_name(js)
+        if name and name != 'Error':
+            return name
+    return _error_text_name(str(js))
+
+
+def _error_object_name(error) -> Optional[str]:
+    """
+    The name of a JS Error read through the bridge, or from its constructor for subclasses that don't set one
+    """
+    try:
+        name = error.name
+        if not name or name == 'Error':
+            name = error.constructor.name
+    except Exception:
+        return None
+    return str(name) if name else None
+
+
+def _error_text_name(text: str) -> Optional[str]:
+    """
+    The name at the start of a JS error's text, or for a plain Error one of the pathfinder's from its message
+    """
+    name, colon, message = text.strip().partition('\n')[0].partition(':')
+    if not colon or not name.isidentifier():
+        return None
+    if name == 'Error':
+        message = message.strip()
+        for known, known_name in INTERRUPTION_MESSAGES.items():
+            if message.startswith(known):
+                return known_name
+    return name
+
+
+def classify(exc: BaseException) -> ErrorKind:
+    """
+    Which kind of error an exception is, see ErrorKind
+    """
+    name = js_error_name(exc)
+    key = (type(exc), name)
+    kind = _kinds.get(key)
+    if kind is None:
+        if name in INTERRUPTION_NAMES:
+            kind = ErrorKind.INTERRUPTION
+        elif name in TRANSIENT_NAMES or isinstance(exc, TRANSIENT_TYPES):
+            kind = ErrorKind.TRANSIENT
+        else:
+            kind = ErrorKind.BUG
+        _kinds[key] = kind
+    return kind
+
+
+class Backoff:
+    """
+    Exponential backoff: each delay is factor times the last, up to maximum, until reset
+    """
+
+    def __init__(self, initial: float, maximum: float, factor: float = 2):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.current = 0.0
+
+    def next(self) -> float:
+        self.current = self.initial if not self.current else min(self.current * self.factor, self.maximum)
+        return self.current
+
+    def reset(self):
+        self.current = 0.0
+
+
+class ErrorHandler:
+    """
+    Handles the exceptions from one place, like the main loop: counts them by kind, logs them, and says how long to
+    wait before trying again
+    """
+
+    def __init__(self, name: str, transient_backoff: Optional[Backoff] = None, bug_backoff: Optional[Backoff] = None,
+                 sample_interval: float = 60, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            name: What is failing, for the log
+            transient_backoff: The backoff after transient errors.  Defaults to one tick, doubling up to 1 second
+            bug_backoff: The backoff after bugs.  Defaults to 0.25 seconds, doubling up to 5 seconds
+            sample_interval: After logging the traceback of an error, how many seconds to wait before logging the
+                traceback of the same error again.  Defaults to 60
+            clock: The monotonic clock to read
+        """
+        self.name = name
+        self.backoffs = {
+            ErrorKind.TRANSIENT: transient_backoff or Backoff(0.05, 1.0),
+            ErrorKind.BUG: bug_backoff or Backoff(0.25, 5.0),
+        }
+        self.sample_interval = sample_interval
+        self.clock = clock
+        self.counts: Dict[ErrorKind, int] = {kind: 0 for kind in ErrorKind}
+        self._failing = False
+        # (kind, exception type, file, line) -> [when its traceback was last logged, how many were skipped since]
+        self._samples: Dict[tuple, list] = {}
+
+    def handle(self, exc: BaseException) -> float:
+        """
+        Count and log an exception.  Returns how many seconds to wait before trying again, 0 to carry on straight away.
+        """
+        kind = classify(exc)
+        self.counts[kind] += 1
+        if kind is ErrorKind.INTERRUPTION:
+            logger.debug('[Errors] %s was interrupted: %s', self.name, js_error_name(exc))
+            return 0
+        self._failing = True
+        self._log(kind, exc)
+        return self.backoffs[kind].next()
+
+    def succeeded(self):
+        """
+        Call this after each pass that didn't fail, to reset the backoffs
+        """
+        if self._failing:
+            self._failing = False
+            for backoff in self.backoffs.values():
+                backoff.reset()
+
+    def _log(self, kind: ErrorKind, exc: BaseException):
+        frames = traceback.extract_tb(exc.__traceback__)
+        where = (frames[-1].filename, frames[-1].lineno) if frames else (None, None)
+        key = (kind, type(exc)) + where
+        now = self.clock()
+        sample = self._samples.get(key)
+        if sample is not None and now - sample[0] < self.sample_interval:
+            sample[1] += 1
+            return
+        skipped = sample[1] if sample else 0
+        self._samples[key] = [now, 0]
+        level = logging.WARNING if kind is ErrorKind.TRANSIENT else logging.ERROR
+        if skipped:
+            logger.log(level, '[Errors] %s failed with a %s error (and %d more like this since the last traceback)',
+                       self.name, kind.value, skipped, exc_info=exc)
+        else:
+            logger.log(level, '[Errors] %s failed with a %s error', self.name, kind.value, exc_info=exc)
+
+    def report(self) -> str:
+        return ', '.join(f'{count} {kind.value}' + ('s' if count != 1 else '') for kind, count in self.counts.items())
@@ -0,0 +1,249 @@
+"""
+Opt-in instrumentation for bridge calls.
+
+Set RG_INSTRUMENT=1 and configure_bot wraps the RGBot and RGCTFUtils in proxies that time every attribute read and
+method call that goes over the bridge, along with the mineflayer() object and its pathfinder.  Each call is counted
+per call site (the file, line and function in our code that made it), with its total and max latency.
+
+Environment variables (all optional):
+    RG_INSTRUMENT: 1 to turn instrumentation on.  Defaults to off
+    RG_INSTRUMENT_EVERY: print a summary every this many main loop passes, 0 for never.  Defaults to 600 (~30 seconds)
+    RG_INSTRUMENT_FILE: where the JSON report is written when the match ends.  Defaults to bridge-calls-<username>.json
+"""
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# proxies are also put around these attributes and return values, as the label on the left
+CHILD_LABELS = {
+    'bot.mineflayer()': 'mineflayer',
+    'mineflayer.pathfinder': 'pathfinder',
+    'mineflayer.armorManager': 'armorManager',
+}
+
+
+def enabled() -> bool:
+    return os.environ.get('RG_INSTRUMENT') == '1'
+
+
+def _call_site() -> str:
+    """
+    The first frame outside this module, as file:line function
+    """
+    frame = sys._getframe(2)
+    while frame and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    if not frame:
+        return 'unknown'
+    return f'{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}'
+
+
+class CallStats:
+    """
+    Call counts and latency for each bridge call, per call site
+    """
+
+    def __init__(self, dump_every: int = 600):
+        self.dump_every = dump_every
+        self.passes = 0
+        self.started = time.monotonic()
+        # (call, call site) -> [count, total seconds, max seconds]
+        self.calls: Dict[Tuple[str, str], list] = {}
+        # [seconds] spent in the calls of the current main loop pass, see begin_pass
+        self._pass_seconds: contextvars.ContextVar = contextvars.ContextVar('pass_seconds', default=None)
+        self._lock = threading.Lock()
+
+    def record(self, call: str, seconds: float):
+        key = (call, _call_site())
+        meter = self._pass_seconds.get()
+        with self._lock:
+            if meter is not None:
+                meter[0] += seconds
+            entry = self.calls.get(key)
+            if entry is None:
+                self.calls[key] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def begin_pass(self):
+        """
+        Start timing the calls of a main loop pass, see pass_seconds.  Only the calls made in this context are counted,
+        which means on this thread, or in the contexts copied from it (like the async loop's bridge calls), and not the
+        calls made by other threads at the same time, like a background goto.
+        """
+        self._pass_seconds.set([0.0])
+
+    def pass_seconds(self) -> float:
+        """
+        The time spent in calls since begin_pass was called in this context
+        """
+        meter = self._pass_seconds.get()
+        return meter[0] if meter else 0.0
+
+    def end_pass(self):
+        """
+        Called at the end of every main loop pass
+        """
+        self.passes += 1
+        if self.dump_every and self.passes % self.dump_every == 0:
+            logger.info('%s', self.summary())
+
+    def report(self) -> dict:
+        with self._lock:
+            calls = sorted(self.calls.items(), key=lambda item: item[1][1], reverse=True)
+        total_count = sum(entry[0] for _, entry in calls)
+        total_seconds = sum(entry[1] for _, entry in calls)
+        return {
+            'passes': self.passes,
+            'elapsed_seconds': round(time.monotonic() - self.started, 3),
+            'bridge_calls': total_count,
+            'bridge_calls_per_pass': round(total_count / self.passes, 2) if self.passes else 0,
+            'bridge_ms': round(total_seconds * 1000, 3),
+            'calls': [{
+                'call': call,
+                'site': site,
+                'count': count,
+                'total_ms': round(total * 1000, 3),
+                'mean_ms': round(total / count * 1000, 4),
+                'max_ms': round(longest * 1000, 3),
+            } for (call, site), (count, total, longest) in calls],
+        }
+
+    def summary(self, top: int = 15) -> str:
+        report = self.report()
+        lines = [f"[Instrumentation] {report['bridge_calls']} bridge calls in {report['passes']} passes "
+                 f"({report['bridge_calls_per_pass']} per pass), {report['bridge_ms']}ms in total. Slowest call sites:"]
+        for entry in report['calls'][:top]:
+            lines.append(f"[Instrumentation]   {entry['total_ms']:>10.1f}ms {entry['count']:>7} x {entry['mean_ms']:.3f}ms "
+                         f"(max {entry['max_ms']}ms)  {entry['call']}  at {entry['site']}")
+        return '\n'.join(lines)
+
+    def write_report(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        logger.info('[Instrumentation] Wrote the bridge call report to %s', path)
+
+
+def _unwrap(value):
+    return object.__getattribute__(value, '_target') if isinstance(value, (InstrumentedProxy, _InstrumentedFunction)) else value
+
+
+class InstrumentedProxy:
+    """
+    Stands in for a JS object, and records every attribute read as a bridge call
+    """
+    __slots__ = ('_target', '_label', '_stats')
+
+    def __init__(self, target, label: str, stats: CallStats):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_label', label)
+        object.__setattr__(self, '_stats', stats)
+
+    def __getattr__(self, name):
+        call = f'{self._label}.{name}'
+        started = time.perf_counter()
+        value = getattr(self._target, name)
+        self._stats.record(call, time.perf_counter() - started)
+        return _wrap(value, call, self._stats)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, _unwrap(value))
+
+    def __repr__(self):
+        return repr(self._target)
+
+
+class _InstrumentedFunction:
+    """
+    Stands in for a JS function (or any object read from an InstrumentedProxy), and records every call as a bridge call
+    """
+    __slots__ = ('_target', '_call', '_stats')
+
+    def __init__(self, target, call: str, stats: CallStats):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_call', call)
+        object.__setattr__(self, '_stats', stats)
+
+    def __call__(self, *args, **kwargs):
+        call = f'{self._call}()'
+        args = [_unwrap(arg) for arg in args]
+        started = time.perf_counter()
+        try:
+            value = self._target(*args, **kwargs)
+        finally:
+            self._stats.record(call, time.perf_counter() - started)
+        return _wrap(value, call, self._stats)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, _unwrap(value))
+
+    # JS objects are callable too, so forward the special methods that our code uses on them
+    def __bool__(self):
+        return bool(self._target)
+
+    def __len__(self):
+        return len(self._target)
+
+    def __iter__(self):
+        return iter(self._target)
+
+    def __getitem__(self, key):
+        return self._target[key]
+
+    def __repr__(self):
+        return repr(self._target)
+
+
+def _wrap(value, call: str, stats: CallStats):
+    label = CHILD_LABELS.get(call)
+    if label:
+        return InstrumentedProxy(value, label, stats) if value is not None else None
+    if callable(value) and not call.endswith(')'):
+        return _InstrumentedFunction(value, call, stats)
+    return value
+
+
+def instrument(target, label: str, stats: Optional[CallStats] = None) -> InstrumentedProxy:
+    """
+    Wrap a JS object so that its bridge calls are recorded.  Don't pass the wrapped object to the constructor of a JS class.
+
+    Args:
+        target: The JS object, like the RGBot
+        label: What to call it in the report
+        stats: The stats to record the calls in, to share them with another object of the same bot (see stats_of).
+            Defaults to new stats, so that each bot in the process has its own
+    """
+    if stats is None:
+        # telemetry.py instruments the bot too, for the bridge time, but only RG_INSTRUMENT prints summaries
+        stats = CallStats(int(os.environ.get('RG_INSTRUMENT_EVERY', '600')) if enabled() else 0)
+    return InstrumentedProxy(target, label, stats)
+
+
+def stats_of(target) -> Optional[CallStats]:
+    """
+    The stats that an object returned by instrument records its calls in, or None if it isn't instrumented
+    """
+    return object.__getattribute__(target, '_stats') if isinstance(target, InstrumentedProxy) else None
+
+
+def end_pass(stats: Optional[CallStats]):
+    if stats:
+        stats.end_pass()
+
+
+def write_report(stats: Optional[CallStats], username: str):
+    if stats and enabled():
+        stats.write_report(os.environ.get('RG_INSTRUMENT_FILE', f'bridge-calls-{username}.json'))
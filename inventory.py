@@ -0,0 +1,80 @@
+"""
+An index of my inventory, built once each time the inventory changes.
+
+Reading an item's names takes a round trip per attribute, and potion names are JSON that has to be parsed, so the
+index reads and parses every item once and then answers "which potion of this type should I use", "do I have a block
+to place" and "do I have a shield" with dictionary lookups.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+from regression_games import Item
+from records import EntitySnapshot
+from utilities import MOVEMENT_POTIONS, COMBAT_POTIONS, NINJA_POTIONS, HEALTH_POTIONS, item_names
+
+# the blocks that handle_placing_blocks can use for the bridge blockade, by display name
+PLACEABLE_BLOCKS = ['Gravel', 'Grass Block', 'Dirt', 'Stripped Dark Oak Wood']
+
+# the items in each category by name, with the ones to use first near the front
+CATEGORIES: Dict[str, List[str]] = {
+    'movement': MOVEMENT_POTIONS,
+    'combat': COMBAT_POTIONS,
+    'ninja': NINJA_POTIONS,
+    'health': HEALTH_POTIONS,
+    'blocks': PLACEABLE_BLOCKS,
+}
+
+
+class InventoryIndex:
+    """
+    The items in my inventory with their names, and the best item of each category
+    """
+    __slots__ = ('items', 'names', 'raw_names', 'name_set', 'by_name', 'categories')
+
+    def __init__(self, items: List[Item]):
+        self.items = items
+        self.names: List[str] = []
+        self.raw_names: List[str] = []
+        # both the raw item names and the display names, for fast membership tests
+        self.name_set: Set[str] = set()
+        # the first item with each display name
+        self.by_name: Dict[str, Item] = {}
+        for item in items:
+            name, raw_name = item_names(item)
+            self.names.append(name)
+            self.raw_names.append(raw_name)
+            self.name_set.add(name)
+            self.name_set.add(raw_name)
+            self.by_name.setdefault(name, item)
+
+        # category -> (item, name) of the items I have in it, best first
+        self.categories: Dict[str, List[Tuple[Item, str]]] = {
+            category: [(self.by_name[name], name) for name in names if name in self.by_name]
+            for category, names in CATEGORIES.items()
+        }
+        # a renamed shield keeps its raw name
+        self.categories['shield'] = [(item, name) for item, name, raw_name in zip(items, self.names, self.raw_names)
+                                     if 'shield' in name.lower() or raw_name == 'shield']
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.name_set
+
+    def name_of(self, item: Item) -> Optional[str]:
+        """
+        The name of an item from this index, or None if it isn't in it
+        """
+        for indexed, name in zip(self.items, self.names):
+            if indexed is item:
+                return name
+        return None
+
+    def owned_weight(self, item: EntitySnapshot) -> float:
+        """
+        The weight find_items gives an item on the ground, so that items I already have sort last
+        """
+        return 999999 if item.name in self.name_set else 1
+
+    def best(self, category: str) -> Optional[Tuple[Item, str]]:
+        """
+        The (item, name) to use first from a category, see CATEGORIES, or None if I don't have any
+        """
+        found = self.categories.get(category)
+        return found[0] if found else None
@@ -0,0 +1,295 @@
+"""
+Runs several bots, each in its own worker process, so that their main loops don't share one interpreter (and one GIL).
+
+    python launcher.py --bots 4 --seconds 60
+
+Each worker creates its bot with a bot factory, runs start.configure_bot on it, and reports lifecycle events
+(spawn, death, end, kicked) and its TickScheduler stats back to the launcher.  The launcher restarts workers that crash
+or are disconnected, and prints the aggregated metrics for the whole team.
+
+A bot factory is a function factory(index, options) that returns (bot, run): the RGBot for bot number index, and a
+function that blocks until that bot is done.  The default, simulator:bot_factory, gives each bot its own simulated match:
+the simulated worlds are not shared between the worker processes, so the team metrics add up independent matches, and
+say nothing about how the bots play together.
+Pass --factory module:function to use another one.  No factory that connects to a real server ships with the bot yet,
+so until one is written the launcher is only a way to load test the bot in the simulator, not to field a team.  Workers are started with the 'spawn' start method, so nothing from
+the launcher process (like a bridge connection) is shared with them.
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+LIFECYCLE_EVENTS = ['spawn', 'death', 'end', 'kicked']
+
+# events after which the bot has lost its connection, so its worker should be restarted
+DISCONNECT_EVENTS = ['end', 'kicked']
+
+
+def load_factory(path: str) -> Callable:
+    """
+    Load a bot factory from a 'module:function' path
+    """
+    module_name, function_name = path.split(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def scheduler_stats() -> dict:
+    """
+    The stats of every TickScheduler in this process, added together
+    """
+    from scheduler import schedulers
+    totals = {'passes': 0, 'overruns': 0, 'skipped_ticks': 0}
+    for scheduler in list(schedulers):
+        stats = scheduler.stats()
+        for key in totals:
+            totals[key] += stats[key]
+    return totals
+
+
+def run_worker(index: int, factory_path: str, options: dict, messages: multiprocessing.Queue, log_path: Optional[str]):
+    """
+    The entry point of a worker process
+    """
+    if log_path:
+        sys.stdout = sys.stderr = open(log_path, 'a', buffering=1)
+
+    def send(kind: str, payload=None):
+        messages.put((index, os.getpid(), kind, payload))
+
+    done = threading.Event()
+
+    def report_metrics():
+        while not done.wait(options.get('metrics_interval', 5)):
+            send('metrics', scheduler_stats())
+
+    try:
+        bot, run = load_factory(factory_path)(index, options)
+
+        from regression_games import RGEventHandler
+        from start import configure_bot
+
+        for event in LIFECYCLE_EVENTS:
+            RGEventHandler(bot, event)(lambda emitter, *args, event=event: send(event))
+
+        configure_bot(bot)
+        threading.Thread(target=report_metrics, name='rg-metrics', daemon=True).start()
+        run()
+    except Exception:
+        traceback.print_exc()
+        send('error', traceback.format_exc())
+        sys.exit(1)
+    finally:
+        done.set()
+        send('metrics', scheduler_stats())
+
+
+class WorkerState:
+    """
+    What the launcher knows about one bot's worker
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.disconnected = False
+        self.restart_at: Optional[float] = None
+        self.finished = False
+        self.events: Dict[str, int] = {event: 0 for event in LIFECYCLE_EVENTS + ['error']}
+        # scheduler stats from the worker's current process, and the totals from its earlier processes
+        self.metrics: dict = {}
+        self.previous_metrics: Dict[str, int] = {}
+
+    def totals(self) -> dict:
+        return {key: self.previous_metrics.get(key, 0) + value for key, value in self.metrics.items()}
+
+
+class BotLauncher:
+    """
+    Starts a worker process for each bot, restarts them when they crash or disconnect, and aggregates their metrics
+    """
+
+    def __init__(self, bots: int, factory: str = 'simulator:bot_factory', options: Optional[dict] = None,
+                 max_restarts: int = 3, restart_delay: float = 2.0, report_interval: float = 30,
+                 log_dir: Optional[str] = None, hooks: Optional[Dict[str, Callable[[int, object], None]]] = None):
+        """
+        Args:
+            bots: How many bots to run
+            factory: The 'module:function' path of the bot factory.  Defaults to the simulator
+            options: Passed to the bot factory, and metrics_interval sets how often workers report their stats
+            max_restarts: How many times to restart each worker.  Defaults to 3
+            restart_delay: Seconds to wait before restarting a worker, doubled after each restart.  Defaults to 2
+            report_interval: Seconds between printed team reports, 0 for none.  Defaults to 30
+            log_dir: Write each worker's output to bot-<index>.log in this directory instead of the console
+            hooks: Functions called with (index, payload) when a worker reports an event, keyed by event name
+        """
+        self.factory = factory
+        self.options = options or {}
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        self.report_interval = report_interval
+        self.log_dir = log_dir
+        self.hooks = hooks or {}
+        self.context = multiprocessing.get_context('spawn')
+        self.messages = self.context.Queue()
+        self.workers: List[WorkerState] = [WorkerState(i) for i in range(bots)]
+        self.started_at = 0.0
+
+    def run(self) -> dict:
+        """
+        Run every bot until they have all finished, then return the team metrics
+        """
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+        self.started_at = time.monotonic()
+        for worker in self.workers:
+            self._start(worker)
+        next_report = time.monotonic() + self.report_interval
+        try:
+            while not all(worker.finished for worker in self.workers):
+                self._drain_messages(timeout=0.5)
+                self._check_workers()
+                if self.report_interval and time.monotonic() >= next_report:
+                    next_report += self.report_interval
+                    print(f'[Launcher] {json.dumps(self.metrics())}')
+        except KeyboardInterrupt:
+            print('[Launcher] Stopping all bots')
+        finally:
+            self.stop()
+        # pick up the final stats that workers sent before exiting
+        self._drain_messages(timeout=0.5)
+        metrics = self.metrics()
+        print(f'[Launcher] Final metrics: {json.dumps(metrics)}')
+        return metrics
+
+    def stop(self):
+        for worker in self.workers:
+            process = worker.process
+            if process and process.is_alive():
+                process.terminate()
+                process.join(5)
+            worker.finished = True
+
+    def _start(self, worker: WorkerState):
+        log_path = os.path.join(self.log_dir, f'bot-{worker.index}.log') if self.log_dir else None
+        worker.process = self.context.Process(target=run_worker, name=f'rg-bot-{worker.index}',
+                                              args=(worker.index, self.factory, self.options, self.messages, log_path))
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.disconnected = False
+        worker.restart_at = None
+        print(f'[Launcher] Started bot {worker.index} (pid {worker.process.pid})')
+
+    def _drain_messages(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                index, pid, kind, payload = self.messages.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return
+            worker = self.workers[index]
+            if worker.process is None or pid != worker.process.pid:
+                # a late message from a worker's previous process
+                continue
+            if kind == 'metrics':
+                worker.metrics = payload
+            else:
+                worker.events[kind] = worker.events.get(kind, 0) + 1
+                if kind in DISCONNECT_EVENTS:
+                    worker.disconnected = True
+                print(f'[Launcher] Bot {index}: {kind}')
+            hook = self.hooks.get(kind)
+            if hook:
+                hook(index, payload)
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for worker in self.workers:
+            if worker.finished:
+                continue
+            if worker.restart_at is not None:
+                if now >= worker.restart_at:
+                    self._start(worker)
+                continue
+            if worker.process.is_alive():
+                continue
+
+            # the worker has exited: it's done unless it crashed or was disconnected
+            exitcode = worker.process.exitcode
+            if exitcode == 0 and not worker.disconnected:
+                print(f'[Launcher] Bot {worker.index} finished')
+                worker.finished = True
+            elif worker.restarts < self.max_restarts:
+                delay = self.restart_delay * 2 ** worker.restarts
+                print(f'[Launcher] Bot {worker.index} exited (code {exitcode}), restarting in {delay:.1f}s')
+                worker.restarts += 1
+                worker.previous_metrics = worker.totals()
+                worker.metrics = {}
+                worker.restart_at = now + delay
+            else:
+                print(f'[Launcher] Bot {worker.index} exited (code {exitcode}), giving up after {worker.restarts} restarts')
+                worker.finished = True
+
+    def metrics(self) -> dict:
+        """
+        The metrics for each bot, and for the whole team
+        """
+        bots = []
+        for worker in self.workers:
+            bots.append({
+                'index': worker.index,
+                'alive': bool(worker.process and worker.process.is_alive()),
+                'restarts': worker.restarts,
+                'events': dict(worker.events),
+                'scheduler': worker.totals(),
+            })
+        team = {'restarts': sum(b['restarts'] for b in bots)}
+        for bot in bots:
+            for key, value in list(bot['events'].items()) + list(bot['scheduler'].items()):
+                team[key] = team.get(key, 0) + value
+        elapsed = time.monotonic() - self.started_at
+        team['elapsed_seconds'] = round(elapsed, 1)
+        team['passes_per_second'] = round(team.get('passes', 0) / elapsed, 1) if elapsed > 0 else 0
+        return {'team': team, 'bots': bots}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run several bots, each in its own worker process')
+    parser.add_argument('--bots', type=int, default=4)
+    parser.add_argument('--factory', default='simulator:bot_factory', help='the module:function that creates each bot')
+    parser.add_argument('--max-restarts', type=int, default=3)
+    parser.add_argument('--report-interval', type=float, default=30, help='seconds between team reports, 0 for none')
+    parser.add_argument('--log-dir', help="write each bot's output to a file in this directory")
+    parser.add_argument('--output', help='write the final metrics as JSON to this file')
+    # options for the simulator factory
+    parser.add_argument('--seconds', type=float, default=60, help='length of each simulated match in game seconds')
+    parser.add_argument('--opponents', type=int, default=3)
+    parser.add_argument('--teammates', type=int, default=0)
+    parser.add_argument('--speed', type=float, default=1.0)
+    parser.add_argument('--latency-ms', type=float, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    options = {'seconds': args.seconds, 'opponents': args.opponents, 'teammates': args.teammates, 'speed': args.speed,
+               'latency_ms': args.latency_ms, 'seed': args.seed}
+    launcher = BotLauncher(args.bots, args.factory, options, max_restarts=args.max_restarts,
+                           report_interval=args.report_interval, log_dir=args.log_dir)
+    metrics = launcher.run()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(metrics, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Per-bot movement: which goal the pathfinder is working on, and when to give it a new one.
+
+Every new goal makes mineflayer-pathfinder throw away its path and plan a new one, so handing it a slightly different
+goal on every tick (chasing a moving target, or re-sending the goal it just reached) wastes CPU and makes the bot
+stutter.  The MovementManager keeps a new target from replacing the current one unless it is far enough away from it,
+and keeps track of whether the bot is moving or has arrived from the pathfinder's events (goal_updated, path_update,
+goal_reached, path_stop), so deciding costs no bridge calls.  It also counts how often goals were set and kept, see
+report.
+"""
+import logging
+import time
+from typing import Callable, Optional
+
+from regression_games import RGBot, RGEventHandler, goals
+from records import Point, point_from_vec3
+from utilities import to_vec3
+import utilities
+
+logger = logging.getLogger(__name__)
+
+# path_update statuses that mean the pathfinder gave up on the goal
+PATH_FAILED = ('noPath', 'timeout')
+
+
+class MovementManager:
+    """
+    The movement intent of one bot, and its movement statistics
+    """
+
+    def __init__(self, bot: RGBot, arrival_slack: float = 1):
+        """
+        Args:
+            bot: The bot to listen to pathfinder events on
+            arrival_slack: Once I've arrived, how much further than the reach I can drift from the target before I move
+                back to it.  Defaults to 1 block
+        """
+        self.arrival_slack = arrival_slack
+
+        # where the current move is heading, and the goal the pathfinder was given for it (the target, or the next
+        # waypoint on the route to it)
+        self.target: Optional[Point] = None
+        self.goal: Optional[Point] = None
+        self.reach: float = 1
+        # whether the pathfinder is working on my goal, and whether it got me to the target
+        self.moving = False
+        self.arrived = False
+
+        # The asyncio main loop (async_loop.py) sets this so that pathfinder.goto runs in the background instead of
+        # blocking the loop.  It is called with the bot and the goal.
+        self.background_goto: Optional[Callable[[RGBot, object], None]] = None
+        # called with the target position and reach whenever a new move starts, see replay.py
+        self.listener: Optional[Callable[[Point, float], None]] = None
+
+        # goal_updated events still to come for goals I set: events before them are about older goals
+        self._pending = 0
+        # the pathfinder of the last bot object moves were made through, so that each goal costs one round trip
+        self._pathfinder_bot = None
+        self._pathfinder = None
+
+        self.started = time.perf_counter()
+        self.goals_set = 0
+        self.goals_kept = 0
+        self.goals_reached = 0
+        self.paths_computed = 0
+        self.paths_failed = 0
+        self.paths_stopped = 0
+        self.goals_replaced = 0
+
+        self._subscribe(bot)
+
+    def _subscribe(self, bot: RGBot):
+        @RGEventHandler(bot, 'goal_updated')
+        def goal_updated(self_, goal, *args):
+            if self._pending > 0:
+                self._pending -= 1
+                return
+            # someone else set a goal (or cleared it), so mine is gone
+            if goal is not None:
+                self.goals_replaced += 1
+            self.forget()
+
+        @RGEventHandler(bot, 'path_update')
+        def path_update(self_, results, *args):
+            if self._pending > 0 or self.target is None:
+                return
+            self.paths_computed += 1
+            if results.status in PATH_FAILED:
+                self.paths_failed += 1
+                self.moving = False
+
+        @RGEventHandler(bot, 'goal_reached')
+        def goal_reached(self_, *args):
+            if self._pending > 0 or self.target is None:
+                return
+            self._reached()
+
+        @RGEventHandler(bot, 'path_stop')
+        def path_stop(self_, *args):
+            if self._pending > 0 or self.target is None:
+                return
+            self.paths_stopped += 1
+            self.forget()
+
+        @RGEventHandler(bot, 'death')
+        def death(self_, *args):
+            self.forget()
+            self._pending = 0
+
+    def _reached(self):
+        if self.moving:
+            self.goals_reached += 1
+        self.moving = False
+        # reaching a waypoint isn't arriving, the next move heads on from there
+        self.arrived = self.goal is self.target
+
+    def forget(self):
+        """
+        Forget the current move, so that the next one sets a new goal
+        """
+        self.target = self.goal = None
+        self.moving = self.arrived = False
+
+    def should_keep(self, position: Point, target: Point, reach: float, retarget_distance: float) -> bool:
+        """
+        Whether the current goal is still good enough for a target: it is within retarget_distance of the current
+        target, and I'm either still on my way or I've arrived and am still close enough to the new target
+        """
+        current = self.target
+        if current is None or target.distanceSquared(current) > retarget_distance ** 2:
+            return False
+        if self.moving:
+            return True
+        return self.arrived and position.distanceSquared(target) <= (reach + self.arrival_slack) ** 2
+
+    def move_toward(self, bot: RGBot, position: Point, target_position, reach: float = 1, should_wait: bool = False,
+                    retarget_distance: Optional[float] = None) -> bool:
+        """
+        Move toward a position, unless the current goal is already close enough to it.
+
+        Args:
+            bot: The bot to act through, usually snapshot.bot
+            position: My position
+            target_position: The pathfinding destination position
+            reach: How many blocks away from the target position should I get before pathfinding stops. Defaults to 1.
+            should_wait: Whether to wait for the bot to get there, or let it path in the background. Defaults to False.
+            retarget_distance: How far the target has to be from the current one before the goal is changed.
+                Larger values suit targets that move, like a player being chased. Defaults to the reach.
+
+        Returns: True if a new goal was set
+        """
+        target_position = point_from_vec3(target_position)
+        if self.should_keep(position, target_position, reach, reach if retarget_distance is None else retarget_distance):
+            self.goals_kept += 1
+            logger.debug('[Movement] Not changing movement target because previous ~= new')
+            return False
+
+        logger.info('[Movement] Moving toward position: %s, moving: %s', target_position, self.moving)
+        if self.listener:
+            self.listener(target_position, reach)
+        goal_position = target_position
+        navigation = utilities.navigation
+        if navigation and not should_wait:
+            # head for the next waypoint on the route instead, the next pass moves on from there once it is reached
+            waypoint = navigation.waypoint(position, target_position)
+            if waypoint:
+                logger.info('[Movement] Following the route to %s via %s', target_position, waypoint)
+                goal_position = waypoint
+
+        self.target = target_position
+        self.goal = goal_position
+        self.reach = reach
+        self.moving = True
+        self.arrived = False
+        self.goals_set += 1
+        self._pending += 1
+        if should_wait:
+            bot.approachPosition(to_vec3(target_position), {'reach': reach})
+            self._arrive(target_position)
+        else:
+            # DO NOT AWAIT PATHING... WE'LL INTERRUPT IT LATER WITH A NEW TARGET IF NEED BE
+            goal = goals.GoalNear(goal_position.x, goal_position.y, goal_position.z, reach)
+            if self.background_goto:
+                self.background_goto(bot, goal)
+            else:
+                if bot is not self._pathfinder_bot:
+                    self._pathfinder_bot = bot
+                    self._pathfinder = bot.mineflayer().pathfinder
+                # over the real bridge this returns once the goal is reached, and goal_reached tells us that
+                self._pathfinder.goto(goal)
+        return True
+
+    def _arrive(self, target_position: Point):
+        # the goal was reached before the call that set it returned
+        if self.target is target_position:
+            logger.info('[Movement] Reached target position: %s', target_position)
+            self._reached()
+
+    def report(self) -> str:
+        minutes = max(time.perf_counter() - self.started, 1e-9) / 60
+        return (f'{self.goals_set} goals set ({self.goals_set / minutes:.1f}/min), {self.goals_kept} kept, '
+                f'{self.goals_reached} reached, {self.paths_computed} paths computed, {self.paths_failed} failed, '
+                f'{self.paths_stopped} stopped, {self.goals_replaced} replaced by other goals')
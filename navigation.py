@@ -0,0 +1,528 @@
+"""
+A prebuilt navigation graph of the CTF arena, so that long routes don't have to be planned by mineflayer-pathfinder.
+
+The arena can't be dug, so it doesn't change during a match.  The graph is built once, offline, by scanning the arena:
+every x, z column gets the list of heights a bot can stand at in it, so that the tunnel under the bridge and the floors
+of a castle are separate levels of the same column.  Each of those standing spots is a node, and nodes in neighbouring
+columns are connected when the bot can walk, jump or drop between them without hitting its head.  For every key point
+(the flag spawn, the score locations, the bridge blockade spots and any extra points like item spawns) the build then
+runs Dijkstra out from the key point and stores, for every node, the next node on the shortest route to it.  So a route
+from anywhere to a key point is a walk along those pointers, with no search at all.
+
+move_toward_position uses the graph for targets near a key point: instead of handing the pathfinder the whole route, it
+gives it the waypoint about 16 blocks ahead on the route, so the pathfinder only ever plans short hops.  Other targets,
+and the last few blocks to a key point, are still left to the pathfinder.
+
+The graph is saved as one flat binary file (see save_graph) and memory mapped when it is loaded, so loading it costs
+next to nothing however big the arena is.  Scanning reads every block of the arena over the bridge, so it is never done
+during a match.  Build it with:
+
+    python navigation.py --simulator --output ctf_nav.bin
+
+for the simulated arena, or with --factory module:function (a launcher.py bot factory that connects a bot to a practice
+server) to scan the real one.
+
+For now this is simulator-only: no factory for a real server ships with the bot, and no graph file is shipped either
+(the simulated arena's is no use on the real one).  So in a real match load_default finds nothing, utilities.navigation
+stays None, and every move goes to the pathfinder as before.
+
+Environment variables (all optional):
+    RG_NAV_FILE: the graph file to load, or to write when building.  Defaults to ctf_nav.bin next to this file
+"""
+import argparse
+import bisect
+import heapq
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from records import Point, point_from_vec3
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ctf_nav.bin')
+
+MAGIC = b'RGNV'
+VERSION = 2
+# magic, version, key point count, origin x, origin z, width, depth, node count
+HEADER = struct.Struct('<4sHHiiiii')
+# name, x, y, z
+KEY_POINT = struct.Struct('<24sfff')
+
+# a node that has no route to the key point
+UNREACHABLE = -1
+
+MAX_CLIMB = 1
+MAX_DROP = 3
+# (dx, dz, cost) of the moves between neighbouring columns
+MOVES = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+         (1, 1, math.sqrt(2)), (1, -1, math.sqrt(2)), (-1, 1, math.sqrt(2)), (-1, -1, math.sqrt(2))]
+# extra cost per block climbed, so that flat routes win over jumpy ones of the same length
+CLIMB_COST = 0.5
+# the room a bot needs to stand, in blocks
+BOT_HEIGHT = 2
+
+
+class NavigationGraph:
+    """
+    The standing spots of the arena, and the route to each key point from every one of them
+    """
+
+    def __init__(self, origin_x: int, origin_z: int, width: int, depth: int, column_starts: Sequence[int],
+                 levels: Sequence[int], key_points: Dict[str, Point], next_nodes: Dict[str, Sequence[int]],
+                 cache_size: int = 1024):
+        """
+        Args:
+            origin_x: The x of the first column
+            origin_z: The z of the first column
+            width: The number of columns along x
+            depth: The number of columns along z
+            column_starts: The first node of each column (index = dz * width + dx), and the node count at the end.  The
+                nodes of a column are column_starts[column] up to column_starts[column + 1], lowest first
+            levels: The y a bot stands at on each node
+            key_points: The key points, by name
+            next_nodes: For each key point, the next node on the route to it from each node, or UNREACHABLE
+            cache_size: How many waypoint lookups to remember.  Defaults to 1024
+        """
+        self.origin_x = origin_x
+        self.origin_z = origin_z
+        self.width = width
+        self.depth = depth
+        self.column_starts = column_starts
+        self.levels = levels
+        self.key_points = key_points
+        self.next_nodes = next_nodes
+        self.cache_size = cache_size
+        # (key point name, node, lookahead) -> waypoint
+        self._waypoints: 'OrderedDict[Tuple[str, int, int], Optional[Point]]' = OrderedDict()
+
+    def column(self, position) -> Optional[int]:
+        """
+        The index of the column that position is in, or None if it is outside the graph
+        """
+        dx = math.floor(position.x) - self.origin_x
+        dz = math.floor(position.z) - self.origin_z
+        if 0 <= dx < self.width and 0 <= dz < self.depth:
+            return dz * self.width + dx
+        return None
+
+    def node(self, position) -> Optional[int]:
+        """
+        The node that position is on: the level of its column nearest to its height.  None if it is outside the graph,
+        or there is nowhere to stand in its column.
+        """
+        column = self.column(position)
+        if column is None:
+            return None
+        levels = self.levels
+        best = None
+        best_distance = math.inf
+        for node in range(self.column_starts[column], self.column_starts[column + 1]):
+            distance = abs(levels[node] - position.y)
+            if distance < best_distance:
+                best, best_distance = node, distance
+        return best
+
+    def node_position(self, node: int) -> Point:
+        """
+        Where a bot stands on a node, in the middle of its column
+        """
+        column = bisect.bisect_right(self.column_starts, node) - 1
+        dz, dx = divmod(column, self.width)
+        return Point(self.origin_x + dx + 0.5, self.levels[node], self.origin_z + dz + 0.5)
+
+    def key_point_near(self, position, radius: float = 4) -> Optional[str]:
+        """
+        The name of the key point within radius blocks of position, if there is one
+        """
+        radius_sq = radius * radius
+        for name, key_point in self.key_points.items():
+            if key_point.distanceSquared(position) <= radius_sq:
+                return name
+        return None
+
+    def route(self, start, key_point: str, max_length: int = 100000) -> List[Point]:
+        """
+        The positions of the nodes on the route from start to a key point, not including start.
+        Empty if start is not in the graph or there is no route from it.
+        """
+        next_nodes = self.next_nodes[key_point]
+        node = self.node(start)
+        route = []
+        if node is None or next_nodes[node] == UNREACHABLE:
+            return route
+        while len(route) < max_length:
+            following = next_nodes[node]
+            if following == node:
+                break
+            node = following
+            route.append(self.node_position(node))
+        return route
+
+    def waypoint(self, start, target, lookahead: int = 16) -> Optional[Point]:
+        """
+        The point lookahead nodes along the route from start to target, to give to the pathfinder instead of target.
+        None if target is not near a key point, if there is no route, or if target is less than lookahead nodes away,
+        in which case the pathfinder should go straight to target.
+        """
+        key_point = self.key_point_near(target)
+        if key_point is None:
+            return None
+        node = self.node(start)
+        if node is None:
+            return None
+        key = (key_point, node, lookahead)
+        if key in self._waypoints:
+            self._waypoints.move_to_end(key)
+            return self._waypoints[key]
+
+        next_nodes = self.next_nodes[key_point]
+        waypoint = None
+        if next_nodes[node] != UNREACHABLE:
+            for _ in range(lookahead):
+                following = next_nodes[node]
+                if following == node:
+                    break
+                node = following
+            else:
+                if next_nodes[node] != node:
+                    waypoint = self.node_position(node)
+
+        self._waypoints[key] = waypoint
+        if len(self._waypoints) > self.cache_size:
+            self._waypoints.popitem(last=False)
+        return waypoint
+
+
+class _Levels:
+    """
+    The standing spots of a scanned arena, while the graph is being built
+    """
+
+    def __init__(self, width: int, depth: int):
+        self.width = width
+        self.depth = depth
+        self.column_starts = array('i', [0])
+        self.levels = array('h')
+        # how many blocks are open above each node, counting the two the bot stands in
+        self.headroom = array('h')
+        self.node_columns = array('i')
+
+    def add_column(self, column: int, spots: List[Tuple[int, int]]):
+        # columns have to be added in order
+        for y, headroom in spots:
+            self.levels.append(y)
+            self.headroom.append(headroom)
+            self.node_columns.append(column)
+        self.column_starts.append(len(self.levels))
+
+    def nodes(self, column: int) -> range:
+        return range(self.column_starts[column], self.column_starts[column + 1])
+
+
+def _can_move(levels: _Levels, source: int, destination: int) -> bool:
+    """
+    Whether the bot can walk, jump or drop from the source node to the destination node in a neighbouring column
+    """
+    y = levels.levels[source]
+    destination_y = levels.levels[destination]
+    climb = destination_y - y
+    if climb > MAX_CLIMB or -climb > MAX_DROP:
+        return False
+    if climb > 0:
+        # jumping up, in the source column
+        return y + levels.headroom[source] >= destination_y + BOT_HEIGHT
+    # stepping across at the source height and dropping, in the destination column
+    return destination_y + levels.headroom[destination] >= y + BOT_HEIGHT
+
+
+def _flow_field(levels: _Levels, goal: int) -> array:
+    """
+    Dijkstra out from goal.  Returns the next node on the shortest route to goal from every node.
+    """
+    width, depth = levels.width, levels.depth
+    size = len(levels.levels)
+    heights = levels.levels
+    next_nodes = array('i', [UNREACHABLE]) * size
+    distances = [math.inf] * size
+    distances[goal] = 0.0
+    next_nodes[goal] = goal
+    queue = [(0.0, goal)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if distance > distances[node]:
+            continue
+        dz, dx = divmod(levels.node_columns[node], width)
+        height = heights[node]
+        # every node the bot could move to this one from
+        for mx, mz, cost in MOVES:
+            nx = dx - mx
+            nz = dz - mz
+            if not (0 <= nx < width and 0 <= nz < depth):
+                continue
+            for neighbour in levels.nodes(nz * width + nx):
+                if not _can_move(levels, neighbour, node):
+                    continue
+                if mx and mz:
+                    # don't cut corners: the columns beside a diagonal move need a spot the bot can pass through too
+                    if not all(any(_can_move(levels, neighbour, side) and _can_move(levels, side, node)
+                                   for side in levels.nodes(side_column))
+                               for side_column in (nz * width + dx, dz * width + nx)):
+                        continue
+                neighbour_distance = distance + cost + CLIMB_COST * max(0, height - heights[neighbour])
+                if neighbour_distance < distances[neighbour]:
+                    distances[neighbour] = neighbour_distance
+                    next_nodes[neighbour] = node
+                    heapq.heappush(queue, (neighbour_distance, neighbour))
+    return next_nodes
+
+
+def _nearest_node(levels: _Levels, origin_x: int, origin_z: int, position: Point, radius: int = 3) -> Optional[int]:
+    x = math.floor(position.x) - origin_x
+    z = math.floor(position.z) - origin_z
+    best = None
+    best_distance = math.inf
+    for dz in range(max(0, z - radius), min(levels.depth, z + radius + 1)):
+        for dx in range(max(0, x - radius), min(levels.width, x + radius + 1)):
+            for node in levels.nodes(dz * levels.width + dx):
+                distance = (dx - x) ** 2 + (dz - z) ** 2 + (levels.levels[node] - position.y) ** 2
+                if distance < best_distance:
+                    best, best_distance = node, distance
+    return best
+
+
+def scan_levels(bot, min_x: int, min_z: int, max_x: int, max_z: int, min_y: int, max_y: int) -> _Levels:
+    """
+    Scan the arena for every height a bot can stand at in every column.  This reads every block of the arena over the
+    bridge, so it is slow: it is meant to be run once, offline, never during a match.
+
+    Args:
+        bot: An RGBot that is in the arena
+        min_x, min_z, max_x, max_z: The corners of the area to scan, inclusive
+        min_y, max_y: The range of heights to look for places to stand in
+    """
+    from utilities import to_vec3
+    mineflayer = bot.mineflayer()
+    width = max_x - min_x + 1
+    depth = max_z - min_z + 1
+    levels = _Levels(width, depth)
+
+    for dz in range(depth):
+        for dx in range(width):
+            x = min_x + dx
+            z = min_z + dz
+            # from the block under min_y to the one over max_y: True for solid blocks, False for ones the bot can move
+            # through, None for ones it must not (lava, or unloaded)
+            blocks: List[Optional[bool]] = []
+            for y in range(min_y - 1, max_y + 2):
+                block = mineflayer.blockAt(to_vec3(Point(x, y, z)))
+                if not block:
+                    blocks.append(None)
+                elif block.boundingBox == 'block':
+                    blocks.append(True)
+                else:
+                    blocks.append(None if block.name == 'lava' else False)
+
+            spots = []
+            for i in range(1, len(blocks) - 1):
+                if blocks[i - 1] is True and blocks[i] is False and blocks[i + 1] is False:
+                    headroom = 2
+                    while i + headroom < len(blocks) and blocks[i + headroom] is False:
+                        headroom += 1
+                    spots.append((min_y + i - 1, headroom))
+            levels.add_column(dz * width + dx, spots)
+        logger.info('[Navigation] Scanned %d of %d rows', dz + 1, depth)
+    return levels
+
+
+def build_graph(bot, key_points: Dict[str, Point], margin: int = 24, min_y: int = 40, max_y: int = 100) -> NavigationGraph:
+    """
+    Scan the arena around the key points and build the route to each of them.
+
+    Args:
+        bot: An RGBot that is in the arena
+        key_points: The points to build routes to, by name
+        margin: How many blocks beyond the key points to scan.  Defaults to 24
+        min_y, max_y: The range of heights to look for places to stand in
+    """
+    min_x = math.floor(min(p.x for p in key_points.values())) - margin
+    max_x = math.floor(max(p.x for p in key_points.values())) + margin
+    min_z = math.floor(min(p.z for p in key_points.values())) - margin
+    max_z = math.floor(max(p.z for p in key_points.values())) + margin
+    levels = scan_levels(bot, min_x, min_z, max_x, max_z, min_y, max_y)
+
+    next_nodes = {}
+    for name, key_point in key_points.items():
+        goal = _nearest_node(levels, min_x, min_z, key_point)
+        if goal is None:
+            logger.warning('[Navigation] There is nowhere to stand near %s at %s, leaving it out', name, key_point)
+            continue
+        next_nodes[name] = _flow_field(levels, goal)
+    return NavigationGraph(min_x, min_z, levels.width, levels.depth, levels.column_starts, levels.levels,
+                           {name: p for name, p in key_points.items() if name in next_nodes}, next_nodes)
+
+
+def arena_key_points(rg_ctf_utils, extra: Optional[Dict[str, Point]] = None) -> Dict[str, Point]:
+    """
+    The key points of the CTF arena: the flag spawn, both score locations and the bridge blockade spots
+    """
+    from strategy import blue_block_placements, red_block_placements
+    key_points = {
+        'flag_spawn': point_from_vec3(rg_ctf_utils.FLAG_SPAWN),
+        'blue_score': point_from_vec3(rg_ctf_utils.BLUE_SCORE_LOCATION),
+        'red_score': point_from_vec3(rg_ctf_utils.RED_SCORE_LOCATION),
+        # the blockade spots are 2 high, route to the bottom of each
+        'blue_blockade_north': blue_block_placements[0],
+        'blue_blockade_south': blue_block_placements[2],
+        'red_blockade_north': red_block_placements[0],
+        'red_blockade_south': red_block_placements[2],
+    }
+    key_points.update(extra or {})
+    return key_points
+
+
+def _write_array(f, values: array):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    values.tofile(f)
+
+
+def save_graph(graph: NavigationGraph, path: str):
+    """
+    Write the graph as: the header, the column starts as int32s, the levels as int16s, then each key point followed by
+    its next nodes as int32s.  Everything is little endian.
+    """
+    nodes = len(graph.levels)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(graph.key_points), graph.origin_x, graph.origin_z, graph.width,
+                            graph.depth, nodes))
+        _write_array(f, array('i', graph.column_starts))
+        _write_array(f, array('h', graph.levels))
+        if nodes % 2:
+            # keep the int32 arrays 4 byte aligned
+            f.write(b'\0\0')
+        for name, key_point in graph.key_points.items():
+            f.write(KEY_POINT.pack(name.encode('utf-8')[:24], key_point.x, key_point.y, key_point.z))
+            _write_array(f, array('i', graph.next_nodes[name]))
+
+
+def load_graph(path: str) -> NavigationGraph:
+    """
+    Memory map a graph written by save_graph
+    """
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(data)
+    magic, version, key_count, origin_x, origin_z, width, depth, nodes = HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} navigation graph')
+
+    def read(offset: int, count: int, typecode: str, item_size: int) -> Sequence[int]:
+        chunk = view[offset:offset + count * item_size]
+        if sys.byteorder == 'little':
+            return chunk.cast(typecode)
+        values = array(typecode, chunk)
+        values.byteswap()
+        return values
+
+    offset = HEADER.size
+    column_starts = read(offset, width * depth + 1, 'i', 4)
+    offset += (width * depth + 1) * 4
+    levels = read(offset, nodes, 'h', 2)
+    offset += nodes * 2 + (2 if nodes % 2 else 0)
+    key_points = {}
+    next_nodes = {}
+    for _ in range(key_count):
+        name, x, y, z = KEY_POINT.unpack_from(view, offset)
+        name = name.rstrip(b'\0').decode('utf-8')
+        offset += KEY_POINT.size
+        key_points[name] = Point(x, y, z)
+        next_nodes[name] = read(offset, nodes, 'i', 4)
+        offset += nodes * 4
+    return NavigationGraph(origin_x, origin_z, width, depth, column_starts, levels, key_points, next_nodes)
+
+
+def load_default(rg_ctf_utils) -> Optional[NavigationGraph]:
+    """
+    Load the graph from RG_NAV_FILE, if there is one and it was built for this arena
+    """
+    path = os.environ.get('RG_NAV_FILE', DEFAULT_PATH)
+    if not os.path.exists(path):
+        return None
+    try:
+        graph = load_graph(path)
+    except (OSError, ValueError, struct.error) as exc:
+        logger.warning('[Navigation] Could not load the navigation graph from %s: %s', path, exc)
+        return None
+    flag_spawn = graph.key_points.get('flag_spawn')
+    if flag_spawn is None or flag_spawn != point_from_vec3(rg_ctf_utils.FLAG_SPAWN):
+        logger.warning('[Navigation] The navigation graph in %s was built for a different arena, not using it', path)
+        return None
+    logger.info('[Navigation] Loaded a %dx%d navigation graph with %d nodes and %d key points from %s',
+                graph.width, graph.depth, len(graph.levels), len(graph.key_points), path)
+    return graph
+
+
+def _parse_key_point(text: str) -> Tuple[str, Point]:
+    name, coordinates = text.split('=')
+    x, y, z = (float(c) for c in coordinates.split(','))
+    return name, Point(x, y, z)
+
+
+def _connected_bot(factory_path: str):
+    """
+    A bot from a launcher.py bot factory, once it has spawned in the arena
+    """
+    from launcher import load_factory
+    from regression_games import RGEventHandler
+    bot, run = load_factory(factory_path)(0, {})
+    spawned = threading.Event()
+    RGEventHandler(bot, 'spawn')(lambda *args: spawned.set())
+    threading.Thread(target=run, name='rg-nav-bot', daemon=True).start()
+    spawned.wait()
+    return bot
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the navigation graph of the CTF arena')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--simulator', action='store_true', help='scan the simulated arena')
+    source.add_argument('--factory', metavar='MODULE:FUNCTION',
+                        help='scan the arena from a bot created by this launcher.py bot factory, like one connected to a practice server')
+    parser.add_argument('--output', default=os.environ.get('RG_NAV_FILE', DEFAULT_PATH))
+    parser.add_argument('--margin', type=int, default=24, help='blocks to scan beyond the key points')
+    parser.add_argument('--min-y', type=int, default=40, help='the lowest height to look for places to stand')
+    parser.add_argument('--max-y', type=int, default=100, help='the highest height to look for places to stand')
+    parser.add_argument('--key-point', action='append', default=[], metavar='NAME=X,Y,Z',
+                        help='an extra point to build routes to, like an item spawn')
+    args = parser.parse_args(argv)
+    extra = dict(_parse_key_point(text) for text in args.key_point)
+
+    if args.simulator:
+        os.environ['RG_BACKEND'] = 'simulator'
+        import simulator
+        bot = simulator.create_world(speed=0, blocking_goto=False).bot
+        for i, item_spawn in enumerate(simulator.ITEM_SPAWNS):
+            extra.setdefault(f'item_spawn_{i}', item_spawn)
+        min_y, max_y = simulator.GROUND_Y - 8, simulator.GROUND_Y + 8
+    else:
+        bot = _connected_bot(args.factory)
+        min_y, max_y = args.min_y, args.max_y
+
+    from regression_games import RGCTFUtils
+    graph = build_graph(bot, arena_key_points(RGCTFUtils(bot), extra), args.margin, min_y, max_y)
+    save_graph(graph, args.output)
+    print(f'[Navigation] Wrote a {graph.width}x{graph.depth} graph with {len(graph.levels)} nodes and '
+          f'{len(graph.key_points)} key points to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
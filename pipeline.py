@@ -0,0 +1,130 @@
+"""
+A data driven pipeline for the strategies.
+
+Each strategy declares the facts about the tick that it needs with @requires, like @requires('has_flag') or
+@requires('!flag_loose') for a fact that has to be false.  The pipeline evaluates each fact at most once per tick, the
+first time a strategy asks for it, and skips a strategy without calling it when one of its facts doesn't hold.  So the
+cheap checks that most strategies start with are shared instead of repeated, and adding a strategy doesn't add work
+to the ticks where it can't act.
+
+The order the strategies are tried in is a list of their names, so it can be different for each role (see
+strategy.ROLE_PRIORITIES).
+"""
+from typing import Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from records import EntitySnapshot
+
+if TYPE_CHECKING:
+    from snapshot import TickSnapshot
+
+# fact name -> fact(snapshot, opponents, teammates)
+FACTS: Dict[str, Callable[['TickSnapshot', List[EntitySnapshot], List[EntitySnapshot]], bool]] = {}
+
+
+def fact(name: str):
+    """
+    Register a fact that strategies can require
+    """
+    def register(function):
+        FACTS[name] = function
+        return function
+    return register
+
+
+def requires(*names: str):
+    """
+    Declare the facts a strategy needs.  Prefix a name with ! to require that the fact is false.
+    """
+    def declare(strategy):
+        strategy.requires = names
+        return strategy
+    return declare
+
+
+def strategy_name(strategy: Callable) -> str:
+    """
+    The name of a strategy without the handle_ prefix, which is also the role it gives the bot when it acts
+    """
+    name = strategy.__name__
+    return name[len('handle_'):] if name.startswith('handle_') else name
+
+
+@fact('health_low')
+def _health_low(snapshot, opponents, teammates) -> bool:
+    return snapshot.health <= 15
+
+
+@fact('has_flag')
+def _has_flag(snapshot, opponents, teammates) -> bool:
+    return snapshot.has_flag
+
+
+@fact('flag_loose')
+def _flag_loose(snapshot, opponents, teammates) -> bool:
+    return snapshot.flag_location is not None
+
+
+@fact('opponents_in_attack_range')
+def _opponents_in_attack_range(snapshot, opponents, teammates) -> bool:
+    # the same range handle_attack_nearby_opponent uses: 10 blocks, 5 if I have the flag
+    attack_range_sq = 25 if snapshot.has_flag else 100
+    return any(o.position.distanceSquared(snapshot.position) <= attack_range_sq for o in opponents)
+
+
+@fact('opponents_near_my_level')
+def _opponents_near_my_level(snapshot, opponents, teammates) -> bool:
+    # the opponents handle_placing_blocks looks out for: within 15 blocks, and not down in the tunnel
+    my_position = snapshot.position
+    return any(abs(o.position.y - my_position.y) < 5 and o.position.distanceSquared(my_position) < 225 for o in opponents)
+
+
+@fact('has_blocks')
+def _has_blocks(snapshot, opponents, teammates) -> bool:
+    return snapshot.inventory_index.best('blocks') is not None
+
+
+class Pipeline:
+    """
+    The strategies in priority order, each with the facts it needs looked up ahead of time
+    """
+
+    def __init__(self, strategies: List[Callable], order: Optional[List[str]] = None):
+        """
+        Args:
+            strategies: Every strategy that can be used
+            order: The names of the strategies to try (see strategy_name), in priority order.  Defaults to all of them,
+                in the order given
+        """
+        by_name = {strategy_name(s): s for s in strategies}
+        order = order if order is not None else list(by_name)
+        # (name, strategy, [(fact name, fact, value it needs)])
+        self.stages: List[Tuple[str, Callable, List[Tuple[str, Callable, bool]]]] = []
+        for name in order:
+            if name not in by_name:
+                raise ValueError(f'There is no strategy named {name}')
+            strategy = by_name[name]
+            needs = []
+            for requirement in getattr(strategy, 'requires', ()):
+                fact_name = requirement.lstrip('!')
+                if fact_name not in FACTS:
+                    raise ValueError(f'{name} requires {fact_name}, which is not a fact')
+                needs.append((fact_name, FACTS[fact_name], not requirement.startswith('!')))
+            self.stages.append((name, strategy, needs))
+
+    def run(self, snapshot: 'TickSnapshot', rg_ctf_utils, opponents: List[EntitySnapshot], teammates: List[EntitySnapshot]) -> Optional[str]:
+        """
+        Try the strategies in order until one of them takes an action, and return its name
+        """
+        facts: Dict[str, bool] = {}
+        for name, strategy, needs in self.stages:
+            ready = True
+            for fact_name, fact_function, value in needs:
+                known = facts.get(fact_name)
+                if known is None:
+                    known = facts[fact_name] = bool(fact_function(snapshot, opponents, teammates))
+                if known != value:
+                    ready = False
+                    break
+            if ready and strategy(snapshot, rg_ctf_utils, opponents, teammates):
+                return name
+        return None
@@ -0,0 +1,97 @@
+"""
+Python-side ranking of entities and items found near the bot.
+
+RGBot.findEntities and RGBot.findItemsOnGround accept Python value and sort functions, but the JS side then calls back
+into Python for every candidate, and those callbacks often call back into JS again.  Instead we fetch the raw candidates
+with a single find call, copy them once, and do all of the scoring, filtering and top-k selection in Python.
+"""
+import heapq
+from typing import Callable, Iterable, List, Optional
+from regression_games import RGBot
+from records import Point, EntitySnapshot, point_from_vec3, snapshot_entity, snapshot_item_entity
+from inventory import InventoryIndex
+
+
+def rank_nearest(candidates: Iterable[EntitySnapshot], origin: Point, max_count: int, max_distance: Optional[float] = None,
+                 max_y_delta: Optional[float] = None, weight: Optional[Callable[[EntitySnapshot], float]] = None) -> List[EntitySnapshot]:
+    """
+    Select the best max_count candidates, closest first.
+
+    Args:
+        candidates: The entities to choose from
+        origin: Where to measure distance from, usually my position
+        max_count: The maximum number of results
+        max_distance: Ignore anything further away than this. Defaults to no limit
+        max_y_delta: Ignore anything more than this many blocks above or below the origin, ie. down in the tunnel.
+            Defaults to no limit
+        weight: Multiplies the distance of each candidate, larger weights sort later. Defaults to 1 for all candidates
+
+    Returns: The selected candidates, sorted by weighted distance
+    """
+    max_distance_sq = max_distance ** 2 if max_distance is not None else None
+    scored = []
+    for index, candidate in enumerate(candidates):
+        position = candidate.position
+        if max_y_delta is not None and abs(position.y - origin.y) >= max_y_delta:
+            continue
+        distance_sq = position.distanceSquared(origin)
+        if max_distance_sq is not None and distance_sq > max_distance_sq:
+            continue
+        score = distance_sq ** 0.5
+        if weight:
+            score *= weight(candidate)
+        # the index keeps the sort stable and means we never compare EntitySnapshots
+        scored.append((score, index, candidate))
+    return [candidate for _, _, candidate in heapq.nsmallest(max_count, scored)]
+
+
+def find_players(bot: RGBot, names: List[str], origin: Point, max_count: int, max_distance: Optional[float] = 33) -> List[EntitySnapshot]:
+    """
+    Find the nearest players with one of the given names, closest first.
+
+    Args:
+        bot: RGBot instance
+        names: The usernames to look for.  If this is empty no players are returned.
+        origin: Where to measure distance from, usually my position
+        max_count: The maximum number of results
+        max_distance: The maximum distance to look, or None for no limit.  Bots can only see ~30 +/- blocks, so no need to search
+            further. Defaults to 33
+    """
+    if not names:
+        return []
+    options = {
+        'entityNames': names,
+        'attackable': True,
+        # there can't be more matches than names, so fetch them all and choose in Python
+        'maxCount': len(names)
+    }
+    if max_distance is not None:
+        options['maxDistance'] = max_distance
+    results = bot.findEntities(options)
+    # rank on position alone, then only copy the rest of the entities that were selected
+    candidates = [EntitySnapshot(entity, None, point_from_vec3(entity.position)) for entity in (r.result for r in results)]
+    return [snapshot_entity(c.entity, c.position) for c in rank_nearest(candidates, origin, max_count, max_distance)]
+
+
+def find_items(bot: RGBot, origin: Point, inventory: InventoryIndex, max_count: int, max_distance: float = 33,
+               max_y_delta: Optional[float] = None, candidate_count: int = 10) -> List[EntitySnapshot]:
+    """
+    Find the best items on the ground to collect, preferring the closest items that I don't already have.
+
+    Args:
+        bot: RGBot instance
+        origin: Where to measure distance from, usually my position
+        inventory: My inventory, see TickSnapshot.inventory_index
+        max_count: The maximum number of results
+        max_distance: The maximum distance to look. Defaults to 33
+        max_y_delta: Ignore items more than this many blocks above or below the origin. Defaults to no limit
+        candidate_count: How many of the nearest items to consider.  Only those can be ranked, so an item I don't have
+            is missed when at least this many items I already have are closer.  Defaults to 10
+    """
+    results = bot.findItemsOnGround({
+        'maxDistance': max_distance,
+        'maxCount': candidate_count
+    })
+    candidates = [snapshot_item_entity(r.result) for r in results]
+    # prioritize items I don't have that are the closest
+    return rank_nearest(candidates, origin, max_count, max_distance, max_y_delta, inventory.owned_weight)
@@ -0,0 +1,106 @@
+"""
+Plain Python copies of the JS objects we read from the bot.
+
+Every attribute read on a JS object is a round trip to the Node process.  The main loop copies what it needs into
+these objects once per tick and the strategies then do all of their math on the copies.
+"""
+import math
+from typing import Optional
+
+
+class Point:
+    """
+    A Python x, y, z position.  This implements the parts of the vec3 API that our bot code uses
+    (x/y/z, offset, distanceSquared, distanceTo), so it can be used anywhere we read from a Vec3.
+    Use utilities.to_vec3 before handing one to a JS function.
+    """
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x: float, y: float, z: float):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def offset(self, dx: float, dy: float, dz: float) -> 'Point':
+        return Point(self.x + dx, self.y + dy, self.z + dz)
+
+    def distanceSquared(self, other) -> float:
+        dx = self.x - other.x
+        dy = self.y - other.y
+        dz = self.z - other.z
+        return dx * dx + dy * dy + dz * dz
+
+    def distanceTo(self, other) -> float:
+        return math.sqrt(self.distanceSquared(other))
+
+    def valueOf(self) -> dict:
+        return {'x': self.x, 'y': self.y, 'z': self.z}
+
+    def __eq__(self, other):
+        return isinstance(other, Point) and self.x == other.x and self.y == other.y and self.z == other.z
+
+    def __hash__(self):
+        return hash((self.x, self.y, self.z))
+
+    def __str__(self):
+        return f'{self.x:.2f}, {self.y:.2f}, {self.z:.2f}'
+
+    def __repr__(self):
+        return f'Point({self.x}, {self.y}, {self.z})'
+
+
+def point_from_vec3(vec) -> Optional[Point]:
+    """
+    Copy a JS Vec3 into a Point in a single round trip.  Returns None if vec is None, and vec itself if it is already a Point.
+    """
+    if vec is None or isinstance(vec, Point):
+        return vec
+    value = vec.valueOf()
+    return Point(value['x'], value['y'], value['z'])
+
+
+class EntitySnapshot:
+    """
+    The parts of a prismarine Entity that our strategies look at, copied once per tick.
+    The original JS entity is kept so that actions like RGBot.attackEntity can still be performed on it.
+    """
+    __slots__ = ('entity', 'name', 'position', 'health', 'held_item_name')
+
+    def __init__(self, entity, name: str, position: Point, health: Optional[float] = None, held_item_name: Optional[str] = None):
+        self.entity = entity
+        self.name = name
+        self.position = position
+        self.health = health
+        self.held_item_name = held_item_name
+
+    def copy(self) -> 'EntitySnapshot':
+        return EntitySnapshot(self.entity, self.name, self.position, self.health, self.held_item_name)
+
+    def __repr__(self):
+        return f'EntitySnapshot({self.name!r}, {self.position!r})'
+
+
+def snapshot_entity(entity, position: Optional[Point] = None) -> EntitySnapshot:
+    """
+    Copy a JS Entity (a player or mob) into an EntitySnapshot.  Pass position if it has already been copied.
+    """
+    held_item = entity.heldItem
+    return EntitySnapshot(
+        entity,
+        entity.username or entity.name,
+        position or point_from_vec3(entity.position),
+        entity.health,
+        held_item.name if held_item else None
+    )
+
+
+def snapshot_item_entity(entity) -> EntitySnapshot:
+    """
+    Copy a JS Entity for an item on the ground into an EntitySnapshot, named after the item it holds
+    """
+    item = entity.getDroppedItem()
+    return EntitySnapshot(
+        entity,
+        item.name if item else entity.name,
+        point_from_vec3(entity.position)
+    )
@@ -1,22 +1,90 @@
-from rg_javascript import require, On
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+_started = time.perf_counter()
+
+# RG_BACKEND=simulator swaps the JS modules for the pure Python stand-ins in simulator.py, so the bot can be run offline
+if os.environ.get('RG_BACKEND') == 'simulator':
+    from simulator import require, On
+else:
+    from rg_javascript import require, On
 
 RG_BOT_VERSION = '1.10.0'
 RG_CTF_UTILS_VERSION = '1.0.5'
 MINEFLAYER_VERSION = '4.5.1'
 
-# Because of how we load these JS modules to be used in Python, we 
+# how long loading each JS module took, in seconds, in the order they were loaded.  Every module is loaded the first
+# time it is used, so a bot only pays for the modules it needs, when it needs them.
+load_timings: Dict[str, float] = {'rg_javascript': time.perf_counter() - _started}
+
+_modules: Dict[Tuple[str, Optional[str]], object] = {}
+_lock = threading.Lock()
+
+
+def _require(name: str, version: Optional[str]):
+    key = (name, version)
+    module = _modules.get(key)
+    if module is None:
+        with _lock:
+            module = _modules.get(key)
+            if module is None:
+                started = time.perf_counter()
+                module = _modules[key] = require(name, version) if version else require(name)
+                load_timings[name] = time.perf_counter() - started
+    return module
+
+
+class LazyRequire:
+    """
+    A JS module, or something exported by one, that is only required the first time it is used.  Reading an attribute
+    or calling it loads it.  To pass it to a JS function as a value (like a plugin to loadPlugin), pass load().
+    """
+    __slots__ = ('_name', '_version', '_path', '_value')
+
+    def __init__(self, name: str, version: Optional[str] = None, path: Tuple[str, ...] = ()):
+        self._name = name
+        self._version = version
+        # the attributes to follow from the module to the export
+        self._path = path
+        self._value = None
+
+    def load(self):
+        value = self._value
+        if value is None:
+            value = _require(self._name, self._version)
+            for attribute in self._path:
+                value = getattr(value, attribute)
+            self._value = value
+        return value
+
+    def __getattr__(self, name):
+        # typing and copy look for special attributes, which shouldn't load the module
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"LazyRequire({'.'.join((self._name,) + self._path)})"
+
+
+# Because of how we load these JS modules to be used in Python, we
 # define everything here to abstract away the "JS"-ness of it
 # TODO: We can attach types here for easier development
-mineflayer_pathfinder = require('mineflayer-pathfinder')
-mineflayer = require('mineflayer', MINEFLAYER_VERSION)
-rg_match_info = require('rg-match-info')
-Vec3 = require('vec3').Vec3
-RGBot = require('rg-bot', RG_BOT_VERSION).RGBot
-FindResult = require('rg-bot', RG_BOT_VERSION).FindResult
-RGCTFUtils = require('rg-ctf-utils', RG_CTF_UTILS_VERSION).RGCTFUtils
-CTFEvent = require('rg-ctf-utils', RG_CTF_UTILS_VERSION).CTFEvent
-armorManager = require('mineflayer-armor-manager')
-Item = require('prismarine-item').Item
-Entity = require('prismarine-entity').Entity
-goals = mineflayer_pathfinder.goals
+mineflayer_pathfinder = LazyRequire('mineflayer-pathfinder')
+mineflayer = LazyRequire('mineflayer', MINEFLAYER_VERSION)
+rg_match_info = LazyRequire('rg-match-info')
+Vec3 = LazyRequire('vec3', path=('Vec3',))
+RGBot = LazyRequire('rg-bot', RG_BOT_VERSION, ('RGBot',))
+FindResult = LazyRequire('rg-bot', RG_BOT_VERSION, ('FindResult',))
+RGCTFUtils = LazyRequire('rg-ctf-utils', RG_CTF_UTILS_VERSION, ('RGCTFUtils',))
+CTFEvent = LazyRequire('rg-ctf-utils', RG_CTF_UTILS_VERSION, ('CTFEvent',))
+armorManager = LazyRequire('mineflayer-armor-manager')
+Item = LazyRequire('prismarine-item', path=('Item',))
+Entity = LazyRequire('prismarine-entity', path=('Entity',))
+goals = LazyRequire('mineflayer-pathfinder', path=('goals',))
 RGEventHandler = On
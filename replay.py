@@ -0,0 +1,643 @@
+"""
+Records what the strategies saw and did on every tick of a match, and replays it offline.
+
+Set RG_REPLAY_DIR and every match is recorded to its own file in that directory.  Each main loop pass appends one
+record with the inputs the strategies read (my state, the players, the items and blocks they looked up, where my bot
+was already heading) and the decision they made (the role, and the actions taken: attacks, moves, items used, blocks
+placed).  Reads and actions are captured in Python, from the snapshot and a thin proxy around the bot, so recording
+adds no bridge calls.
+
+    python replay.py replays/BLUE-1-1700000000.rgr
+
+feeds the recorded ticks back through the strategies with no Minecraft server (on the simulator backend), checks that
+they make the same decisions, and reports how fast they ran.  Use it to reproduce a misplay, to benchmark decision
+logic on real traffic, or to check that a refactor still makes the same decisions.
+
+The file format is append only: a sequence of records, each a 4 byte little endian length followed by one value in a
+compact tagged binary encoding (see pack).  The first record is the match header.
+
+Environment variables (all optional):
+    RG_REPLAY_DIR: record every match to a file in this directory.  Defaults to off
+"""
+import argparse
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from records import Point, EntitySnapshot, point_from_vec3
+
+VERSION = 5
+SUFFIX = '.rgr'
+
+LENGTH = struct.Struct('<I')
+INT = struct.Struct('<q')
+DOUBLE = struct.Struct('<d')
+
+
+# --- encoding ---
+
+def _pack(value, out: bytearray):
+    if value is None:
+        out += b'N'
+    elif value is True:
+        out += b'T'
+    elif value is False:
+        out += b'F'
+    elif isinstance(value, int):
+        out += b'i'
+        out += INT.pack(value)
+    elif isinstance(value, float):
+        out += b'd'
+        out += DOUBLE.pack(value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        out += b's'
+        out += LENGTH.pack(len(data))
+        out += data
+    elif isinstance(value, (list, tuple)):
+        out += b'l'
+        out += LENGTH.pack(len(value))
+        for item in value:
+            _pack(item, out)
+    elif isinstance(value, dict):
+        out += b'm'
+        out += LENGTH.pack(len(value))
+        for key, item in value.items():
+            _pack(key, out)
+            _pack(item, out)
+    else:
+        raise TypeError(f'Cannot record a {type(value).__name__}')
+
+
+def pack(value) -> bytes:
+    """
+    Encode None, bools, ints, floats, strings and lists and dicts of them.  Each value is a one byte tag followed by
+    its data, like msgpack but without the dependency.
+    """
+    out = bytearray()
+    _pack(value, out)
+    return bytes(out)
+
+
+def _unpack(data: memoryview, offset: int) -> Tuple[Any, int]:
+    tag = data[offset]
+    offset += 1
+    if tag == 0x4E:  # N
+        return None, offset
+    if tag == 0x54:  # T
+        return True, offset
+    if tag == 0x46:  # F
+        return False, offset
+    if tag == 0x69:  # i
+        return INT.unpack_from(data, offset)[0], offset + INT.size
+    if tag == 0x64:  # d
+        return DOUBLE.unpack_from(data, offset)[0], offset + DOUBLE.size
+    length = LENGTH.unpack_from(data, offset)[0]
+    offset += LENGTH.size
+    if tag == 0x73:  # s
+        return str(data[offset:offset + length], 'utf-8'), offset + length
+    if tag == 0x6C:  # l
+        items = []
+        for _ in range(length):
+            item, offset = _unpack(data, offset)
+            items.append(item)
+        return items, offset
+    if tag == 0x6D:  # m
+        mapping = {}
+        for _ in range(length):
+            key, offset = _unpack(data, offset)
+            mapping[key], offset = _unpack(data, offset)
+        return mapping, offset
+    raise ValueError(f'Unknown tag {tag:#x} at offset {offset - 1}')
+
+
+def unpack(data: bytes):
+    return _unpack(memoryview(data), 0)[0]
+
+
+def read_records(path: str) -> List[dict]:
+    """
+    Every complete record in a replay file.  A record cut short (if the bot was killed mid-write) is ignored.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    records = []
+    offset = 0
+    while offset + LENGTH.size <= len(data):
+        length = LENGTH.unpack_from(data, offset)[0]
+        offset += LENGTH.size
+        if offset + length > len(data):
+            break
+        records.append(unpack(data[offset:offset + length]))
+        offset += length
+    return records
+
+
+def _xyz(point: Optional[Point]) -> Optional[list]:
+    return [point.x, point.y, point.z] if point is not None else None
+
+
+def _point(xyz: Optional[list]) -> Optional[Point]:
+    return Point(*xyz) if xyz is not None else None
+
+
+def movement_state(movement) -> list:
+    """
+    Where a MovementManager is heading: [target, goal, reach, moving, arrived]
+    """
+    return [_xyz(movement.target), _xyz(movement.goal), movement.reach, movement.moving, movement.arrived]
+
+
+# --- capturing actions ---
+
+class ActionLog:
+    """
+    The reads and actions of one tick
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.actions: List[list] = []
+
+    def entity_name(self, entity) -> Optional[str]:
+        for player in self.snapshot.world.players.values():
+            if player.entity is entity:
+                return player.name
+        return None
+
+    def item_name(self, item) -> Optional[str]:
+        for inventory_item, name in zip(self.snapshot.inventory, self.snapshot.inventory_names):
+            if inventory_item is item:
+                return name
+        return None
+
+
+class _Recording:
+    """
+    Stands in for the bot, its mineflayer() and its pathfinder while the strategies run, recording the actions they take
+    """
+    __slots__ = ('_target', '_log')
+
+    def __init__(self, target, log: ActionLog):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_log', log)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        log = self._log
+        if name == 'mineflayer':
+            return lambda: _Recording(value(), log)
+        if name == 'pathfinder':
+            return _Recording(value, log)
+        record = _RECORDED.get(name)
+        if record is None:
+            return value
+
+        def action(*args):
+            log.actions.append(record(log, *args))
+            return value(*args)
+        return action
+
+
+# how each recorded method call is logged
+_RECORDED = {
+    'attackEntity': lambda log, entity, *args: ['attack', log.entity_name(entity)],
+    'holdItem': lambda log, item, *args: ['hold', log.item_name(item) if not isinstance(item, str) else item],
+    'activateItem': lambda log, *args: ['activate'],
+    'equip': lambda log, item, destination, *args: ['equip', log.item_name(item), destination],
+    'unequip': lambda log, destination, *args: ['unequip', destination],
+    'placeBlock': lambda log, *args: ['place_block'],
+    'lookAt': lambda log, *args: ['look'],
+}
+
+
+class ReplayRecorder:
+    """
+    Writes one record per main loop pass to a replay file, one file per match
+    """
+
+    def __init__(self, directory: str, username: str, rg_ctf_utils):
+        self.directory = directory
+        self.username = username
+        # the arena is the same for every match, read it once up front
+        self.arena = {
+            'flag_suffix': rg_ctf_utils.FLAG_SUFFIX,
+            'flag_spawn': _xyz(point_from_vec3(rg_ctf_utils.FLAG_SPAWN)),
+            'blue_score': _xyz(point_from_vec3(rg_ctf_utils.BLUE_SCORE_LOCATION)),
+            'red_score': _xyz(point_from_vec3(rg_ctf_utils.RED_SCORE_LOCATION)),
+        }
+        self.file = None
+        self.path: Optional[str] = None
+        self.log: Optional[ActionLog] = None
+        self._movement = None
+        self._players = None
+        self._match = None
+        self._ended = False
+        # the match events arrive on the event thread, the ticks on the main loop's
+        self._lock = threading.RLock()
+
+    def start_match(self):
+        """
+        Start a new replay file
+        """
+        with self._lock:
+            self.close()
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, f'{self.username}-{int(time.time() * 1000)}{SUFFIX}')
+            self.file = open(self.path, 'ab', buffering=0)
+            self._match = None
+            self._ended = False
+            self._write({'version': VERSION, 'username': self.username, 'started': time.time(), **self.arena})
+
+    def end_match(self):
+        with self._lock:
+            self.close()
+            self._ended = True
+
+    def begin_tick(self, snapshot):
+        """
+        Start recording a pass: the strategies act through a recording proxy of the bot from here on
+        """
+        with self._lock:
+            if not self.file and not self._ended:
+                # I joined after the match started
+                self.start_match()
+        self.log = ActionLog(snapshot)
+        self._movement = movement_state(snapshot.world.movement)
+        # the players as the snapshot saw them, events may move them before the tick ends
+        self._players = [[p.name, p.position.x, p.position.y, p.position.z, p.health, p.held_item_name]
+                         for p in snapshot.world.players.values()]
+        snapshot.bot = _Recording(snapshot.bot, self.log)
+
+    def moved(self, target: Point, reach: float):
+        if self.log:
+            self.log.actions.append(['move', _xyz(target), reach])
+
+    def equipped(self, kind: str, name: str, detail):
+        if self.log:
+            self.log.actions.append([kind, name, detail])
+
+    def end_tick(self, snapshot, role: Optional[str]):
+        log = self.log
+        self.log = None
+        if log is None:
+            return
+        world = snapshot.world
+        record = {
+            'tick': world.tick,
+            'game_tick': world.game_tick,
+            'position': _xyz(snapshot.position),
+            'health': snapshot.health,
+            'inventory': [[name, raw] for name, raw in zip(snapshot.inventory_index.names, snapshot.inventory_index.raw_names)],
+            'flag': _xyz(snapshot.flag_location),
+            'carrier': world.flag_carrier,
+            'players': self._players,
+            'remote': [[p.name, p.position.x, p.position.y, p.position.z, p.health] for p in snapshot.remote_opponents],
+            'items': [[i.name, i.position.x, i.position.y, i.position.z] for i in snapshot.items_found]
+                     if snapshot.items_found is not None else None,
+            'blocks': [[p.x, p.y, p.z, block_type] for p, block_type in world.blocks.types.items()],
+            'movement': self._movement,
+            'role': role,
+            'actions': log.actions,
+        }
+        # the teams only change between matches, so only record them when they do
+        match = [snapshot.my_team_name, snapshot.other_team_name, world.opponent_names, world.teammate_names, world.teammate_bot_names]
+        with self._lock:
+            if not self.file:
+                # the match ended during this tick
+                return
+            if match != self._match:
+                record['match'] = match
+                self._match = match
+            self._write(record)
+
+    def _write(self, record: dict):
+        data = pack(record)
+        self.file.write(LENGTH.pack(len(data)) + data)
+
+    def close(self):
+        with self._lock:
+            if self.file:
+                self.file.close()
+            self.file = None
+
+
+def enabled() -> bool:
+    return bool(os.environ.get('RG_REPLAY_DIR'))
+
+
+def install(world_state, rg_ctf_utils) -> ReplayRecorder:
+    """
+    Start recording every match of the bot to RG_REPLAY_DIR.  The recorder is kept on its WorldState.
+    """
+    recorder = world_state.recorder = ReplayRecorder(os.environ['RG_REPLAY_DIR'], world_state.username, rg_ctf_utils)
+    world_state.movement.listener = recorder.moved
+    world_state.equipment.listener = recorder.equipped
+    return recorder
+
+
+def begin_tick(snapshot):
+    recorder = snapshot.world.recorder
+    if recorder:
+        recorder.begin_tick(snapshot)
+
+
+def end_tick(snapshot, role: Optional[str]):
+    recorder = snapshot.world.recorder
+    if recorder:
+        recorder.end_tick(snapshot, role)
+
+
+def start_match(world_state):
+    if world_state.recorder:
+        world_state.recorder.start_match()
+
+
+def end_match(world_state):
+    if world_state.recorder:
+        world_state.recorder.end_match()
+
+
+# --- replaying ---
+
+class _ReplayEntity:
+    """
+    Stands in for the JS entity of a recorded player or item
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class _ReplayItem:
+    """
+    Stands in for a JS inventory item, with the names item_names reads
+    """
+    __slots__ = ('displayName', 'name', 'customName')
+
+    def __init__(self, display_name: str, name: str):
+        self.displayName = display_name
+        self.name = name
+        self.customName = None
+
+
+class _ReplayPathfinder:
+    def __init__(self, bot: '_ReplayBot'):
+        self.bot = bot
+
+    def goto(self, goal):
+        pass
+
+    def setGoal(self, goal, dynamic: bool = False):
+        pass
+
+    def stop(self):
+        pass
+
+
+class _ReplayMineflayer:
+    def __init__(self, bot: '_ReplayBot'):
+        self.pathfinder = _ReplayPathfinder(bot)
+        # nothing is emitted in a replay, so the inventory window can be the bot itself
+        self.inventory = bot
+
+    def blockAt(self, position):
+        return None
+
+    def lookAt(self, position, force: bool = False):
+        pass
+
+    def activateItem(self, off_hand: bool = False):
+        pass
+
+    def equip(self, item, destination: str):
+        pass
+
+    def unequip(self, destination: str):
+        pass
+
+    def placeBlock(self, reference_block, face_vector):
+        pass
+
+
+class _ReplayBot:
+    """
+    Stands in for the RGBot: reads come from the recording, actions do nothing
+    """
+
+    def __init__(self):
+        self.current_position: Optional[Point] = None
+        self._mineflayer = _ReplayMineflayer(self)
+
+    def mineflayer(self):
+        return self._mineflayer
+
+    def on(self, event: str, listener):
+        pass
+
+    def username(self):
+        return None
+
+    def position(self):
+        return self.current_position
+
+    def attackEntity(self, entity):
+        pass
+
+    def approachPosition(self, position, options=None):
+        pass
+
+    def holdItem(self, item):
+        return item
+
+
+class _ReplayUtils:
+    """
+    Stands in for RGCTFUtils, with the constants from the replay header
+    """
+
+    def __init__(self, header: dict):
+        self.FLAG_SUFFIX = header['flag_suffix']
+        self.FLAG_SPAWN = _point(header['flag_spawn'])
+        self.BLUE_SCORE_LOCATION = _point(header['blue_score'])
+        self.RED_SCORE_LOCATION = _point(header['red_score'])
+
+
+class _ReplayBlocks:
+    """
+    Stands in for the BlockCache, with the block types that were known during the recorded tick
+    """
+
+    def __init__(self):
+        self.types: Dict[Point, int] = {}
+        self.regions: Dict[str, List[Point]] = {}
+
+    def watch(self, name: str, positions):
+        from block_cache import _block_position
+        self.regions.setdefault(name, [_block_position(p) for p in positions])
+
+    def block_type(self, position) -> Optional[int]:
+        from block_cache import _block_position
+        return self.types.get(_block_position(position))
+
+    def air(self, name: str):
+        from block_cache import AIR
+        return (p for p in self.regions[name] if self.types.get(p) in (None, AIR))
+
+
+class _ReplayWorld:
+    """
+    Stands in for the WorldState, updated from each recorded tick
+    """
+
+    def __init__(self, header: dict):
+        from movement import MovementManager
+        from tracking import MotionTracker
+        from equipment import EquipmentManager
+        self.bot = _ReplayBot()
+        self.rg_ctf_utils = _ReplayUtils(header)
+        self.username = header['username']
+        self.match_info = {'replay': True}
+        self.blackboard = None
+        self.recorder = None
+        self.blocks = _ReplayBlocks()
+        self.movement = MovementManager(self.bot)
+        self.tracker = MotionTracker()
+        self.equipment = EquipmentManager(self.bot)
+        self.tick = 0
+        self.game_tick = 0
+        self.my_team_name = self.other_team_name = None
+        self.opponent_names: List[str] = []
+        self.teammate_names: List[str] = []
+        self.teammate_bot_names: List[str] = []
+
+    @property
+    def has_flag(self) -> bool:
+        return self.flag_carrier == self.username
+
+    def load(self, record: dict):
+        from inventory import InventoryIndex
+        if 'match' in record:
+            self.my_team_name, self.other_team_name, self.opponent_names, self.teammate_names, self.teammate_bot_names = record['match']
+        self.tick = record['tick']
+        self.game_tick = record['game_tick']
+        self.health = record['health']
+        index = InventoryIndex([_ReplayItem(name, raw) for name, raw in record['inventory']])
+        self.inventory_index = index
+        self.inventory = index.items
+        self.inventory_names = index.names
+        self.inventory_name_set = index.name_set
+        self.flag_location = _point(record['flag'])
+        self.flag_carrier = record['carrier']
+        self.players = {name: EntitySnapshot(_ReplayEntity(name), name, Point(x, y, z), health, held)
+                        for name, x, y, z, health, held in record['players']}
+        self.blocks.types = {Point(x, y, z): block_type for x, y, z, block_type in record['blocks']}
+        movement = self.movement
+        target, goal, movement.reach, movement.moving, movement.arrived = record['movement']
+        movement.target, movement.goal = _point(target), _point(goal)
+        self.bot.current_position = _point(record['position'])
+
+    def inventory_changed(self):
+        pass
+
+
+def replay(path: str, run=None) -> dict:
+    """
+    Run the strategies on every recorded tick of a replay file, and compare their decisions with the recorded ones.
+
+    Args:
+        path: The replay file
+        run: The function that runs the strategies, like strategy.run_strategies.  Defaults to that
+
+    Returns: The number of ticks, how many decisions matched, the first mismatches and the time taken
+    """
+    from snapshot import TickSnapshot
+    if run is None:
+        from strategy import run_strategies as run
+
+    class ReplaySnapshot(TickSnapshot):
+        def find_items(self, max_count, max_distance=33, max_y_delta=None, candidate_count=10):
+            recorded = self._recorded_items
+            self.items_found = [EntitySnapshot(_ReplayEntity(name), name, Point(x, y, z)) for name, x, y, z in recorded or []]
+            return self.items_found[:max_count]
+
+    records = read_records(path)
+    if not records or records[0].get('version') != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} replay')
+    header, ticks = records[0], records[1:]
+    world = _ReplayWorld(header)
+
+    log: Optional[ActionLog] = None
+
+    def moved(target: Point, reach: float):
+        log.actions.append(['move', _xyz(target), reach])
+
+    def equipped(kind: str, name: str, detail):
+        log.actions.append([kind, name, detail])
+
+    world.movement.listener = moved
+    world.equipment.listener = equipped
+    matched = 0
+    mismatches = []
+    elapsed = 0.0
+    for record in ticks:
+        world.load(record)
+        snapshot = ReplaySnapshot(world, world.bot.current_position)
+        snapshot._recorded_items = record['items']
+        snapshot.remote_opponents = [EntitySnapshot(None, name, Point(x, y, z), health) for name, x, y, z, health in record['remote']]
+        log = ActionLog(snapshot)
+        snapshot.bot = _Recording(world.bot, log)
+
+        started = time.perf_counter()
+        role = run(snapshot, snapshot.rg_ctf_utils, snapshot.opponents, snapshot.teammates)
+        elapsed += time.perf_counter() - started
+
+        if role == record['role'] and log.actions == record['actions']:
+            matched += 1
+        elif len(mismatches) < 20:
+            mismatches.append({'tick': record['tick'], 'recorded': [record['role'], record['actions']],
+                               'replayed': [role, log.actions]})
+
+    return {
+        'path': path,
+        'ticks': len(ticks),
+        'matched': matched,
+        'mismatches': mismatches,
+        'strategy_seconds': round(elapsed, 4),
+        'ticks_per_second': round(len(ticks) / elapsed, 1) if elapsed else 0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay recorded matches through the strategies')
+    parser.add_argument('paths', nargs='+', help='replay files')
+    parser.add_argument('--role', help='the RG_ROLE to replay with, defaults to the current RG_ROLE')
+    parser.add_argument('--strict', action='store_true', help='exit with an error if any decision differs')
+    args = parser.parse_args(argv)
+
+    # no Minecraft: the strategies only need the JS constructors (Vec3, goals), which the simulator provides
+    os.environ['RG_BACKEND'] = 'simulator'
+    os.environ.setdefault('RG_LOG_LEVEL', 'WARNING')
+    if args.role:
+        os.environ['RG_ROLE'] = args.role
+    from bot_logging import setup_logging
+    setup_logging()
+
+    import json
+    failed = False
+    for path in args.paths:
+        result = replay(path)
+        print(json.dumps(result, indent=2))
+        failed = failed or result['matched'] != result['ticks']
+    if args.strict and failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Schedules main loop passes on the server's tick grid.
+"""
+import logging
+import time
+import weakref
+from typing import Callable, Optional
+
+# Minecraft servers run at 20 ticks per second
+TICK_SECONDS = 0.05
+
+logger = logging.getLogger(__name__)
+
+# every scheduler in this process, so that launcher.py can report on them
+schedulers: 'weakref.WeakSet[TickScheduler]' = weakref.WeakSet()
+
+
+class TickScheduler:
+    """
+    Aligns main loop passes to server ticks.  Minecraft server runs at 20 ticks per second (50ms per tick), so executing
+    our bot main loop more frequently than every 50ms would re-process stale game state.  Executing more often than this
+    would waste CPU and starve the other bots on our team, which share our limited CPU resources.
+
+    Pass deadlines are on a fixed grid (start + n * period) read from a monotonic clock, so waits don't drift and a
+    late pass doesn't push every later pass back.  The scheduler counts:
+      - overruns: passes that took longer than the budget
+      - skipped ticks: deadlines that went by entirely while a pass was still running
+
+    When adaptive, the period grows by a tick at a time while passes are consistently over budget (usually because other
+    bots are using the same CPU), and shrinks back once they are comfortably under it.
+    """
+
+    def __init__(self, period: float = TICK_SECONDS, budget: Optional[float] = None, adaptive: bool = True,
+                 max_period: float = 4 * TICK_SECONDS, report_every: int = 600,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            period: The time between passes in seconds.  Defaults to one tick
+            budget: How long a pass may take before it counts as an overrun.  Defaults to the period
+            adaptive: Whether to lengthen the period while passes are over budget.  Defaults to True
+            max_period: The longest the period can get when adaptive.  Defaults to 4 ticks
+            report_every: Print the stats every this many passes, 0 to never print them.  Defaults to 600 (~30 seconds)
+            clock: The monotonic clock to read
+            sleep: The function used to wait for the next pass
+        """
+        self.base_period = period
+        self.period = period
+        self.budget = budget if budget is not None else period
+        self.adaptive = adaptive
+        self.max_period = max_period
+        self.report_every = report_every
+        self.clock = clock
+        self.sleep = sleep
+
+        self.passes = 0
+        self.overruns = 0
+        self.skipped_ticks = 0
+        self.total_pass_time = 0.0
+        self.max_pass_time = 0.0
+        # an exponential moving average of the pass time, for adapting the period
+        self.average_pass_time = 0.0
+
+        # called with the time each pass took, see telemetry.py
+        self.listener: Optional[Callable[[float], None]] = None
+        # called as each pass begins, in the context the pass runs in
+        self.begin_listener: Optional[Callable[[], None]] = None
+
+        self._deadline: Optional[float] = None
+        self._pass_started: Optional[float] = None
+        schedulers.add(self)
+
+    def reset(self):
+        """
+        Start a new grid, call this when a new main loop starts.  The stats are kept.
+        """
+        self._deadline = None
+        self._pass_started = None
+
+    def wait(self):
+        """
+        Called at the start of each main loop pass, waits until it is time for the pass
+        """
+        delay = self.next_delay()
+        if delay > 0:
+            self.sleep(delay)
+        self.begin_pass()
+
+    def next_delay(self) -> float:
+        """
+        Finish the current pass and return how long to wait before the next one.  Call begin_pass after waiting.
+        Use this instead of wait when the waiting is done elsewhere, like with asyncio.sleep.
+        """
+        now = self.clock()
+        if self._pass_started is not None:
+            self._record_pass(now - self._pass_started)
+
+        if self._deadline is None:
+            self._deadline = now
+            return 0
+        deadline = self._deadline + self.period
+        if now > deadline + self.period:
+            # whole ticks went by during the last pass, run now and stay on the grid
+            skipped = int((now - deadline) / self.period)
+            self.skipped_ticks += skipped
+            deadline += skipped * self.period
+        self._deadline = deadline
+        return max(0.0, deadline - now)
+
+    def begin_pass(self):
+        self._pass_started = self.clock()
+        if self.begin_listener:
+            self.begin_listener()
+
+    def _record_pass(self, pass_time: float):
+        self.passes += 1
+        self.total_pass_time += pass_time
+        self.max_pass_time = max(self.max_pass_time, pass_time)
+        # clamp the sample so one long blocking call (like pathfinding to a goal) doesn't dominate the average for long
+        sample = min(pass_time, 2 * self.max_period)
+        self.average_pass_time = sample if self.passes == 1 else 0.9 * self.average_pass_time + 0.1 * sample
+        if pass_time > self.budget:
+            self.overruns += 1
+        if self.listener:
+            self.listener(pass_time)
+
+        if self.adaptive and self.passes % 20 == 0:
+            if self.average_pass_time > self.budget and self.period < self.max_period:
+                self.period = min(self.max_period, self.period + self.base_period)
+                logger.warning('[Scheduler] Passes are averaging %.1fms, slowing down to one pass every %.0fms',
+                               self.average_pass_time * 1000, self.period * 1000)
+            elif self.average_pass_time < self.budget / 2 and self.period > self.base_period:
+                self.period = max(self.base_period, self.period - self.base_period)
+                logger.info('[Scheduler] Passes are averaging %.1fms, speeding up to one pass every %.0fms',
+                            self.average_pass_time * 1000, self.period * 1000)
+
+        if self.report_every and self.passes % self.report_every == 0:
+            logger.info('[Scheduler] %s', self.report())
+
+    def stats(self) -> dict:
+        return {
+            'passes': self.passes,
+            'overruns': self.overruns,
+            'skipped_ticks': self.skipped_ticks,
+            'mean_pass_ms': round(self.total_pass_time / self.passes * 1000, 3) if self.passes else 0,
+            'max_pass_ms': round(self.max_pass_time * 1000, 3),
+            'period_ms': round(self.period * 1000, 3),
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        return (f"{stats['passes']} passes, {stats['overruns']} over the {self.budget * 1000:.0f}ms budget, "
+                f"{stats['skipped_ticks']} skipped ticks, mean {stats['mean_pass_ms']}ms, max {stats['max_pass_ms']}ms, "
+                f"period {stats['period_ms']}ms")
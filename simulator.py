@@ -0,0 +1,1167 @@
+"""
+A headless, pure Python stand-in for the JS modules that regression_games.py loads.
+
+Set RG_BACKEND=simulator and regression_games.py will load this module instead of rg_javascript, so that the main loop
+and strategies can be run without a Minecraft server:
+
+    python simulator.py --seconds 30 --opponents 3 --latency-ms 0.5
+
+The simulator models a simplified CTF arena (flag, score locations, bridge blockade, item spawns) at 20 ticks per second,
+with scripted opponents and teammates.  Every public attribute read or method call on a simulated JS object counts as
+a bridge round trip, and each round trip can be given a fixed latency, so that loop latency can be measured offline as
+if the bot were talking to Node.
+
+Environment variables (all optional):
+    RG_SIM_LATENCY_MS: latency to add to every bridge round trip.  Defaults to 0
+    RG_SIM_BLOCKING_GOTO: 1 to make pathfinder.goto block until the goal is reached, like it does over the real bridge,
+        0 to return immediately.  Defaults to 0, since with the synchronous main loop a blocking goto holds up the loop
+        until the goal is reached, and the match is over before it makes a second pass
+"""
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from records import Point
+
+TICKS_PER_SECOND = 20
+TICK_SECONDS = 1 / TICKS_PER_SECOND
+
+# A simplified layout of the CTF arena.  Coordinates line up with the bridge blockade in strategy.py,
+# but this is not the real map: the arena is flat and has no walls.
+GROUND_Y = 65
+FLAG_SPAWN = Point(96, GROUND_Y, -386)
+BLUE_SCORE_LOCATION = Point(40, GROUND_Y, -386)
+RED_SCORE_LOCATION = Point(152, GROUND_Y, -386)
+ITEM_SPAWNS = [Point(96, GROUND_Y, -404), Point(96, GROUND_Y, -368), Point(66, GROUND_Y, -398), Point(126, GROUND_Y, -374)]
+FLAG_ITEM_NAME = 'white_banner'
+
+AIR = 0
+GROUND = 1
+
+# (name, displayName, customName) of the items that spawn around the arena, in spawn order
+LOOT_TABLE = [
+    ('potion', 'Potion', 'Healing Potion'),
+    ('gravel', 'Gravel', None),
+    ('potion', 'Potion', 'Gotta Go Fast'),
+    ('golden_apple', 'Golden Apple', None),
+    ('shield', 'Shield', None),
+    ('potion', 'Potion', 'Poison Cloud'),
+    ('dirt', 'Dirt', None),
+    ('potion', 'Potion', 'Increased Damage Potion'),
+]
+ITEM_RESPAWN_TICKS = 200
+RESPAWN_TICKS = {'bot': 20, 'scripted': 100}
+MAX_HEALTH = 20
+# inventory window slots: the held item is in the selected quick bar slot, which the simulator keeps at the first one
+# (36), the off-hand is 45, and everything else goes in the main inventory from 9
+HELD_SLOT = 36
+OFF_HAND_SLOT = 45
+INVENTORY_SLOT = 9
+ATTACK_RANGE = 3
+ATTACK_COOLDOWN_TICKS = 10
+WALK_SPEED = 0.22
+SPRINT_SPEED = 0.3
+
+
+class JavaScriptError(Exception):
+    """
+    Mirrors rg_javascript's JavaScriptError, which is what a rejected JS promise raises on the Python side
+    """
+    def __init__(self, call: str, js):
+        super().__init__(call, js)
+        self.call = call
+        self.js = js
+
+
+class BridgeStats:
+    """
+    Counts simulated bridge round trips, and optionally adds latency to each of them
+    """
+
+    def __init__(self, latency_ms: float = 0):
+        self.calls = 0
+        self.latency = latency_ms / 1000
+
+    def round_trip(self):
+        self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if world is not None:
+            world.sync()
+
+    def reset(self):
+        self.calls = 0
+
+
+bridge = BridgeStats(float(os.environ.get('RG_SIM_LATENCY_MS', '0')))
+
+# the world that simulated JS objects belong to, see create_world
+world: Optional['SimulatedWorld'] = None
+
+
+class _JSObject:
+    """
+    Base class for simulated JS objects.  Reading any public attribute costs one bridge round trip, and calling a
+    method costs another, just like a proxy from rg_javascript.  Simulator code only touches the underscore fields.
+    """
+    __slots__ = ()
+
+    def __getattribute__(self, name):
+        value = object.__getattribute__(self, name)
+        if name[0] != '_':
+            bridge.round_trip()
+            if callable(value) and name != 'valueOf':
+                bridge.round_trip()
+        return value
+
+
+class _JSData(_JSObject):
+    """
+    A plain JS object (like match info) with attribute access to its fields
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data: dict):
+        self._data = data
+
+    def __getattr__(self, name):
+        if name[0] == '_' or name not in self._data:
+            raise AttributeError(name)
+        bridge.round_trip()
+        return _wrap(self._data[name])
+
+    def valueOf(self):
+        return json.loads(json.dumps(self._data))
+
+
+class _JSError(_JSData):
+    """
+    A JS Error as it comes over the bridge.  Like mineflayer-pathfinder's errors, the name is set after the stack was
+    captured, so the stack (which is what str gives) starts with plain "Error:".
+    """
+    __slots__ = ()
+
+    def __init__(self, name: str, message: str, where: str):
+        super().__init__({'name': name, 'message': message, 'constructor': {'name': name},
+                          'stack': f'Error: {message}\n    at {where}'})
+
+    def __str__(self):
+        return self._data['stack']
+
+
+def _callback(fn: Optional[Callable], *args, default: Callable = None):
+    """
+    Call a Python function that was passed into JS, which costs a round trip back over the bridge.
+    Without one, the JS default function is called for free.
+    """
+    if fn is None:
+        return default(*args)
+    bridge.round_trip()
+    return fn(*args)
+
+
+def _default_entity_sort(distance, value, health, defense, toughness):
+    return distance - value
+
+
+def _wrap(value):
+    if isinstance(value, dict):
+        return _JSData(value)
+    if isinstance(value, list):
+        return [_wrap(v) for v in value]
+    return value
+
+
+def _xyz(vec) -> Point:
+    if isinstance(vec, SimVec3):
+        return vec._point
+    return Point(vec.x, vec.y, vec.z)
+
+
+class SimVec3(_JSObject):
+    __slots__ = ('_point',)
+
+    def __init__(self, x: float, y: float, z: float):
+        self._point = Point(x, y, z)
+
+    x = property(lambda self: self._point.x)
+    y = property(lambda self: self._point.y)
+    z = property(lambda self: self._point.z)
+
+    def offset(self, dx: float, dy: float, dz: float) -> 'SimVec3':
+        p = self._point
+        return SimVec3(p.x + dx, p.y + dy, p.z + dz)
+
+    def distanceSquared(self, other) -> float:
+        return self._point.distanceSquared(_xyz(other))
+
+    def distanceTo(self, other) -> float:
+        return self._point.distanceTo(_xyz(other))
+
+    def floored(self) -> 'SimVec3':
+        p = self._point
+        return SimVec3(math.floor(p.x), math.floor(p.y), math.floor(p.z))
+
+    def valueOf(self) -> dict:
+        return self._point.valueOf()
+
+    def __str__(self):
+        return f'({self._point.x}, {self._point.y}, {self._point.z})'
+
+
+def _new_vec3(x: float, y: float, z: float) -> SimVec3:
+    bridge.round_trip()
+    return SimVec3(x, y, z)
+
+
+def _vec3_of(point: Optional[Point]) -> Optional[SimVec3]:
+    return SimVec3(point.x, point.y, point.z) if point is not None else None
+
+
+class _Emitter(_JSObject):
+    """
+    A simulated EventEmitter.  Events are queued on the world and delivered from inside the next bridge call,
+    which is where rg_javascript delivers them too.
+    """
+    __slots__ = ('_listeners',)
+
+    def __init__(self):
+        self._listeners: Dict[str, List[Callable]] = {}
+
+    def on(self, event: str, listener: Callable):
+        self._listeners.setdefault(event, []).append(listener)
+
+    def off(self, event: str, listener: Callable):
+        listeners = self._listeners.get(event, [])
+        if listener in listeners:
+            listeners.remove(listener)
+
+    def _emit(self, event: str, *args):
+        listeners = self._listeners.get(event)
+        if listeners and world is not None:
+            world._pending.append((list(listeners), args))
+
+
+class SimItem(_JSObject):
+    __slots__ = ('_name', '_display_name', '_custom_name', '_count')
+
+    def __init__(self, name: str, display_name: str, custom_name: Optional[str] = None, count: int = 1):
+        self._name = name
+        self._display_name = display_name
+        # potions have a JSON text component as their custom name, name_for_item parses this
+        self._custom_name = json.dumps({'extra': [{'text': custom_name}], 'text': ''}) if custom_name else None
+        self._count = count
+
+    name = property(lambda self: self._name)
+    displayName = property(lambda self: self._display_name)
+    customName = property(lambda self: self._custom_name)
+    count = property(lambda self: self._count)
+
+    def _label(self) -> str:
+        return json.loads(self._custom_name)['extra'][0]['text'] if self._custom_name else self._display_name
+
+
+class SimEntity(_JSObject):
+    """
+    A player or a dropped item
+    """
+    __slots__ = ('_id', '_kind', '_username', '_team', '_pos', '_health', '_alive', '_respawn_at', '_scripted',
+                 '_held', '_item', '_cooldown', '_goal', '_goal_range', '_attack_target', '_speed_until')
+
+    _next_id = 1
+
+    def __init__(self, kind: str, position: Point, username: Optional[str] = None, team: Optional[str] = None,
+                 scripted: bool = False, item: Optional[SimItem] = None):
+        self._id = SimEntity._next_id
+        SimEntity._next_id += 1
+        self._kind = kind
+        self._username = username
+        self._team = team
+        self._pos = position
+        self._health = MAX_HEALTH
+        self._alive = True
+        self._respawn_at = 0
+        self._scripted = scripted
+        self._held: Optional[SimItem] = None
+        self._item = item
+        self._cooldown = 0
+        self._goal: Optional[Point] = None
+        self._goal_range = 1
+        self._attack_target: Optional['SimEntity'] = None
+        self._speed_until = 0
+
+    id = property(lambda self: self._id)
+    name = property(lambda self: 'player' if self._kind == 'player' else 'item')
+    type = property(lambda self: 'player' if self._kind == 'player' else 'object')
+    username = property(lambda self: self._username)
+    position = property(lambda self: _vec3_of(self._pos))
+    health = property(lambda self: self._health)
+    heldItem = property(lambda self: self._held)
+    isValid = property(lambda self: self._alive)
+
+    def getDroppedItem(self) -> Optional[SimItem]:
+        return self._item
+
+
+class SimBlock(_JSObject):
+    __slots__ = ('_type', '_pos')
+
+    def __init__(self, block_type: int, position: Point):
+        self._type = block_type
+        self._pos = position
+
+    type = property(lambda self: self._type)
+    name = property(lambda self: 'air' if self._type == AIR else 'block')
+    boundingBox = property(lambda self: 'empty' if self._type == AIR else 'block')
+    position = property(lambda self: _vec3_of(self._pos))
+
+
+class SimGoalNear(_JSObject):
+    __slots__ = ('_point', '_range')
+
+    def __init__(self, x: float, y: float, z: float, reach: float):
+        self._point = Point(x, y, z)
+        self._range = reach
+
+
+class SimPathfinder(_JSObject):
+    __slots__ = ('_bot',)
+
+    def __init__(self, bot: 'SimRGBot'):
+        self._bot = bot
+
+    def setGoal(self, goal: Optional[SimGoalNear], dynamic: bool = False):
+        entity = self._bot._entity
+        entity._attack_target = None
+        if goal is None:
+            entity._goal = None
+            self._bot._mineflayer._emit('goal_updated', None, dynamic)
+        else:
+            entity._goal = goal._point
+            entity._goal_range = goal._range
+            self._bot._mineflayer._emit('goal_updated', goal, dynamic)
+            self._bot._mineflayer._emit('path_update', _JSData({'status': 'success'}))
+
+    def goto(self, goal: SimGoalNear):
+        self.setGoal(goal)
+        if world.blocking_goto:
+            world._wait_for_goal(self._bot._entity, goal._point, 'goto')
+
+    def stop(self):
+        if self._bot._entity._goal is not None:
+            self._bot._entity._goal = None
+            self._bot._mineflayer._emit('path_stop')
+
+    def isMoving(self) -> bool:
+        entity = self._bot._entity
+        return entity._goal is not None or entity._attack_target is not None
+
+
+class SimArmorManager(_JSObject):
+    __slots__ = ()
+
+    def equipAll(self):
+        pass
+
+
+class SimBlocksByName(_JSObject):
+    """
+    mcData.blocksByName - any block name resolves to an id made from its name, so that ids are the same in every run
+    """
+    __slots__ = ('_ids',)
+
+    def __init__(self):
+        self._ids: Dict[str, _JSData] = {}
+
+    def __getattr__(self, name):
+        if name[0] == '_':
+            raise AttributeError(name)
+        bridge.round_trip()
+        return self._block(name)
+
+    def _block(self, name: str) -> _JSData:
+        if name not in self._ids:
+            self._ids[name] = _JSData({'id': 2 + zlib.crc32(name.encode()) % 60000, 'name': name})
+        return self._ids[name]
+
+
+class SimMineflayer(_Emitter):
+    """
+    The mineflayer bot that RGBot.mineflayer() returns
+    """
+    __slots__ = ('_bot', '_pathfinder', '_armor_manager', '_inventory', '_entities', '_off_hand')
+
+    def __init__(self, bot: 'SimRGBot'):
+        super().__init__()
+        self._bot = bot
+        self._pathfinder = SimPathfinder(bot)
+        self._armor_manager = SimArmorManager()
+        # the inventory window, which emits updateSlot
+        self._inventory = _Emitter()
+        self._off_hand: Optional[SimItem] = None
+
+    health = property(lambda self: self._bot._entity._health)
+    entity = property(lambda self: self._bot._entity)
+    pathfinder = property(lambda self: self._pathfinder)
+    # the simulator's block ids are its own, so it is its own game version as far as static_data.py is concerned
+    version = property(lambda self: 'simulator')
+    armorManager = property(lambda self: self._armor_manager)
+    inventory = property(lambda self: self._inventory)
+    quickBarSlot = property(lambda self: HELD_SLOT - 36)
+    entities = property(lambda self: {e._id: e for e in world._entities() if e._alive})
+
+    def loadPlugin(self, plugin):
+        pass
+
+    def lookAt(self, position, force: bool = False):
+        pass
+
+    def activateItem(self, off_hand: bool = False):
+        world._use_item(self._bot)
+
+    def equip(self, item: SimItem, destination: str):
+        if item not in self._bot._inventory:
+            return
+        # like mineflayer, the item is moved into the slot, which updates it
+        if destination == 'hand':
+            old_item, self._bot._entity._held = self._bot._entity._held, item
+            world._inventory_updated(old_item, item, HELD_SLOT)
+        elif destination == 'off-hand':
+            old_item, self._off_hand = self._off_hand, item
+            world._inventory_updated(old_item, item, OFF_HAND_SLOT)
+
+    def unequip(self, destination: str):
+        if destination == 'hand' and self._bot._entity._held is not None:
+            old_item, self._bot._entity._held = self._bot._entity._held, None
+            world._inventory_updated(old_item, None, HELD_SLOT)
+        elif destination == 'off-hand' and self._off_hand is not None:
+            old_item, self._off_hand = self._off_hand, None
+            world._inventory_updated(old_item, None, OFF_HAND_SLOT)
+
+    def blockAt(self, position) -> SimBlock:
+        p = _xyz(position)
+        p = Point(math.floor(p.x), math.floor(p.y), math.floor(p.z))
+        return SimBlock(world._block_type(p), p)
+
+    def placeBlock(self, reference_block: SimBlock, face_vector):
+        face = _xyz(face_vector)
+        world._place_block(self._bot, reference_block._pos.offset(face.x, face.y, face.z))
+
+
+class SimRGBot(_JSObject):
+    """
+    The subset of rg-bot's RGBot that our bot code uses
+    """
+    __slots__ = ('_entity', '_mineflayer', '_inventory')
+
+    def __init__(self, entity: SimEntity):
+        self._entity = entity
+        self._mineflayer = SimMineflayer(self)
+        self._inventory: List[SimItem] = []
+
+    mcData = property(lambda self: _JSMcData())
+
+    # events registered on the RGBot are the mineflayer bot's events
+    def on(self, event: str, listener: Callable):
+        self._mineflayer._listeners.setdefault(event, []).append(listener)
+
+    def _emit(self, event: str, *args):
+        self._mineflayer._emit(event, *args)
+
+    def setDebug(self, debug: bool):
+        pass
+
+    def allowParkour(self, allow: bool):
+        pass
+
+    def allowDigWhilePathing(self, allow: bool):
+        pass
+
+    def mineflayer(self) -> SimMineflayer:
+        return self._mineflayer
+
+    def username(self) -> str:
+        return self._entity._username
+
+    def chat(self, message: str):
+        print(f'[Chat] {self._entity._username}: {message}')
+
+    def matchInfo(self) -> Optional[_JSData]:
+        return _JSData(world._match_info()) if world.match_in_progress else None
+
+    def getMyTeam(self) -> str:
+        return self._entity._team
+
+    def teamForPlayer(self, username: str) -> Optional[str]:
+        players = [p for p in world.players if p._username == username]
+        return players[0]._team if players else None
+
+    def getOpponentUsernames(self) -> List[str]:
+        return [p._username for p in world.players if p._team != self._entity._team]
+
+    def position(self) -> SimVec3:
+        return _vec3_of(self._entity._pos)
+
+    def vecToString(self, vec) -> str:
+        p = _xyz(vec)
+        return f'{p.x}, {p.y}, {p.z}'
+
+    def wait(self, ticks: int):
+        world._wait_ticks(ticks)
+
+    def getAllInventoryItems(self) -> List[SimItem]:
+        return list(self._inventory)
+
+    def inventoryContainsItem(self, item_name: str, options=None) -> bool:
+        return any(item_name in (i._name, i._display_name, i._label()) for i in self._inventory)
+
+    def holdItem(self, item) -> Optional[SimItem]:
+        if isinstance(item, str):
+            matches = [i for i in self._inventory if item in (i._name, i._display_name, i._label())]
+            item = matches[0] if matches else None
+        if item in self._inventory:
+            if self._entity._held is not item:
+                old_item, self._entity._held = self._entity._held, item
+                world._inventory_updated(old_item, item, HELD_SLOT)
+            return item
+        return None
+
+    def findEntities(self, options: dict) -> List[_JSData]:
+        names = options.get('entityNames')
+        attackable = options.get('attackable', False)
+        max_count = options.get('maxCount', 1)
+        max_distance = options.get('maxDistance')
+        value_function = options.get('entityValueFunction')
+        sort_function = options.get('sortValueFunction')
+        me = self._entity
+        results = []
+        for e in world.players:
+            if e is me or not e._alive or (names and e._username not in names):
+                continue
+            distance = e._pos.distanceTo(me._pos)
+            if max_distance is not None and distance > max_distance:
+                continue
+            value = _callback(value_function, e._username, default=lambda name: 0)
+            results.append((_callback(sort_function, distance, value, e._health, 0, 0, default=_default_entity_sort), value, e))
+        if not attackable:
+            for e in world.items:
+                distance = e._pos.distanceTo(me._pos)
+                if max_distance is None or distance <= max_distance:
+                    results.append((_callback(sort_function, distance, 0, 0, 0, 0, default=_default_entity_sort), 0, e))
+        results.sort(key=lambda r: r[0])
+        return [_FindResult(e, value) for _, value, e in results[:max_count]]
+
+    def findItemsOnGround(self, options: dict) -> List['_FindResult']:
+        max_count = options.get('maxCount', 1)
+        max_distance = options.get('maxDistance')
+        value_function = options.get('itemValueFunction')
+        sort_function = options.get('sortValueFunction')
+        me = self._entity
+        results = []
+        for e in world.items:
+            distance = e._pos.distanceTo(me._pos)
+            if max_distance is not None and distance > max_distance:
+                continue
+            value = _callback(value_function, e._item._name, default=lambda name: 0)
+            results.append((_callback(sort_function, distance, value, default=lambda distance, value: distance - value), value, e))
+        results.sort(key=lambda r: r[0])
+        return [_FindResult(e, value) for _, value, e in results[:max_count]]
+
+    def attackEntity(self, entity: SimEntity):
+        # chasing the entity takes over from any goal
+        if self._entity._goal is not None:
+            self._entity._goal = None
+            self._mineflayer._emit('path_stop')
+        self._entity._attack_target = entity
+
+    def approachPosition(self, position, options=None) -> bool:
+        reach = (options or {}).get('reach', 1)
+        target = _xyz(position)
+        self._mineflayer.pathfinder.setGoal(SimGoalNear(target.x, target.y, target.z, reach))
+        world._wait_for_goal(self._entity, self._entity._goal, 'approachPosition')
+        return True
+
+
+class _JSMcData(_JSObject):
+    __slots__ = ()
+
+    blocksByName = property(lambda self: world._blocks_by_name)
+
+
+class _FindResult(_JSObject):
+    __slots__ = ('_result', '_value')
+
+    def __init__(self, result: SimEntity, value: float):
+        self._result = result
+        self._value = value
+
+    result = property(lambda self: self._result)
+    value = property(lambda self: self._value)
+
+
+class SimRGCTFUtils(_JSObject):
+    """
+    The subset of rg-ctf-utils' RGCTFUtils that our bot code uses
+    """
+    __slots__ = ('_bot',)
+
+    FLAG_SUFFIX = '_banner'
+
+    def __init__(self, bot: SimRGBot):
+        self._bot = bot
+
+    FLAG_SPAWN = property(lambda self: _vec3_of(FLAG_SPAWN))
+    BLUE_SCORE_LOCATION = property(lambda self: _vec3_of(BLUE_SCORE_LOCATION))
+    RED_SCORE_LOCATION = property(lambda self: _vec3_of(RED_SCORE_LOCATION))
+
+    def setDebug(self, debug: bool):
+        pass
+
+    def getFlagLocation(self) -> Optional[SimVec3]:
+        return _vec3_of(world.flag_position)
+
+    def hasFlag(self) -> bool:
+        return world.flag_carrier is self._bot._entity
+
+
+class CTFEvent:
+    FLAG_OBTAINED = 'flag_obtained'
+    FLAG_SCORED = 'flag_scored'
+    FLAG_AVAILABLE = 'flag_available'
+
+
+class SimulatedWorld:
+    """
+    The arena, the players in it, and the clock.
+
+    The world catches up to the wall clock on every bridge call, running speed times faster than a real server.
+    With a speed of 0 it only advances when step() is called, or when the bot waits.
+    """
+
+    def __init__(self, username: str = 'BLUE-1', team: str = 'BLUE', opponents: int = 3, teammates: int = 0,
+                 match_seconds: float = 60, speed: float = 1.0, blocking_goto: Optional[bool] = None,
+                 seed: Optional[int] = None):
+        self.random = random.Random(seed)
+        self.speed = speed
+        self.blocking_goto = blocking_goto if blocking_goto is not None else os.environ.get('RG_SIM_BLOCKING_GOTO', '0') == '1'
+        self.tick = 0
+        self.match_length = int(match_seconds * TICKS_PER_SECOND)
+        self.match_ticks = self.match_length
+        self.match_in_progress = True
+        self.scores = {'BLUE': 0, 'RED': 0}
+        self.captures: Dict[str, int] = {}
+        self.flag_position: Optional[Point] = FLAG_SPAWN
+        self.flag_carrier: Optional[SimEntity] = None
+        self.blocks: Dict[Point, int] = {}
+        self.items: List[SimEntity] = []
+        self._item_spawn_at = [0] * len(ITEM_SPAWNS)
+        self._loot_index = 0
+        self._blocks_by_name = SimBlocksByName()
+        self._pending = deque()
+        self._stepping = False
+        # bridge calls can come from several threads (see async_loop.py), only one of them advances the world at a time
+        self._lock = threading.RLock()
+        self._started_at = time.monotonic()
+
+        other_team = 'RED' if team == 'BLUE' else 'BLUE'
+        me = SimEntity('player', self._base(team), username, team)
+        self.players: List[SimEntity] = [me]
+        for i in range(teammates):
+            self.players.append(SimEntity('player', self._base(team), f'{team}-{i + 2}', team, scripted=True))
+        for i in range(opponents):
+            self.players.append(SimEntity('player', self._base(other_team), f'{other_team}-{i + 1}', other_team, scripted=True))
+        self.bot = SimRGBot(me)
+
+    # --- clock ---
+
+    def sync(self):
+        """
+        Catch up to the wall clock (unless the world is stepped manually) and deliver any queued events
+        """
+        if self.speed <= 0 and not self._pending:
+            # nothing to catch up on, so don't bother with the lock
+            return
+        with self._lock:
+            if self._stepping:
+                return
+            if self.speed > 0:
+                target = int((time.monotonic() - self._started_at) * self.speed / TICK_SECONDS)
+                if target > self.tick:
+                    self.step(target - self.tick)
+            self._dispatch()
+
+    def step(self, ticks: int = 1):
+        with self._lock:
+            self._stepping = True
+            try:
+                for _ in range(ticks):
+                    if not self.match_in_progress:
+                        break
+                    self.tick += 1
+                    self._step_players()
+                    self._step_items()
+                    self._step_flag()
+                    self.bot._emit('physicsTick')
+                    if self.tick >= self.match_ticks:
+                        self._end_match()
+            finally:
+                self._stepping = False
+
+    def _dispatch(self):
+        with self._lock:
+            while self._pending:
+                listeners, args = self._pending.popleft()
+                for listener in listeners:
+                    listener(*args)
+
+    def _wait_ticks(self, ticks: int):
+        if self.speed > 0:
+            time.sleep(max(0, ticks) * TICK_SECONDS / self.speed)
+            self.sync()
+        else:
+            with self._lock:
+                self.step(max(1, ticks))
+                self._dispatch()
+
+    def _wait_for_goal(self, entity: SimEntity, target: Point, call: str):
+        """
+        Block the caller until the entity reaches target, like awaiting a pathfinding promise over the bridge
+        """
+        while True:
+            if entity._goal is None and entity._pos.distanceSquared(target) <= (entity._goal_range + 0.5) ** 2:
+                return
+            if entity._goal is not target:
+                raise JavaScriptError(call, _JSError('GoalChanged', 'The goal was changed before it could be completed!',
+                                                     'Pathfinder.setGoal (mineflayer-pathfinder/index.js:520:16)'))
+            if not self.match_in_progress or not entity._alive:
+                entity._goal = None
+                raise JavaScriptError(call, _JSError('PathStopped', 'Path was stopped before it could be completed! Thus, the '
+                                                     'desired goal was not reached.',
+                                                     'Pathfinder.stop (mineflayer-pathfinder/index.js:547:18)'))
+            self._wait_ticks(1)
+
+    def randomize(self, rng: random.Random):
+        """
+        Put the world into a random mid-match state, for benchmarks.  The same rng state always gives the same world.
+        """
+        me = self.bot._entity
+        me._pos = Point(rng.uniform(40, 152), GROUND_Y, rng.uniform(-410, -362))
+        for p in self.players:
+            p._alive = True
+            p._goal = None
+            p._attack_target = None
+            p._cooldown = 0
+            p._held = None
+            p._health = rng.randint(1, MAX_HEALTH)
+            if p is not me:
+                # about half of the players are close enough to matter
+                spread = 12 if rng.random() < 0.5 else 60
+                p._pos = Point(me._pos.x + rng.uniform(-spread, spread), GROUND_Y, me._pos.z + rng.uniform(-spread, spread))
+        self.bot._mineflayer._off_hand = None
+        self.bot._inventory = [SimItem(*loot) for loot in rng.sample(LOOT_TABLE, rng.randint(0, 5))]
+
+        self._clear_carrier()
+        self.flag_position = None
+        flag_state = rng.choice(['loose', 'me', 'opponent', 'teammate'])
+        carriers = [p for p in self.players if (p is me) == (flag_state == 'me') and (p._team == me._team) == (flag_state != 'opponent')]
+        if flag_state == 'loose' or not carriers:
+            self.flag_position = Point(rng.uniform(60, 132), GROUND_Y, rng.uniform(-400, -372))
+        else:
+            self.flag_carrier = rng.choice(carriers)
+            self.flag_carrier._held = SimItem(FLAG_ITEM_NAME, 'White Banner')
+            if self.flag_carrier is me:
+                self.bot._inventory.append(self.flag_carrier._held)
+
+        self.items = [SimEntity('item', spawn, item=SimItem(*rng.choice(LOOT_TABLE))) for spawn in ITEM_SPAWNS if rng.random() < 0.5]
+        self.blocks = {}
+        self._pending.clear()
+
+    # --- match ---
+
+    def _base(self, team: str) -> Point:
+        return BLUE_SCORE_LOCATION if team == 'BLUE' else RED_SCORE_LOCATION
+
+    def _entities(self) -> List[SimEntity]:
+        return self.players + self.items
+
+    def _match_info(self) -> dict:
+        return {
+            'teams': [{'name': name, 'metadata': {'score': score}} for name, score in self.scores.items()],
+            'players': [{
+                'username': p._username,
+                'team': p._team,
+                'isBot': True,
+                'metadata': {'score': self.captures.get(p._username, 0) * 100, 'flagCaptures': self.captures.get(p._username, 0)}
+            } for p in self.players]
+        }
+
+    def _end_match(self):
+        self.match_in_progress = False
+        self.bot._emit('match_ended', _JSData(self._match_info()))
+
+    def new_match(self, match_seconds: Optional[float] = None):
+        """
+        Start another match with the same bot, like a server that runs matches back to back.  Everything but the clock
+        and the entity ids starts over.
+        """
+        with self._lock:
+            self._clear_carrier()
+            if match_seconds is not None:
+                self.match_length = int(match_seconds * TICKS_PER_SECOND)
+            self.match_ticks = self.tick + self.match_length
+            self.match_in_progress = True
+            self.scores = {'BLUE': 0, 'RED': 0}
+            self.captures = {}
+            self.flag_position = FLAG_SPAWN
+            self.blocks = {}
+            for item in self.items:
+                self.bot._emit('entityGone', item)
+            self.items = []
+            self._item_spawn_at = [self.tick] * len(ITEM_SPAWNS)
+            for p in self.players:
+                p._pos = self._base(p._team)
+                p._health = MAX_HEALTH
+                p._alive = True
+                p._held = None
+                p._cooldown = 0
+                p._goal = None
+                p._attack_target = None
+                p._speed_until = 0
+            self.bot._mineflayer._off_hand = None
+            self.bot._inventory = []
+            self.bot._emit('match_started', _JSData(self._match_info()))
+            self.bot._emit('spawn')
+
+    # --- players ---
+
+    def _step_players(self):
+        for p in self.players:
+            if not p._alive:
+                if self.tick >= p._respawn_at:
+                    self._respawn(p)
+                continue
+            if p._cooldown > 0:
+                p._cooldown -= 1
+            if p._scripted:
+                self._think(p)
+            target = p._attack_target
+            if target is not None:
+                if not target._alive:
+                    p._attack_target = None
+                elif p._pos.distanceSquared(target._pos) <= ATTACK_RANGE ** 2:
+                    self._hit(p, target)
+                else:
+                    self._move(p, target._pos)
+            elif p._goal is not None:
+                if p._pos.distanceSquared(p._goal) <= p._goal_range ** 2:
+                    p._goal = None
+                    if p is self.bot._entity:
+                        self.bot._emit('goal_reached', None)
+                else:
+                    self._move(p, p._goal)
+
+    def _think(self, p: SimEntity):
+        """
+        Scripted behaviour: carry the flag home, grab a loose flag, chase an enemy carrier, fight anyone close by,
+        or hang around the middle
+        """
+        enemies = [e for e in self.players if e._alive and e._team != p._team]
+        nearest = min(enemies, key=lambda e: e._pos.distanceSquared(p._pos), default=None)
+        p._attack_target = None
+        if self.flag_carrier is p:
+            p._goal = self._base(p._team)
+        elif self.flag_position is not None:
+            p._goal = self.flag_position
+        elif self.flag_carrier is not None and self.flag_carrier._team != p._team:
+            p._attack_target = self.flag_carrier
+        elif nearest is not None and nearest._pos.distanceSquared(p._pos) <= 100:
+            p._attack_target = nearest
+        elif p._goal is None:
+            p._goal = FLAG_SPAWN.offset(self.random.uniform(-12, 12), 0, self.random.uniform(-12, 12))
+        p._goal_range = 1
+        if nearest is not None and p._attack_target is None and nearest._pos.distanceSquared(p._pos) <= ATTACK_RANGE ** 2:
+            self._hit(p, nearest)
+
+    def _move(self, p: SimEntity, target: Point):
+        speed = SPRINT_SPEED if p._speed_until > self.tick else WALK_SPEED
+        dx, dz = target.x - p._pos.x, target.z - p._pos.z
+        distance = math.hypot(dx, dz)
+        if distance <= speed:
+            p._pos = Point(target.x, GROUND_Y, target.z)
+        else:
+            p._pos = Point(p._pos.x + dx / distance * speed, GROUND_Y, p._pos.z + dz / distance * speed)
+        if p is not self.bot._entity:
+            self.bot._emit('entityMoved', p)
+
+    def _hit(self, attacker: SimEntity, target: SimEntity):
+        if attacker._cooldown > 0:
+            return
+        attacker._cooldown = ATTACK_COOLDOWN_TICKS
+        self._damage(target, 3 if attacker._scripted else 4)
+
+    def _damage(self, target: SimEntity, amount: float):
+        target._health = max(0, target._health - amount)
+        if target is self.bot._entity:
+            self.bot._emit('health')
+        if target._health <= 0:
+            self._kill(target)
+
+    def _kill(self, p: SimEntity):
+        p._alive = False
+        p._goal = None
+        p._attack_target = None
+        p._respawn_at = self.tick + RESPAWN_TICKS['scripted' if p._scripted else 'bot']
+        if self.flag_carrier is p:
+            self._drop_flag(p._pos)
+        if p is self.bot._entity:
+            for item in self.bot._inventory:
+                self._inventory_updated(item, None)
+            self.bot._mineflayer._off_hand = None
+            self.bot._inventory = []
+            p._held = None
+            self.bot._emit('death')
+        else:
+            self.bot._emit('entityGone', p)
+
+    def _respawn(self, p: SimEntity):
+        p._alive = True
+        p._health = MAX_HEALTH
+        p._pos = self._base(p._team)
+        if p is self.bot._entity:
+            self.bot._emit('spawn')
+        else:
+            self.bot._emit('entitySpawn', p)
+
+    # --- items and blocks ---
+
+    def _step_items(self):
+        for i, spawn in enumerate(ITEM_SPAWNS):
+            if self.tick >= self._item_spawn_at[i] and not any(e._pos == spawn for e in self.items):
+                name, display_name, custom_name = LOOT_TABLE[self._loot_index % len(LOOT_TABLE)]
+                self._loot_index += 1
+                entity = SimEntity('item', spawn, item=SimItem(name, display_name, custom_name))
+                self.items.append(entity)
+                self._item_spawn_at[i] = self.tick + ITEM_RESPAWN_TICKS
+                self.bot._emit('entitySpawn', entity)
+        me = self.bot._entity
+        for entity in list(self.items):
+            collectors = [p for p in self.players if p._alive and p._pos.distanceSquared(entity._pos) <= 2.25]
+            if collectors:
+                self.items.remove(entity)
+                if me in collectors:
+                    self.bot._inventory.append(entity._item)
+                    self._inventory_updated(None, entity._item)
+                    self.bot._emit('playerCollect', me, entity)
+                self.bot._emit('entityGone', entity)
+
+    def _use_item(self, bot: SimRGBot):
+        item = bot._entity._held
+        if item is None or item not in bot._inventory:
+            return
+        label = item._label()
+        me = bot._entity
+        if label in ('Healing Potion', 'Golden Apple', 'Totem of Undying', 'Tincture of Life', 'Tincture of Mending', 'Tincture of Mending II'):
+            me._health = min(MAX_HEALTH, me._health + 8)
+            bot._emit('health')
+        elif label in ('Gotta Go Fast', 'Lava Swim'):
+            me._speed_until = self.tick + 10 * TICKS_PER_SECOND
+        elif label in ('Poison Cloud', 'Poison Cloud II'):
+            for p in self.players:
+                if p._alive and p._team != me._team and p._pos.distanceSquared(me._pos) <= 16:
+                    self._damage(p, 6)
+        elif label != 'Increased Damage Potion':
+            return
+        bot._inventory.remove(item)
+        me._held = None
+        self._inventory_updated(item, None, HELD_SLOT)
+
+    def _inventory_updated(self, old_item: Optional[SimItem], new_item: Optional[SimItem], slot: int = INVENTORY_SLOT):
+        # the simulator only keeps the held items in slots, anything else is updated in the main inventory
+        self.bot._mineflayer._inventory._emit('updateSlot', slot, old_item, new_item)
+
+    def _block_type(self, position: Point) -> int:
+        if position in self.blocks:
+            return self.blocks[position]
+        return GROUND if position.y < GROUND_Y else AIR
+
+    def _place_block(self, bot: SimRGBot, position: Point):
+        item = bot._entity._held
+        if item is None or item not in bot._inventory or self._block_type(position) != AIR:
+            return
+        old_block = SimBlock(AIR, position)
+        self.blocks[position] = self._blocks_by_name._block(item._name)._data['id']
+        bot._inventory.remove(item)
+        bot._entity._held = None
+        self._inventory_updated(item, None, HELD_SLOT)
+        new_block = SimBlock(self.blocks[position], position)
+        bot._emit('blockUpdate', old_block, new_block)
+        bot._emit(f'blockUpdate:({int(position.x)}, {int(position.y)}, {int(position.z)})', old_block, new_block)
+
+    # --- flag ---
+
+    def _step_flag(self):
+        if self.flag_position is not None:
+            collectors = [p for p in self.players if p._alive and p._pos.distanceSquared(self.flag_position) <= 2.25]
+            if collectors:
+                carrier = collectors[0]
+                self.flag_carrier = carrier
+                self.flag_position = None
+                carrier._held = SimItem(FLAG_ITEM_NAME, 'White Banner')
+                if carrier is self.bot._entity:
+                    self.bot._inventory.append(carrier._held)
+                    self._inventory_updated(None, carrier._held)
+                else:
+                    self.bot._emit('entityEquip', carrier)
+                self.bot._emit(CTFEvent.FLAG_OBTAINED, carrier._username)
+        elif self.flag_carrier is not None:
+            carrier = self.flag_carrier
+            if carrier._pos.distanceSquared(self._base(carrier._team)) <= 4:
+                self.scores[carrier._team] += 1
+                self.captures[carrier._username] = self.captures.get(carrier._username, 0) + 1
+                self._clear_carrier()
+                self.flag_position = FLAG_SPAWN
+                self.bot._emit(CTFEvent.FLAG_SCORED, carrier._team)
+                self.bot._emit(CTFEvent.FLAG_AVAILABLE, _vec3_of(FLAG_SPAWN))
+
+    def _drop_flag(self, position: Point):
+        self._clear_carrier()
+        self.flag_position = position
+        self.bot._emit(CTFEvent.FLAG_AVAILABLE, _vec3_of(position))
+
+    def _clear_carrier(self):
+        carrier = self.flag_carrier
+        if carrier is not None:
+            carrier._held = None
+            if carrier is self.bot._entity:
+                self.bot._inventory = [i for i in self.bot._inventory if i._name != FLAG_ITEM_NAME]
+                self._inventory_updated(carrier._held, None)
+            else:
+                self.bot._emit('entityEquip', carrier)
+        self.flag_carrier = None
+
+
+def create_world(**options) -> SimulatedWorld:
+    """
+    Create the world that the simulated JS objects talk to.  See SimulatedWorld for the options.
+    """
+    global world
+    world = SimulatedWorld(**options)
+    return world
+
+
+def run_bot(configure_bot: Callable, sim_world: SimulatedWorld):
+    """
+    Configure the world's bot, spawn it, and keep the world running until the match ends
+    """
+    configure_bot(sim_world.bot)
+    run_world(sim_world)
+
+
+def run_world(sim_world: SimulatedWorld):
+    """
+    Spawn the world's bot, which should already be configured, and keep the world running until the match ends
+    """
+    sim_world.bot._emit('match_started', _JSData(sim_world._match_info()))
+    sim_world.bot._emit('spawn')
+    while sim_world.match_in_progress or sim_world._pending:
+        sim_world.sync()
+        if sim_world.speed > 0:
+            time.sleep(TICK_SECONDS / sim_world.speed / 5)
+        else:
+            sim_world.step(1)
+    # let a main loop running on its own thread (see async_loop.py) finish its last pass
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and not thread.daemon:
+            thread.join(5)
+
+
+def bot_factory(index: int, options: dict):
+    """
+    The launcher.py bot factory for the simulator.  Each bot gets its own world, since worker processes can't share one,
+    so the bots play separate matches against their own scripted opponents, and the launcher's team metrics are the sum
+    of those matches rather than one shared match.  pathfinder.goto doesn't block, so that the synchronous main loop
+    makes a pass every tick.
+
+    Options (all optional): seconds, opponents, teammates, speed, latency_ms, seed.
+    Returns the bot and a function that runs its match.
+    """
+    os.environ['RG_BACKEND'] = 'simulator'
+    if options.get('latency_ms') is not None:
+        bridge.latency = options['latency_ms'] / 1000
+    seed = options.get('seed')
+    sim_world = create_world(username=f'BLUE-{index + 1}', opponents=options.get('opponents', 3),
+                             teammates=options.get('teammates', 0), match_seconds=options.get('seconds', 60),
+                             speed=options.get('speed', 1.0), blocking_goto=False,
+                             seed=seed + index if seed is not None else None)
+    return sim_world.bot, lambda: run_world(sim_world)
+
+
+class _Namespace:
+    def __init__(self, **members):
+        self.__dict__.update(members)
+
+
+_MODULES = {
+    'mineflayer': _Namespace(),
+    'mineflayer-pathfinder': _Namespace(goals=_Namespace(GoalNear=SimGoalNear)),
+    'rg-match-info': _Namespace(),
+    'vec3': _Namespace(Vec3=_new_vec3),
+    'rg-bot': _Namespace(RGBot=SimRGBot, FindResult=_FindResult),
+    'rg-ctf-utils': _Namespace(RGCTFUtils=SimRGCTFUtils, CTFEvent=CTFEvent),
+    'mineflayer-armor-manager': _Namespace(),
+    'prismarine-item': _Namespace(Item=SimItem),
+    'prismarine-entity': _Namespace(Entity=SimEntity),
+}
+
+
+def require(name: str, version: Optional[str] = None):
+    """
+    The simulated version of rg_javascript.require
+    """
+    return _MODULES[name]
+
+
+def On(emitter: _Emitter, event: str):
+    """
+    The simulated version of rg_javascript.On, handlers are called with the emitter as their first argument
+    """
+    def decor(fn):
+        emitter.on(event, lambda *args: fn(emitter, *args))
+        return fn
+    return decor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run start.py against the simulated CTF arena')
+    parser.add_argument('--seconds', type=float, default=30, help='length of the match in game seconds')
+    parser.add_argument('--opponents', type=int, default=3)
+    parser.add_argument('--teammates', type=int, default=0)
+    parser.add_argument('--latency-ms', type=float, default=None, help='latency per bridge round trip, overrides RG_SIM_LATENCY_MS')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--speed', type=float, default=1.0, help='how many times faster than a real server the world runs')
+    args = parser.parse_args(argv)
+
+    if args.latency_ms is not None:
+        bridge.latency = args.latency_ms / 1000
+    sim_world = create_world(opponents=args.opponents, teammates=args.teammates, match_seconds=args.seconds,
+                             speed=args.speed, seed=args.seed)
+
+    from start import configure_bot
+    started = time.monotonic()
+    run_bot(configure_bot, sim_world)
+    elapsed = time.monotonic() - started
+    print(f'[Simulator] {sim_world.tick} ticks in {elapsed:.2f}s, {bridge.calls} bridge calls, score: {sim_world.scores}')
+
+
+if __name__ == '__main__':
+    # regression_games.py picks the backend when it is first imported
+    os.environ['RG_BACKEND'] = 'simulator'
+    import simulator
+    simulator.main()
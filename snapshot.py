@@ -0,0 +1,113 @@
+"""
+A per-tick snapshot of the world, so that each main loop pass sees one consistent view of it.
+"""
+from typing import List, Optional, Set
+from regression_games import Item
+from records import Point, EntitySnapshot, point_from_vec3
+from ranking import rank_nearest, find_items
+from blackboard import TeammateIntel, remote_opponents
+from inventory import InventoryIndex
+from tracking import MotionTracker
+from utilities import nearest_teammates
+from world_state import WorldState
+
+
+class TickSnapshot:
+    """
+    Everything the strategies need to know about the world for one main loop pass.
+
+    Strategies receive this in place of the live RGBot.  All reads come from the snapshot, and actions
+    (attacking, moving, using items) are still performed through snapshot.bot.  Most of the snapshot is
+    copied from the WorldState cache, only my own position is read from the bot every tick (unless it was already read
+    and is passed in).
+    """
+
+    def __init__(self, world: WorldState, position: Optional[Point] = None):
+        self.world = world
+        self.bot = world.bot
+        self.rg_ctf_utils = world.rg_ctf_utils
+        self.match_info: dict = world.match_info
+
+        # which team I'm on, and who is on the other teams
+        self.username: str = world.username
+        self.my_team_name: str = world.my_team_name
+        self.other_team_name: Optional[str] = world.other_team_name
+        self.opponent_names: List[str] = world.opponent_names
+
+        # my own state
+        self.position: Point = position or point_from_vec3(self.bot.position())
+        self.health: float = world.health
+        self.inventory_index: InventoryIndex = world.inventory_index
+        self.inventory: List[Item] = world.inventory
+        self.inventory_names: List[str] = world.inventory_names
+        self.inventory_name_set: Set[str] = world.inventory_name_set
+
+        # flag state
+        self.flag_location: Optional[Point] = world.flag_location
+        self.has_flag: bool = world.has_flag
+
+        # add this tick's player positions to their tracks, for predicting where they are going
+        self.tracker: MotionTracker = world.tracker
+        self.tracker.observe(world.game_tick, world.players)
+
+        # find any opponents in range, sorted by distance.  We'll filter them by decision point later
+        # opponent_names can be empty in practice mode where there is no other team, in which case there are no opponents
+        self.opponents: List[EntitySnapshot] = self.nearest_players(self.opponent_names, 3, 33)
+
+        # find any teammates in range
+        self.teammates: List[EntitySnapshot] = nearest_teammates(self, 33, True)
+
+        # what the other bots on my team can see, from the team blackboard, and the opponents that only they can see
+        blackboard = world.blackboard
+        self.teammate_intel: List[TeammateIntel] = blackboard.read_teammates(self.username, self.my_team_name, self.match_info) if blackboard else []
+        self.remote_opponents: List[EntitySnapshot] = remote_opponents(self.teammate_intel, world.players)
+
+        # the items that find_items found this tick, if it was called
+        self.items_found: Optional[List[EntitySnapshot]] = None
+
+    def release(self):
+        """
+        Let go of everything this tick read from the bot, at the end of the pass.  The entities and items in the snapshot
+        hold JS proxies, which keep their objects alive on the JS side until the proxies are freed, and a snapshot that
+        is kept around (by the async loop until the next pass, or by a reference cycle through a recording proxy) would
+        hold a tick's worth of them.  The snapshot can't be used after this.
+        """
+        self.bot = None
+        self.opponents = self.teammates = self.remote_opponents = None
+        self.teammate_intel = None
+        self.items_found = None
+
+    def nearest_players(self, names: List[str], max_count: int, max_distance: float) -> List[EntitySnapshot]:
+        """
+        The nearest players from the cache with one of the given names, closest first.
+        These are copies, so they won't change if an event arrives during this tick.
+        """
+        players = self.world.players
+        candidates = [players[name] for name in names if name in players]
+        return [p.copy() for p in rank_nearest(candidates, self.position, max_count, max_distance)]
+
+    def find_items(self, max_count: int, max_distance: float = 33, max_y_delta: Optional[float] = None,
+                   candidate_count: int = 10) -> List[EntitySnapshot]:
+        """
+        The best items on the ground to collect, see ranking.find_items.  Unlike the rest of the snapshot this is read
+        from the bot when it is called, since most ticks don't need it.
+        """
+        self.items_found = find_items(self.bot, self.position, self.inventory_index, max_count, max_distance, max_y_delta,
+                                      candidate_count)
+        return self.items_found
+
+    def inventory_changed(self):
+        """
+        Call this after using up an item, so that the inventory is re-read next tick
+        """
+        self.world.inventory_changed()
+
+
+def capture_snapshot(world: WorldState) -> Optional[TickSnapshot]:
+    """
+    Refresh the world state and take the snapshot for this tick.  Returns None if the match info is not available yet.
+    """
+    world.refresh()
+    if not world.match_info:
+        return None
+    return TickSnapshot(world)
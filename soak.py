@@ -0,0 +1,122 @@
+"""
+A soak test: many matches back to back on one bot in one process, against the simulator, checking that memory stays flat.
+
+Our bots play match after match without restarting, so anything that is kept per tick or per match and never let go
+adds up.  This drives main loop passes through thousands of simulated ticks, like benchmark.py does, starting a new
+match on the same bot whenever one ends.  After every match it measures the resident memory.  The first matches warm
+up the caches, and after them it may not grow by more than the limit:
+
+    python soak.py --matches 10 --seconds 120
+
+The exit code is 1 if memory grew.  With --trace the Python heap is traced with tracemalloc as well, which is much
+slower, and the allocation sites that grew are printed.  Tracing uses memory of its own, so then only the heap is checked.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from typing import List
+
+os.environ['RG_BACKEND'] = 'simulator'
+os.environ.setdefault('RG_LOG_LEVEL', 'WARNING')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_bytes() -> int:
+    from telemetry import _rss_bytes
+    return _rss_bytes() or 0
+
+
+def run_soak(matches: int, seconds: float, seed: int, opponents: int, warmup: int, trace: bool = False) -> dict:
+    import simulator
+    from regression_games import RGCTFUtils
+    from start import main_loop_pass
+    from world_state import WorldState
+
+    sim_world = simulator.create_world(opponents=opponents, speed=0, blocking_goto=False, seed=seed, match_seconds=seconds)
+    bot = sim_world.bot
+    world_state = WorldState(bot, RGCTFUtils(bot))
+
+    if trace:
+        tracemalloc.start(10)
+    samples: List[dict] = []
+    snapshots = []
+    passes = 0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for match in range(matches):
+            if match:
+                sim_world.new_match()
+            while sim_world.match_in_progress:
+                sim_world.step(1)
+                sim_world.sync()
+                main_loop_pass(world_state)
+                passes += 1
+            gc.collect()
+            heap = tracemalloc.get_traced_memory()[0] if trace else None
+            samples.append({'match': match + 1, 'passes': passes, 'rss_bytes': rss_bytes(), 'heap_bytes': heap})
+            if trace and match + 1 in (warmup, matches):
+                snapshots.append(tracemalloc.take_snapshot())
+    if trace:
+        tracemalloc.stop()
+
+    growth = []
+    if len(snapshots) == 2:
+        growth = [str(stat) for stat in snapshots[1].compare_to(snapshots[0], 'lineno')[:10] if stat.size_diff > 0]
+    return {'samples': samples, 'heap_growth': growth}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play matches back to back against the simulator and check that memory stays flat')
+    parser.add_argument('--matches', type=int, default=10)
+    parser.add_argument('--seconds', type=float, default=120, help='length of each match in game seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--opponents', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=2, help='matches to play before memory is expected to stay flat, at least 1')
+    parser.add_argument('--max-rss-growth-mb', type=float, default=4.0)
+    parser.add_argument('--max-heap-growth-kb', type=float, default=256.0)
+    parser.add_argument('--trace', action='store_true', help='trace the Python heap, and check it instead of the RSS')
+    parser.add_argument('--output', help='write the samples to this JSON file')
+    args = parser.parse_args(argv)
+    if args.warmup < 1:
+        parser.error('--warmup has to be at least 1, memory is measured from the end of the warmup')
+    if args.matches <= args.warmup:
+        parser.error('--matches has to be more than --warmup')
+
+    report = run_soak(args.matches, args.seconds, args.seed, args.opponents, args.warmup, args.trace)
+    samples = report['samples']
+    for sample in samples:
+        heap = f", heap {sample['heap_bytes'] / 2 ** 10:.0f}KB" if args.trace else ''
+        print(f"match {sample['match']:>3}: {sample['passes']:>7} passes, rss {sample['rss_bytes'] / 2 ** 20:.1f}MB{heap}")
+
+    # the growth from the end of the warmup to the highest point after it
+    warm = samples[args.warmup - 1]
+    after = samples[args.warmup:]
+    failures = []
+    if args.trace:
+        heap_growth = report['heap_growth_bytes'] = max(s['heap_bytes'] for s in after) - warm['heap_bytes']
+        print(f'Heap growth after the warmup: {heap_growth / 2 ** 10:.0f}KB')
+        if heap_growth > args.max_heap_growth_kb * 2 ** 10:
+            failures.append(f'the Python heap grew by {heap_growth / 2 ** 10:.0f}KB after the warmup (limit {args.max_heap_growth_kb:.0f}KB)')
+    else:
+        rss_growth = report['rss_growth_bytes'] = max(s['rss_bytes'] for s in after) - warm['rss_bytes']
+        print(f'RSS growth after the warmup: {rss_growth / 2 ** 20:.2f}MB')
+        if rss_growth > args.max_rss_growth_mb * 2 ** 20:
+            failures.append(f'RSS grew by {rss_growth / 2 ** 20:.1f}MB after the warmup (limit {args.max_rss_growth_mb}MB)')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    for failure in failures:
+        print(f'FAILED: {failure}')
+    if failures and report['heap_growth']:
+        print('Largest heap growth by allocation site:')
+        for line in report['heap_growth']:
+            print(f'  {line}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,24 +4,87 @@ on almost every tick of the game.
 """
 
 import logging
-import json
-import traceback
-
-logging.basicConfig(level=logging.NOTSET)
 
 import os, sys
+import time
 sys.path.append(os.path.dirname(__file__))
 
+from bot_logging import setup_logging
+
+# see bot_logging.py for the RG_LOG_LEVEL and RG_LOG_LEVELS settings
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def main_loop_pass(world_state) -> bool:
+    """
+    A single pass of the main loop: take a snapshot of the world state for this tick, then let the strategies take an action.
+    Returns False if the match info is not available yet.
+    """
+    from snapshot import capture_snapshot
+
+    # everything we need to know about the world for this pass, in one go
+    snapshot = capture_snapshot(world_state)
+    if not snapshot:
+        return False
+    take_action(snapshot)
+    return True
+
+
+def take_action(snapshot) -> None:
+    """
+    Decide what to do with this tick's snapshot, and do it
+    """
+    from strategy import run_strategies
+    import instrumentation
+    import replay
+    import telemetry
+
+    # with RG_REPLAY_DIR set, record what the strategies see and do this tick
+    replay.begin_tick(snapshot)
+
+    # let go of the tick's JS proxies and finish the pass even when a strategy fails
+    try:
+        # log information about my state
+        logger.debug('My team: %s, my position: %s, my inventory: %s', snapshot.my_team_name, snapshot.position, snapshot.inventory_names)
+        logger.debug('Found the following opponents: %s', snapshot.opponent_names)
+
+        # equip my best armor, if I've picked something up or respawned since the last time
+        snapshot.world.equipment.equip_armor()
+
+        role = run_strategies(snapshot, snapshot.rg_ctf_utils, snapshot.opponents, snapshot.teammates)
+        replay.end_tick(snapshot, role)
+        telemetry.decided(snapshot.world, role)
+
+        # tell the rest of my team what I can see, and what I'm doing about it
+        if snapshot.world.blackboard:
+            snapshot.world.blackboard.publish(snapshot, role)
+    finally:
+        snapshot.release()
+        instrumentation.end_pass(instrumentation.stats_of(snapshot.world.bot))
+
 
 def configure_bot(bot):
     """
     configure_bot is called by Regression games - this is where you configure
     how your bot behaves
     """
+    configure_started = time.perf_counter()
 
+    import regression_games
     from regression_games import RGBot, RGCTFUtils, armorManager, RGEventHandler, Vec3, Entity
-    from utilities import get_unbreakable_blocks, name_for_item, nearest_teammates, throttle_runtime
-    from strategy import handle_attack_flag_carrier, handle_attack_nearby_opponent, handle_bot_idle_position, handle_looting_items, handle_low_health, handle_placing_blocks, handle_scoring_flag, handle_collecting_flag
+    from utilities import get_unbreakable_blocks
+    from scheduler import TickScheduler
+    from world_state import WorldState
+    from blackboard import TeamBlackboard
+    from errors import ErrorHandler
+    import instrumentation
+    import navigation
+    import replay
+    import telemetry
+    import utilities
+    # import the strategies now rather than on the first tick, so that a bot joining late can act straight away
+    import strategy
 
 
     #  Disable rg-bot debug logging.  You can enable this to see more details about rg-bot api calls
@@ -38,7 +101,15 @@ def configure_bot(bot):
     rg_ctf_utils.setDebug(True)
 
     # Load the armor-manager plugin (https://github.com/PrismarineJS/MineflayerArmorManager)
-    bot.mineflayer().loadPlugin(armorManager)
+    bot.mineflayer().loadPlugin(armorManager.load())
+
+    # With RG_INSTRUMENT=1, record every bridge call made from here on, see instrumentation.py.  Telemetry needs the
+    # time spent in bridge calls too.
+    if instrumentation.enabled() or telemetry.enabled():
+        bot = instrumentation.instrument(bot, 'bot')
+        rg_ctf_utils = instrumentation.instrument(rg_ctf_utils, 'rg_ctf_utils', instrumentation.stats_of(bot))
+    # the bridge calls of this bot only, None when it isn't instrumented
+    call_stats = instrumentation.stats_of(bot)
 
     # default to true in-case we miss the start
     match_in_progress = True
@@ -46,21 +117,51 @@ def configure_bot(bot):
     # Information about the unbreakable block types
     unbreakable = get_unbreakable_blocks(bot)
 
+    # A cache of the world, kept up to date by events.  With RG_BLACKBOARD=1 it is shared with the bots on my team that
+    # run on the same machine, through the team blackboard
+    blackboard = TeamBlackboard() if os.environ.get('RG_BLACKBOARD') == '1' else None
+    world_state = WorldState(bot, rg_ctf_utils, blackboard=blackboard)
+
+    # Keeps the main loop in step with the server's ticks
+    scheduler = TickScheduler()
+
+    # Routes to the key points of the arena, if the navigation graph has been built (see navigation.py)
+    utilities.navigation = navigation.load_default(rg_ctf_utils)
+
+    # With RG_REPLAY_DIR set, record every match for replay.py
+    if replay.enabled():
+        replay.install(world_state, rg_ctf_utils)
+
+    # With RG_TELEMETRY_DIR or RG_TELEMETRY_PORT set, collect performance telemetry for every match, see telemetry.py
+    if telemetry.enabled():
+        telemetry.install(world_state, scheduler)
+
     @RGEventHandler(bot, 'match_ended')
     def match_ended(self, match_info, *args):
+        nonlocal match_in_progress
         if match_info:
             players = [p for p in match_info.players if p.username == bot.username()]
             player = players[0] if players else None
             if player:
                 points = player.metadata.score
                 captures = player.metadata.flagCaptures
-                print(f'The match has ended - I had {captures} captures and scored {points} points')
+                logger.info('The match has ended - I had %s captures and scored %s points', captures, points)
         match_in_progress = False
+        if blackboard:
+            blackboard.unlink()
+        instrumentation.write_report(call_stats, bot.username())
+        replay.end_match(world_state)
+        telemetry.end_match(world_state)
 
     @RGEventHandler(bot, 'match_started')
     def match_started(self, match_info, *args):
-        print("The match has started")
+        nonlocal match_in_progress
+        logger.info('The match has started')
         match_in_progress = True
+        if blackboard:
+            blackboard.start_match()
+        replay.start_match(world_state)
+        telemetry.start_match(world_state)
 
     # Part of using a main loop is being careful not to leave it running at the wrong time.
     # It is very easy to end up with 2 loops running by accident.
@@ -70,23 +171,27 @@ def configure_bot(bot):
 
     @RGEventHandler(bot, 'playerLeft')
     def player_left(self, player, *args):
+        nonlocal main_loop_instance_tracker
         if (player.username == bot.username()):
-            print("I have left the match")
+            logger.info('I have left the match')
             main_loop_instance_tracker += 1
 
     @RGEventHandler(bot, 'end')
     def end(self, *args):
-        print("I have disconnected")
+        nonlocal main_loop_instance_tracker
+        logger.info('I have disconnected')
         main_loop_instance_tracker += 1
 
     @RGEventHandler(bot, 'kicked')
     def kicked(self, *args):
-        print("I have been kicked")
+        nonlocal main_loop_instance_tracker
+        logger.warning('I have been kicked')
         main_loop_instance_tracker += 1
 
     @RGEventHandler(bot, 'death')
     def death(self, *args):
-        print("I have died")
+        nonlocal main_loop_instance_tracker
+        logger.info('I have died')
         main_loop_instance_tracker += 1
         try:
             # Try to stop any goal currently going on
@@ -99,95 +204,49 @@ def configure_bot(bot):
     def main_loop(): 
         current_main_loop_instance = main_loop_instance_tracker
         is_active_function = lambda: match_in_progress and current_main_loop_instance == main_loop_instance_tracker
+        # pathfinding interruptions carry straight on, other errors are logged and backed off from, see errors.py
+        errors = ErrorHandler('main loop pass')
+        scheduler.reset()
         while is_active_function():
 
             try:
-                # always throttle the runtime first to make sure we don't execute too frequently and waste CPU
-                throttle_runtime(bot)
+                # always wait for the next tick first to make sure we don't execute too frequently and waste CPU
+                scheduler.wait()
 
-                if not bot.matchInfo():
-                    print("Match info not available yet, waiting")
+                if not main_loop_pass(world_state):
+                    logger.info('Match info not available yet, waiting')
                     continue
-
-                #find out which team I'm on
-                my_team_name: str = bot.getMyTeam()
-                other_team_names: str = [t for t in bot.matchInfo().teams if t.name != my_team_name]
-                other_team_name = other_team_names[0].name if other_team_names else None
-
-                # get my current position and log information about my state
-                my_position: Vec3 = bot.position()
-                print(f'My team: {my_team_name}, my position: {bot.vecToString(my_position)}, my inventory: ${json.dumps([name_for_item(item) for item in bot.getAllInventoryItems()])}')
-
-                # find any opponents in range
-                opponent_names: list[str] = list(bot.getOpponentUsernames())
-                print(f'Found the following opponents: {opponent_names}')
-                print(opponent_names if opponent_names else ['...'])
-                opponents_results = bot.findEntities({
-                    # opNames can be empty in practice mode where there is no other team
-                    # if we don't pass some array to match, then this will return all entities instead
-                    'entityNames': opponent_names if opponent_names else ['...'],
-                    'attackable': True,
-                    'maxCount': 3,
-                    'maxDistance': 33, # Bots can only see ~30 +/1 blocks, so no need to search far
-                    # override the default value function here as we aren't using this value in the sortValueFunction
-                    'entityValueFunction': lambda entity_name: 0,
-                    # just sort them by distance for now... We'll filter them by decision point later
-                    'sortValueFunction': lambda distance, entity_value, health, defense, toughness: distance
-                })
-                opponents: list[Entity] = [o.result for o in opponents_results]
-
-                # find any teammates in range
-                teammates: list[Entity] = nearest_teammates(bot, 33, True)
-
-                # equip my best armor
-                bot.mineflayer().armorManager.equipAll()
-
-                # Only take 1 action per main loop pass.  There are exceptions, but this is best practice as the
-                # game server can only process so many actions per tick
-                did_something: bool = False
-
-                if not did_something:
-                    # Check if I'm low on health
-                    did_something = handle_low_health(bot, rg_ctf_utils, opponents, teammates)
-
-                if not did_something:
-                    # if someone has the flag, hunt down player with flag if it isn't a team-mate
-                    did_something = handle_attack_flag_carrier(bot, rg_ctf_utils, opponents, teammates)
-
-                if not did_something:
-                    # do I need to attack a nearby opponent
-                    did_something = handle_attack_nearby_opponent(bot, rg_ctf_utils, opponents, teammates)
-
-                if not did_something:
-                    # if I have the flag, go score
-                    did_something = handle_scoring_flag(bot, rg_ctf_utils, opponents, teammates)
-
-                if not did_something:
-                    # go pickup the loose flag
-                    did_something = handle_collecting_flag(bot, rg_ctf_utils, opponents, teammates)
-
-                if not did_something:
-                    # If no-one within N blocks, place blocks
-                    did_something = handle_placing_blocks(bot, rg_ctf_utils, opponents, teammates)
-
-                if not did_something:
-                    # see if we can find some items to loot
-                    did_something = handle_looting_items(bot, rg_ctf_utils, opponents, teammates)
-
-                if not did_something:
-                    # we had nothing to do ... move towards the middle
-                    did_something = handle_bot_idle_position(bot, rg_ctf_utils, opponents, teammates)
+                errors.succeeded()
             except Exception as exc:
-                # if we get anything other than a pathfinding change error, log it so that we can fix our bot
-                if 'GoalChanged' not in str(exc) or 'PathStopped' not in str(exc):
-                    print("An exception occurred while running this turn of logic")
-                    print(traceback.format_exc())
-                    # wait 1 seconds before looping again to avoid tight loops on errors
-                    bot.wait(20)
-
-        print(f'Ended loop that ran for instance {main_loop_instance_tracker} of the bot')
+                delay = errors.handle(exc)
+                if delay > 0:
+                    scheduler.sleep(delay)
+
+        logger.info('Ended loop that ran for instance %s of the bot', main_loop_instance_tracker)
+        logger.info('[Scheduler] %s', scheduler.report())
+        logger.info('[Errors] %s', errors.report())
+        logger.info('[Movement] %s', world_state.movement.report())
+        logger.info('[Equipment] %s', world_state.equipment.report())
+
+    # The asyncio variant of the main loop runs on its own thread, this is the thread of the latest one
+    async_main_loop_thread = None
+
+    def start_async_main_loop():
+        nonlocal async_main_loop_thread
+        from async_loop import AsyncMainLoop
+        current_main_loop_instance = main_loop_instance_tracker
+        is_active_function = lambda: match_in_progress and current_main_loop_instance == main_loop_instance_tracker
+        # wait for the previous loop to notice that it should stop, so that 2 loops never run at once
+        async_main_loop_thread = AsyncMainLoop(bot, world_state, scheduler, is_active_function).start(after=async_main_loop_thread)
 
     @RGEventHandler(bot, 'spawn')
     def on_spawn(self, *args):
         bot.chat('I have come to win Capture The Flag with my main loop.')
-        main_loop()
+        if os.environ.get('RG_MAIN_LOOP') == 'async':
+            start_async_main_loop()
+        else:
+            main_loop()
+
+    # the JS modules are loaded the first time they are used, see regression_games.py
+    logger.info('[Startup] configure_bot took %.0fms, loading JS modules took %s', (time.perf_counter() - configure_started) * 1000,
+                ', '.join(f'{name} {seconds * 1000:.0f}ms' for name, seconds in regression_games.load_timings.items()))
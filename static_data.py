@@ -0,0 +1,69 @@
+"""
+Game data that never changes for a given game version, like block ids, cached on disk.
+
+Looking up a block id takes two round trips (blocksByName, then the block's id), so reading the few dozen that
+configure_bot needs holds up every bot start by a noticeable amount of time.  They are read from the bot once, saved
+to a JSON file keyed by the pinned library versions and the game version, and read from the file from then on.
+
+The other static tables (the potion names in utilities.py, the blockade positions in strategy.py) are Python
+constants already, and need no caching.
+
+Environment variables (all optional):
+    RG_STATIC_DATA_FILE: the cache file.  Defaults to static_data.json next to this file
+"""
+import json
+import logging
+import os
+import threading
+from typing import Dict, List
+
+from regression_games import RGBot, MINEFLAYER_VERSION, RG_BOT_VERSION
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static_data.json')
+
+_lock = threading.Lock()
+
+
+def cache_key(game_version: str) -> str:
+    return f'mineflayer-{MINEFLAYER_VERSION}/rg-bot-{RG_BOT_VERSION}/minecraft-{game_version}'
+
+
+def _load(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def block_ids(bot: RGBot, names: List[str]) -> Dict[str, int]:
+    """
+    The ids of blocks by name, from the cache file if they are in it, otherwise read from the bot and added to it
+
+    Args:
+        bot: RGBot instance, only used on a cache miss (and to read the game version)
+        names: The block names, like 'stone_bricks'
+    """
+    path = os.environ.get('RG_STATIC_DATA_FILE', DEFAULT_PATH)
+    key = cache_key(bot.mineflayer().version)
+    with _lock:
+        data = _load(path)
+        cached: Dict[str, int] = data.get(key, {}).get('block_ids', {})
+        missing = [name for name in names if name not in cached]
+        if missing:
+            blocks_by_name = bot.mcData.blocksByName
+            for name in missing:
+                cached[name] = getattr(blocks_by_name, name).id
+            data.setdefault(key, {})['block_ids'] = cached
+            try:
+                # write the whole file at once, so that bots starting together never read half of it
+                temporary = f'{path}.{os.getpid()}.tmp'
+                with open(temporary, 'w') as f:
+                    json.dump(data, f, indent=2, sort_keys=True)
+                os.replace(temporary, path)
+            except OSError as exc:
+                logger.warning('[Static data] Could not save the block ids to %s: %s', path, exc)
+            logger.info('[Static data] Read %d block ids from the bot, cached in %s', len(missing), path)
+    return {name: cached[name] for name in names}
@@ -1,164 +1,260 @@
 """
 A set of strategies for our bot
 """
+import logging
 import math
-from typing import List
+import os
+from typing import List, Optional
 from regression_games import RGBot, FindResult, Item, Entity, Vec3, RGCTFUtils
-from utilities import move_toward_position, use_potion_of_type, get_potion_of_type, use_potion
+from records import Point, EntitySnapshot, point_from_vec3
+from snapshot import TickSnapshot
+from pipeline import Pipeline, requires, strategy_name
+from tracking import CLOSE_LOOKAHEAD, MAX_LOOKAHEAD
+from utilities import move_toward_position, use_potion_of_type, get_potion_of_type, use_potion, to_vec3
 
-def handle_low_health(bot: RGBot, rg_ctf_utils: RGCTFUtils, opponents: List[Entity], teammates: List[Entity]) -> bool:
-    if bot.mineflayer().health <= 7:
+logger = logging.getLogger(__name__)
+
+# players keep moving, so a chase only gets a new goal once they are this far from the last one
+PLAYER_RETARGET_DISTANCE = 6
+
+# opponents this close can be hit, further away they are chased
+MELEE_RANGE = 3
+
+# how many of the nearest items looting ranks.  Items I don't have are preferred however far they are, so this is enough
+# for every item in range in practice, like the JS ranking over all of them did
+LOOT_CANDIDATES = 64
+
+@requires('health_low')
+def handle_low_health(snapshot: TickSnapshot, rg_ctf_utils: RGCTFUtils, opponents: List[EntitySnapshot], teammates: List[EntitySnapshot]) -> bool:
+    if snapshot.health <= 7:
         #near death, see if I can use a potion to make the opponent die with me
-        nearby_opponents = [o for o in opponents if o.position.distanceSquared(bot.position()) <= 16]
+        nearby_opponents = [o for o in opponents if o.position.distanceSquared(snapshot.position) <= 16]
         near_opponent = nearby_opponents[0] if nearby_opponents else None
         if near_opponent:
-            potion: Item = get_potion_of_type(bot, 'ninja')
+            potion: Item = get_potion_of_type(snapshot, 'ninja')
             if potion:
                 # look at their feet before throwing down a ninja potion
-                bot.mineflayer().lookAt(near_opponent.position.offset(0, -1, 0)) # TODO: WAS AWAIT
-                return use_potion(bot, potion) # TODO: WAS AWAIT
-    elif bot.mineflayer().health <= 15:
+                return use_potion(snapshot, potion, near_opponent.position.offset(0, -1, 0))
+    elif snapshot.health <= 15:
         # just need a top up
-        print('[Health] Need to use potion while my health is low')
-        return use_potion_of_type(bot, 'health') # TODO: WAS AWAIT
+        logger.info('[Health] Need to use potion while my health is low')
+        return use_potion_of_type(snapshot, 'health')
     return False
 
-def handle_attack_flag_carrier(bot: RGBot, rg_ctf_utils: RGCTFUtils, opponents: List[Entity], teammates: List[Entity]) -> bool:
+@requires('!flag_loose', '!has_flag')
+def handle_attack_flag_carrier(snapshot: TickSnapshot, rg_ctf_utils: RGCTFUtils, opponents: List[EntitySnapshot], teammates: List[EntitySnapshot]) -> bool:
     """
     find out if the flag is available
     """
-    flag_location: Vec3 = rg_ctf_utils.getFlagLocation()
-    if flag_location is None:
-        print(f'Checking {len(opponents)} opponents in range for flag carriers')
+    if snapshot.flag_location is None:
+        logger.debug('Checking %d opponents in range for flag carriers', len(opponents))
         # see if one of these opponents is holding the flag
-        opponents_with_flag = [o for o in opponents if o.heldItem and rg_ctf_utils.FLAG_SUFFIX in o.heldItem.name]
+        flag_suffix = rg_ctf_utils.FLAG_SUFFIX
+        opponents_with_flag = [o for o in opponents if o.held_item_name and flag_suffix in o.held_item_name]
         opponent_with_flag = opponents_with_flag[0] if opponents_with_flag else None
 
         if opponent_with_flag:
-            print(f'Attacking flag carrier {opponent_with_flag.name} at position: ${bot.vecToString(opponent_with_flag.position)}')
-            use_potion_of_type(bot, 'movement') # run faster to get them
-            # TODO: Once I get in range of attack, should I use a combat potion ? should I equip a shield ?
-            bot.attackEntity(opponent_with_flag)
+            use_potion_of_type(snapshot, 'movement') # run faster to get them
+            pursue(snapshot, opponent_with_flag, their_score_location(snapshot, rg_ctf_utils))
+            return True
+
+        # a teammate may be able to see the flag carrier when I can't, go and help them
+        remote_carriers = [o for o in snapshot.remote_opponents if o.name == snapshot.world.flag_carrier]
+        if remote_carriers:
+            carrier = remote_carriers[0]
+            intercept = snapshot.tracker.pursuit_goal(carrier, snapshot.position, their_score_location(snapshot, rg_ctf_utils))
+            logger.info('Teammates see flag carrier %s at position: %s, moving to intercept at %s', carrier.name, carrier.position, intercept)
+            move_toward_position(snapshot, intercept, 3, retarget_distance=PLAYER_RETARGET_DISTANCE)
             return True
     return False
 
-def handle_attack_nearby_opponent(bot: RGBot, rg_ctf_utils: RGCTFUtils, opponents: List[Entity], teammates: List[Entity]) -> bool:
+
+def their_score_location(snapshot: TickSnapshot, rg_ctf_utils: RGCTFUtils) -> Point:
+    """
+    Where the other team takes the flag to score
+    """
+    return point_from_vec3(rg_ctf_utils.RED_SCORE_LOCATION if snapshot.my_team_name == 'BLUE' else rg_ctf_utils.BLUE_SCORE_LOCATION)
+
+
+def pursue(snapshot: TickSnapshot, opponent: EntitySnapshot, destination: Optional[Point] = None, max_lookahead: float = MAX_LOOKAHEAD):
+    """
+    Attack an opponent if they are in reach, otherwise head for where I can intercept them, predicting at most
+    max_lookahead ticks ahead, see tracking.py
+    """
+    if opponent.position.distanceSquared(snapshot.position) <= MELEE_RANGE ** 2:
+        logger.info('Attacking %s at position: %s', opponent.name, opponent.position)
+        # TODO: Once I get in range of attack, should I use a combat potion ? should I equip a shield ?
+        snapshot.bot.attackEntity(opponent.entity)
+    else:
+        intercept = snapshot.tracker.pursuit_goal(opponent, snapshot.position, destination, max_lookahead=max_lookahead)
+        logger.info('Chasing %s at position: %s, heading to intercept at %s', opponent.name, opponent.position, intercept)
+        move_toward_position(snapshot, intercept, 1)
+
+@requires('opponents_in_attack_range')
+def handle_attack_nearby_opponent(snapshot: TickSnapshot, rg_ctf_utils: RGCTFUtils, opponents: List[EntitySnapshot], teammates: List[EntitySnapshot]) -> bool:
     outnumbered = len(teammates) + 1 < len(opponents)
     yolo = len(teammates) == 0
 
-    my_position = bot.position()
+    my_position = snapshot.position
 
     # opportunistically kill any player in close range even if that means dropping the flag to do it
     # within range 10 regular, 5 if I have the flag
-    the_opponents = [o for o in opponents if o.position.distanceSquared(my_position) <= (25 if rg_ctf_utils.hasFlag() else 100)]
+    attack_range_sq = 25 if snapshot.has_flag else 100
+    the_opponents = [o for o in opponents if o.position.distanceSquared(my_position) <= attack_range_sq]
 
-    print(f'Checking {len(the_opponents)} opponents in range to murder')
+    logger.debug('Checking %d opponents in range to murder', len(the_opponents))
     if the_opponents:
         first_opponent = the_opponents[0]
 
         # Attack if a teammate is nearby only, otherwise move toward team-mate
         if not outnumbered or yolo:
-            print(f'Attacking opponent at position: {bot.vecToString(first_opponent.position)}')
-            # TODO: Once I get in range of attack, should I use a combat potion ? should I equip a shield ?
-            bot.attackEntity(first_opponent)
+            # they are close already, don't chase a guess at where they might be in a few seconds
+            pursue(snapshot, first_opponent, max_lookahead=CLOSE_LOOKAHEAD)
             return True
         else:
-            print('Outnumbered, running to nearest team-mate for help')
+            logger.info('Outnumbered, running to nearest team-mate for help')
             # TODO: Do I need to use potions ? un-equip my shield to run faster ?
-            move_toward_position(bot, teammates[0].position, 3)
+            move_toward_position(snapshot, teammates[0].position, 3, retarget_distance=PLAYER_RETARGET_DISTANCE)
             return True
     return False
 
-def handle_scoring_flag(bot: RGBot, rg_ctf_utils: RGCTFUtils, opponents: List[Entity], teammates: List[Entity]) -> bool:
-    if rg_ctf_utils.hasFlag():
+@requires('has_flag')
+def handle_scoring_flag(snapshot: TickSnapshot, rg_ctf_utils: RGCTFUtils, opponents: List[EntitySnapshot], teammates: List[EntitySnapshot]) -> bool:
+    if snapshot.has_flag:
         # TODO: Do I need to use potions ? un-equip my shield to run faster ?
-        print('I have the flag, running to score')
-        my_team_name = bot.getMyTeam()
-        my_score_location =  rg_ctf_utils.BLUE_SCORE_LOCATION if my_team_name == 'BLUE' else rg_ctf_utils.RED_SCORE_LOCATION
-        move_toward_position(bot, my_score_location, 1)
+        logger.info('I have the flag, running to score')
+        my_score_location =  rg_ctf_utils.BLUE_SCORE_LOCATION if snapshot.my_team_name == 'BLUE' else rg_ctf_utils.RED_SCORE_LOCATION
+        move_toward_position(snapshot, my_score_location, 1)
         return True
     return False
 
-def handle_collecting_flag(bot: RGBot, rg_ctf_utils: RGCTFUtils, opponents: List[Entity], teammates: List[Entity]) -> bool:
-    flag_location: Vec3 = rg_ctf_utils.getFlagLocation()
+@requires('flag_loose')
+def handle_collecting_flag(snapshot: TickSnapshot, rg_ctf_utils: RGCTFUtils, opponents: List[EntitySnapshot], teammates: List[EntitySnapshot]) -> bool:
+    flag_location = snapshot.flag_location
     if flag_location:
-        print(f'Moving toward the flag at {bot.vecToString(flag_location)}')
+        logger.info('Moving toward the flag at %s', flag_location)
         # TODO: Do I need to use potions ? un-equip my shield to run faster ?
-        move_toward_position(bot, flag_location, 1)
+        move_toward_position(snapshot, flag_location, 1)
         return True
     return False
 
-placeable_block_display_names = ['Gravel', 'Grass Block', 'Dirt', 'Stripped Dark Oak Wood']
-
 # bridge blockade
-blue_block_placements = [Vec3(81,65,-387), Vec3(81, 66, -387), Vec3(81,65,-385), Vec3(81, 66, -385)]
+blue_block_placements = [Point(81,65,-387), Point(81, 66, -387), Point(81,65,-385), Point(81, 66, -385)]
 
 # bridge blockade
-red_block_placements = [Vec3(111,65,-387), Vec3(111, 66, -387), Vec3(111,65,-385), Vec3(111, 66, -385)]
+red_block_placements = [Point(111,65,-387), Point(111, 66, -387), Point(111,65,-385), Point(111, 66, -385)]
 
-def handle_placing_blocks(bot: RGBot, rg_ctf_utils: RGCTFUtils, opponents: List[Entity], teammates: List[Entity]) -> bool:
-    my_position = bot.position()
-    my_team_name = bot.getMyTeam()
+@requires('!opponents_near_my_level', 'has_blocks')
+def handle_placing_blocks(snapshot: TickSnapshot, rg_ctf_utils: RGCTFUtils, opponents: List[EntitySnapshot], teammates: List[EntitySnapshot]) -> bool:
+    bot = snapshot.bot
+    my_position = snapshot.position
 
     # only consider bots on the same y plane not those down in the tunnel, and within range 15
     the_opponents = [o for o in opponents if abs(o.position.y - my_position.y) < 5 and o.position.distanceSquared(my_position) < 225]
 
-    print(f'Checking {len(the_opponents)} opponents in range before getting items or placing blocks')
+    logger.debug('Checking %d opponents in range before getting items or placing blocks', len(the_opponents))
     if len(the_opponents) == 0:
         # If I have blocks to place, go place blocks at strategic locations if they aren't already filled
-        block_in_inventory = [i for i in bot.getAllInventoryItems() if i.displayName in placeable_block_display_names]
+        # the best of the inventory.PLACEABLE_BLOCKS that I have
+        block_in_inventory = snapshot.inventory_index.best('blocks')
 
         if block_in_inventory:
-            print(f'I have a "{block_in_inventory.displayName}" block to place')
-            block_placements = blue_block_placements if my_team_name == 'BLUE' else red_block_placements
-            for location in block_placements:
+            block_item, block_name = block_in_inventory
+            logger.debug('I have a "%s" block to place', block_name)
+            region = 'blue_blockade' if snapshot.my_team_name == 'BLUE' else 'red_blockade'
+            blocks = snapshot.world.blocks
+            blocks.watch(region, blue_block_placements if region == 'blue_blockade' else red_block_placements)
+            # the blockade spots that are still air, from the block cache
+            for location in blocks.air(region):
                 # if I'm within 20 blocks of a place to put blocks
-                block = bot.mineflayer().blockAt(location)
                 range_sq = location.distanceSquared(my_position)
-                print(f'Checking for block: {block and block.type} at range_sq: {range_sq}')
+                logger.debug('Checking for block at: %s range_sq: %s', location, range_sq)
                 if range_sq <= 400:
-                    if not block or block.type == 0: # air
-                        print(f'Moving to place block "{block_in_inventory.displayName}" at: {location}')
-                        move_toward_position(bot, location, 3)
-                        # if I'm close, then place the block
-                        if location.distanceSquared(my_position) < 15:
-                            print(f'Placing block "{block_in_inventory.displayName}" at: {location}')
-                            # TODO: RGBot.placeBlock should handle this for us once a defect is fixed
-                            bot.mineflayer().equip(block_in_inventory, 'hand')
-                            # place block on top face of the block under our target
-                            bot.mineflayer().placeBlock(bot.mineflayer().blockAt(location.offset(0, -1, 0)), Vec3(0, 1, 0))
-                        return True
+                    logger.info('Moving to place block "%s" at: %s', block_name, location)
+                    move_toward_position(snapshot, location, 3)
+                    # if I'm close, then place the block
+                    if location.distanceSquared(my_position) < 15:
+                        logger.info('Placing block "%s" at: %s', block_name, location)
+                        # TODO: RGBot.placeBlock should handle this for us once a defect is fixed
+                        snapshot.world.equipment.hold(block_item, block_name)
+                        # place block on top face of the block under our target
+                        bot.mineflayer().placeBlock(bot.mineflayer().blockAt(to_vec3(location.offset(0, -1, 0))), Vec3(0, 1, 0))
+                        snapshot.inventory_changed()
+                    return True
         else:
-            print('No placeable blocks in inventory')
+            logger.debug('No placeable blocks in inventory')
     return False
 
-def handle_looting_items(bot: RGBot, rg_ctf_utils: RGCTFUtils, opponents: List[Entity], teammates: List[Entity]) -> bool:
-    my_position = bot.position()
-    items = bot.findItemsOnGround({
-        'maxDistance': 33,
-        'maxCount': 5,
-        # prioritize items I don't have that are the closest
-        'itemValueFunction': lambda block_name: 999999 if bot.inventoryContainsItem(block_name) else 1,
-        'sortValueFunction': lambda distance, point_value: distance * point_value
-    })
+def handle_looting_items(snapshot: TickSnapshot, rg_ctf_utils: RGCTFUtils, opponents: List[EntitySnapshot], teammates: List[EntitySnapshot]) -> bool:
     # TODO: Should I let my bots run down into the tunnel for better loot ?
     #       or keep them on the top only
-    items = [i.result for i in items if abs(i.result.position.y - my_position.y) < 5]
+    items = snapshot.find_items(1, max_y_delta=5, candidate_count=LOOT_CANDIDATES)
     item = items[0] if items else None
 
     if item:
-        print(f'Going to collect item: {item.name} at: {bot.vecToString(item.position)}')
+        logger.info('Going to collect item: %s at: %s', item.name, item.position)
         # TODO: Do I need to use potions ? un-equip my shield to run faster ?
-        move_toward_position(bot, item.position, 1)
+        move_toward_position(snapshot, item.position, 1)
         return True
     return False
 
-def handle_bot_idle_position(bot: RGBot, rg_ctf_utils: RGCTFUtils, opponents: List[Entity], teammates: List[Entity]) -> bool:
+def handle_bot_idle_position(snapshot: TickSnapshot, rg_ctf_utils: RGCTFUtils, opponents: List[EntitySnapshot], teammates: List[EntitySnapshot]) -> bool:
     # TODO: Is this really the best place to move my bot towards ?
     # Hint: This is where most of Macro game strategy gets implemented
     # Do my bots spread out to key points looking for items or opponents ?
     # Do my bots group up to control key areas of the map ?
     # Do those areas of the map change dependent on where the flag currently is ?
-    print(f'Moving toward center point: ${bot.vecToString(rg_ctf_utils.FLAG_SPAWN)}')
-    move_toward_position(bot, rg_ctf_utils.FLAG_SPAWN, 1)
+    flag_spawn = point_from_vec3(rg_ctf_utils.FLAG_SPAWN)
+    logger.info('Moving toward center point: %s', flag_spawn)
+    move_toward_position(snapshot, flag_spawn, 1)
     return True
+
+# The strategies to try each main loop pass, in priority order
+STRATEGIES = [
+    # Check if I'm low on health
+    handle_low_health,
+    # if someone has the flag, hunt down player with flag if it isn't a team-mate
+    handle_attack_flag_carrier,
+    # do I need to attack a nearby opponent
+    handle_attack_nearby_opponent,
+    # if I have the flag, go score
+    handle_scoring_flag,
+    # go pickup the loose flag
+    handle_collecting_flag,
+    # If no-one within N blocks, place blocks
+    handle_placing_blocks,
+    # see if we can find some items to loot
+    handle_looting_items,
+    # we had nothing to do ... move towards the middle
+    handle_bot_idle_position,
+]
+
+# The priority order of the strategies for each kind of bot, by name without the handle_ prefix.  Choose one with RG_ROLE
+ROLE_PRIORITIES = {
+    'default': [strategy_name(s) for s in STRATEGIES],
+    # holds the bridge: fights and blocks it before going for the flag
+    'defender': ['low_health', 'attack_nearby_opponent', 'attack_flag_carrier', 'placing_blocks', 'scoring_flag',
+                 'collecting_flag', 'looting_items', 'bot_idle_position'],
+    # goes for the flag first, and only fights when it has to
+    'runner': ['low_health', 'scoring_flag', 'collecting_flag', 'attack_flag_carrier', 'attack_nearby_opponent',
+               'looting_items', 'bot_idle_position'],
+}
+
+def pipeline_for_role(role: str) -> Pipeline:
+    if role not in ROLE_PRIORITIES:
+        raise ValueError(f'Unknown RG_ROLE {role}, expected one of {", ".join(ROLE_PRIORITIES)}')
+    return Pipeline(STRATEGIES, ROLE_PRIORITIES[role])
+
+pipeline = pipeline_for_role(os.environ.get('RG_ROLE', 'default'))
+
+def run_strategies(snapshot: TickSnapshot, rg_ctf_utils: RGCTFUtils, opponents: List[EntitySnapshot], teammates: List[EntitySnapshot]) -> Optional[str]:
+    """
+    Run the strategies in priority order until one of them takes an action, skipping those whose required facts
+    don't hold this tick (see pipeline.py).
+    Only take 1 action per main loop pass.  There are exceptions, but this is best practice as the
+    game server can only process so many actions per tick
+
+    Returns: The role I took this pass, which is the name of the strategy that took an action without the handle_ prefix,
+    or None if none of them did
+    """
+    return pipeline.run(snapshot, rg_ctf_utils, opponents, teammates)
@@ -0,0 +1,358 @@
+"""
+Performance telemetry for a whole match, to compare matches with each other.
+
+Set RG_TELEMETRY_DIR and every match is summarized in a small JSON file in that directory when it ends: histograms of
+the main loop pass time, split into the time spent waiting on the bridge and the time spent in Python, the overruns and
+skipped ticks, how often each strategy made the decision, how many pathfinding goals were set and kept, and the memory
+high-water mark.  Joined up with the match results, these show whether a change in performance changed the win rate.
+
+The pass times are kept in log-linear histograms (like HdrHistogram), so that percentiles are accurate to about 2%
+whatever the range, in a few hundred counters.  The bridge time is measured by the instrumentation proxies (see
+instrumentation.py), which are put around the bot whenever telemetry is on.  Only the calls the pass itself makes are
+counted, not a goto running in the background at the same time.
+
+Each bot's telemetry is kept on its WorldState.  Set RG_TELEMETRY_PORT as well to serve the current match's telemetry
+of every bot in the process at http://127.0.0.1:PORT/metrics, in the Prometheus text format, labelled by bot.  Port 0
+picks a free port, and logs it.
+
+Environment variables (all optional):
+    RG_TELEMETRY_DIR: write a telemetry file for every match to this directory.  Defaults to off
+    RG_TELEMETRY_PORT: serve the metrics on this local port.  Defaults to off
+"""
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+import instrumentation
+
+try:
+    import resource
+except ImportError:
+    # not on Windows, where only the sampled memory is reported
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# the number of buckets per power of 2 is 2 ** (SUB_BUCKET_BITS - 1), so each bucket is at most 1/32 of its value wide
+SUB_BUCKET_BITS = 6
+_HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+# the percentiles reported
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# how often the memory in use is sampled, in passes
+MEMORY_SAMPLE_PASSES = 200
+
+
+def _bucket(value: int) -> int:
+    if value < 2 * _HALF:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return shift * _HALF + (value >> shift)
+
+
+def _bucket_value(index: int) -> int:
+    # the middle of the bucket
+    if index < 2 * _HALF:
+        return index
+    shift = index // _HALF - 1
+    return ((index - shift * _HALF) << shift) + (1 << shift) // 2
+
+
+class Histogram:
+    """
+    A log-linear histogram of durations, counted in microseconds
+    """
+    __slots__ = ('counts', 'count', 'total', 'maximum')
+
+    def __init__(self):
+        # bucket index -> count, see _bucket
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, seconds: float):
+        index = _bucket(int(seconds * 1e6))
+        counts = self.counts
+        counts[index] = counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def percentile(self, quantile: float) -> float:
+        """
+        The duration in seconds that quantile of the recorded durations are at or below, like 0.99 for the p99
+        """
+        if not self.count:
+            return 0.0
+        wanted = quantile * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= wanted:
+                return min(_bucket_value(index) / 1e6, self.maximum)
+        return self.maximum
+
+    def report(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 4) if self.count else 0,
+            'max_ms': round(self.maximum * 1000, 4),
+            **{f'p{quantile * 100:g}_ms': round(self.percentile(quantile) * 1000, 4) for quantile in QUANTILES},
+            # [microseconds, count] for every bucket, to merge the histograms of many matches later
+            'buckets': [[_bucket_value(index), count] for index, count in sorted(self.counts.items())],
+        }
+
+
+def _rss_bytes() -> Optional[int]:
+    # the resident set size right now, on Linux
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _max_rss_bytes() -> Optional[int]:
+    # the high-water mark for the whole process, ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else None
+
+
+class MatchTelemetry:
+    """
+    The performance of one bot over one match.  The scheduler reports every pass to it, and take_action every decision.
+    """
+
+    def __init__(self, username: str, world_state, scheduler):
+        self.username = username
+        self.world_state = world_state
+        self.scheduler = scheduler
+        self._call_stats = instrumentation.stats_of(world_state.bot)
+        self._lock = threading.Lock()
+        self.start_match()
+
+    def pass_began(self):
+        """
+        Called by the TickScheduler as each pass begins, in the context the pass runs in
+        """
+        if self._call_stats:
+            self._call_stats.begin_pass()
+
+    def start_match(self):
+        with self._lock:
+            self.started = time.time()
+            self._started_clock = time.monotonic()
+            self.passes = Histogram()
+            self.bridge = Histogram()
+            self.python = Histogram()
+            # strategy name -> how many passes it made the decision, 'none' when no strategy did
+            self.decisions: Dict[str, int] = {}
+            self.memory_high_water = _rss_bytes() or 0
+            self._scheduler_start = self.scheduler.stats()
+            movement = self.world_state.movement
+            self._movement_start = (movement.goals_set, movement.goals_kept, movement.goals_replaced)
+
+    def pass_ended(self, pass_time: float):
+        """
+        Called by the TickScheduler with the time each pass took, in the context the pass ran in
+        """
+        # the async loop makes some of the calls of a pass concurrently, so they can add up to more than the pass
+        bridge_time = min(self._call_stats.pass_seconds(), pass_time) if self._call_stats else 0.0
+        with self._lock:
+            self.passes.record(pass_time)
+            self.bridge.record(bridge_time)
+            self.python.record(pass_time - bridge_time)
+            if self.passes.count % MEMORY_SAMPLE_PASSES == 0:
+                self.memory_high_water = max(self.memory_high_water, _rss_bytes() or 0)
+
+    def decided(self, role: Optional[str]):
+        role = role or 'none'
+        with self._lock:
+            self.decisions[role] = self.decisions.get(role, 0) + 1
+
+    def report(self) -> dict:
+        scheduler = self.scheduler.stats()
+        movement = self.world_state.movement
+        goals_set, goals_kept, goals_replaced = self._movement_start
+        with self._lock:
+            elapsed = time.monotonic() - self._started_clock
+            decisions = sum(self.decisions.values())
+            return {
+                'username': self.username,
+                'started': self.started,
+                'elapsed_seconds': round(elapsed, 3),
+                'passes': self.passes.report(),
+                'bridge': self.bridge.report(),
+                'python': self.python.report(),
+                'overruns': scheduler['overruns'] - self._scheduler_start['overruns'],
+                'skipped_ticks': scheduler['skipped_ticks'] - self._scheduler_start['skipped_ticks'],
+                'period_ms': scheduler['period_ms'],
+                'decisions': dict(sorted(self.decisions.items())),
+                'decisions_per_second': round(decisions / elapsed, 2) if elapsed else 0,
+                'goals_set': movement.goals_set - goals_set,
+                'goals_kept': movement.goals_kept - goals_kept,
+                'goals_replaced': movement.goals_replaced - goals_replaced,
+                'memory_high_water_bytes': max(self.memory_high_water, _rss_bytes() or 0),
+                'process_max_rss_bytes': _max_rss_bytes(),
+            }
+
+    def write(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'telemetry-{self.username}-{int(self.started * 1000)}.json')
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, separators=(',', ':'))
+        logger.info('[Telemetry] Wrote the match telemetry to %s', path)
+        return path
+
+    def metric_families(self) -> List[tuple]:
+        """
+        The telemetry as Prometheus metric families, (name, type, help, [(suffix, labels, value)]), labelled with the bot
+        """
+        report = self.report()
+        bot = f'bot="{self.username}"'
+        families: List[tuple] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[tuple]):
+            families.append((name, kind, help_text, [(suffix, (bot,) + labels, value) for suffix, labels, value in samples]))
+
+        for key, help_text in (('passes', 'Main loop pass time'), ('bridge', 'Time spent waiting on the bridge per pass'),
+                               ('python', 'Time spent in Python per pass')):
+            histogram = getattr(self, key)
+            with self._lock:
+                samples = [('', (f'quantile="{quantile}"',), histogram.percentile(quantile)) for quantile in QUANTILES]
+                samples += [('_sum', (), histogram.total), ('_count', (), histogram.count)]
+            metric(f'rg_{key}_seconds', 'summary', help_text, samples)
+        metric('rg_overruns_total', 'counter', 'Passes over the time budget', [('', (), report['overruns'])])
+        metric('rg_skipped_ticks_total', 'counter', 'Ticks skipped while a pass was running', [('', (), report['skipped_ticks'])])
+        metric('rg_decisions_total', 'counter', 'Passes decided by each strategy',
+               [('', (f'strategy="{role}"',), count) for role, count in report['decisions'].items()])
+        metric('rg_decisions_per_second', 'gauge', 'Decisions per second this match', [('', (), report['decisions_per_second'])])
+        metric('rg_goals_set_total', 'counter', 'Pathfinding goals set', [('', (), report['goals_set'])])
+        metric('rg_goals_kept_total', 'counter', 'Moves that kept the current goal', [('', (), report['goals_kept'])])
+        metric('rg_memory_high_water_bytes', 'gauge', 'Highest resident memory seen this match',
+               [('', (), report['memory_high_water_bytes'])])
+        return families
+
+    def metrics(self) -> str:
+        """
+        The telemetry in the Prometheus text format
+        """
+        return metrics_text([self])
+
+
+def metrics_text(telemetries: List[MatchTelemetry]) -> str:
+    """
+    The telemetry of several bots in the Prometheus text format, with each metric's samples for every bot together
+    """
+    # name -> (type, help, samples), in the order the names first appear
+    merged: Dict[str, tuple] = {}
+    for telemetry in telemetries:
+        for name, kind, help_text, samples in telemetry.metric_families():
+            merged.setdefault(name, (kind, help_text, []))[2].extend(samples)
+    lines: List[str] = []
+    for name, (kind, help_text, samples) in merged.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for suffix, labels, value in samples:
+            lines.append(f'{name}{suffix}{{{",".join(labels)}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class TelemetryRegistry:
+    """
+    The telemetry of every bot in the process, by username, served together on one port
+    """
+
+    def __init__(self):
+        self.telemetries: Dict[str, MatchTelemetry] = {}
+        self.server: Optional[ThreadingHTTPServer] = None
+        self._lock = threading.Lock()
+
+    def add(self, telemetry: MatchTelemetry):
+        with self._lock:
+            self.telemetries[telemetry.username] = telemetry
+
+    def metrics(self) -> str:
+        with self._lock:
+            telemetries = list(self.telemetries.values())
+        return metrics_text(telemetries)
+
+    def serve(self, port: int) -> ThreadingHTTPServer:
+        """
+        Serve the metrics at /metrics on a local port, on a daemon thread.  Only the first bot to ask starts the server,
+        the others are served by it too.
+        """
+        with self._lock:
+            if self.server is None:
+                self.server = _serve(port, self.metrics)
+            return self.server
+
+
+def _serve(port: int, metrics: Callable[[], str]) -> ThreadingHTTPServer:
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug('[Telemetry] ' + format, *args)
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='rg-telemetry', daemon=True).start()
+    logger.info('[Telemetry] Serving metrics at http://127.0.0.1:%d/metrics', server.server_address[1])
+    return server
+
+
+# every bot's telemetry in this process, for the metrics server
+registry = TelemetryRegistry()
+
+
+def enabled() -> bool:
+    return bool(os.environ.get('RG_TELEMETRY_DIR') or os.environ.get('RG_TELEMETRY_PORT'))
+
+
+def install(world_state, scheduler) -> MatchTelemetry:
+    """
+    Start collecting telemetry for the bot, kept on its WorldState, and serve it if RG_TELEMETRY_PORT is set
+    """
+    telemetry = world_state.telemetry = MatchTelemetry(world_state.username, world_state, scheduler)
+    scheduler.begin_listener = telemetry.pass_began
+    scheduler.listener = telemetry.pass_ended
+    registry.add(telemetry)
+    port = os.environ.get('RG_TELEMETRY_PORT')
+    if port:
+        try:
+            registry.serve(int(port))
+        except OSError as exc:
+            logger.warning('[Telemetry] Could not serve metrics on port %s: %s', port, exc)
+    return telemetry
+
+
+def decided(world_state, role: Optional[str]):
+    if world_state.telemetry:
+        world_state.telemetry.decided(role)
+
+
+def start_match(world_state):
+    if world_state.telemetry:
+        world_state.telemetry.start_match()
+
+
+def end_match(world_state):
+    directory = os.environ.get('RG_TELEMETRY_DIR')
+    if world_state.telemetry and directory:
+        world_state.telemetry.write(directory)
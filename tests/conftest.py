@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the modules live at the top of the repository, and anything that loads the JS modules should get the simulator
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RG_BACKEND', 'simulator')
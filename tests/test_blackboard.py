@@ -0,0 +1,128 @@
+import uuid
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+
+import pytest
+
+from blackboard import TeamBlackboard, HEADER, SEQUENCE, SEGMENT_SIZE, MAGIC, VERSION, MAX_SLOTS
+from records import Point, EntitySnapshot
+
+MATCH = {'players': [{'username': 'BLUE-1'}, {'username': 'BLUE-2'}, {'username': 'RED-1'}]}
+
+
+@pytest.fixture
+def prefix():
+    prefix = f'rg_test_{uuid.uuid4().hex[:8]}'
+    yield prefix
+    for team in ('BLUE', 'RED'):
+        try:
+            memory = shared_memory.SharedMemory(TeamBlackboard(prefix).segment_name(team, MATCH))
+        except FileNotFoundError:
+            continue
+        memory.close()
+        memory.unlink()
+
+
+def make_snapshot(username, position, opponents=()):
+    players = {o.name: o for o in opponents}
+    world = SimpleNamespace(players=players, opponent_names=list(players), tick=7, flag_carrier=None)
+    return SimpleNamespace(username=username, my_team_name='BLUE', match_info=MATCH, world=world, position=position,
+                           health=20, has_flag=False, flag_location=Point(1, 2, 3))
+
+
+def test_teammates_read_what_is_published(prefix):
+    me, teammate = TeamBlackboard(prefix), TeamBlackboard(prefix)
+    opponent = EntitySnapshot(None, 'RED-1', Point(5, 65, 5), 12)
+    me.publish(make_snapshot('BLUE-1', Point(1, 65, 1), [opponent]), 'attacker')
+
+    intel, = teammate.read_teammates('BLUE-2', 'BLUE', MATCH)
+    assert (intel.username, intel.role, intel.tick) == ('BLUE-1', 'attacker', 7)
+    assert intel.position == Point(1, 65, 1)
+    assert intel.flag_location == Point(1, 2, 3)
+    assert [(o.name, o.position, o.health) for o in intel.opponents] == [('RED-1', Point(5, 65, 5), 12)]
+    # I don't read my own slot
+    assert me.read_teammates('BLUE-1', 'BLUE', MATCH) == []
+
+
+def test_a_slot_being_written_is_not_read(prefix):
+    me, teammate = TeamBlackboard(prefix), TeamBlackboard(prefix)
+    me.publish(make_snapshot('BLUE-1', Point(1, 65, 1)), 'attacker')
+    offset = me._slot_offset(me.slot)
+    sequence = SEQUENCE.unpack_from(me.memory.buf, offset)[0]
+    assert sequence % 2 == 0
+
+    # the writer makes the sequence odd while it writes
+    assert teammate._attach('BLUE', MATCH)
+    SEQUENCE.pack_into(me.memory.buf, offset, sequence + 1)
+    assert teammate._read_slot(me.slot) is None
+    assert teammate.read_teammates('BLUE-2', 'BLUE', MATCH) == []
+    SEQUENCE.pack_into(me.memory.buf, offset, sequence + 2)
+    assert teammate._read_slot(me.slot) is not None
+
+
+def test_every_publish_moves_the_sequence_on_by_two(prefix):
+    me = TeamBlackboard(prefix)
+    me.publish(make_snapshot('BLUE-1', Point(1, 65, 1)), 'attacker')
+    offset = me._slot_offset(me.slot)
+    before = SEQUENCE.unpack_from(me.memory.buf, offset)[0]
+    me.publish(make_snapshot('BLUE-1', Point(2, 65, 1)), 'attacker')
+    assert SEQUENCE.unpack_from(me.memory.buf, offset)[0] == before + 2
+
+
+def test_bots_claim_different_slots(prefix):
+    first, second = TeamBlackboard(prefix), TeamBlackboard(prefix)
+    assert first._attach('BLUE', MATCH) and second._attach('BLUE', MATCH)
+    # both claim before either publishes
+    assert first._claim_slot('BLUE-1', 'BLUE') != second._claim_slot('BLUE-2', 'BLUE')
+    assert first._claim_slot('BLUE-1', 'BLUE') == first._claim_slot('BLUE-1', 'BLUE')
+
+
+def test_an_unwritten_header_is_written_instead_of_disabling(prefix):
+    name = TeamBlackboard(prefix).segment_name('BLUE', MATCH)
+    # created, but its creator hasn't written the header yet
+    memory = shared_memory.SharedMemory(name, create=True, size=SEGMENT_SIZE)
+    try:
+        blackboard = TeamBlackboard(prefix)
+        assert blackboard._attach('BLUE', MATCH)
+        assert blackboard.available
+        assert HEADER.unpack_from(memory.buf, 0) == (MAGIC, VERSION, MAX_SLOTS)
+        blackboard.close()
+    finally:
+        memory.close()
+
+
+def test_an_unexpected_layout_disables_sharing(prefix):
+    name = TeamBlackboard(prefix).segment_name('BLUE', MATCH)
+    memory = shared_memory.SharedMemory(name, create=True, size=SEGMENT_SIZE)
+    try:
+        HEADER.pack_into(memory.buf, 0, b'NOPE', 1, 1)
+        blackboard = TeamBlackboard(prefix)
+        assert not blackboard._attach('BLUE', MATCH)
+        assert not blackboard.available
+    finally:
+        memory.close()
+
+
+def test_segments_are_scoped_to_the_team_and_match():
+    blackboard = TeamBlackboard('rg_test')
+    other_match = {'players': [{'username': 'BLUE-1'}, {'username': 'RED-9'}]}
+    names = {blackboard.segment_name('BLUE', MATCH), blackboard.segment_name('RED', MATCH),
+             blackboard.segment_name('BLUE', other_match), TeamBlackboard('rg_test', scope='server:2').segment_name('BLUE', MATCH)}
+    assert len(names) == 4
+
+
+def test_unlink_deletes_the_segment_until_the_next_match(prefix):
+    me = TeamBlackboard(prefix)
+    me.publish(make_snapshot('BLUE-1', Point(1, 65, 1)), 'attacker')
+    name = me.segment
+    me.unlink()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name)
+    # a pass that is still running after the match ended doesn't bring it back
+    me.publish(make_snapshot('BLUE-1', Point(1, 65, 1)), 'attacker')
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name)
+    me.start_match()
+    me.publish(make_snapshot('BLUE-1', Point(1, 65, 1)), 'attacker')
+    assert me.segment == name
+    assert TeamBlackboard(prefix).read_teammates('BLUE-2', 'BLUE', MATCH)
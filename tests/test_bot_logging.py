@@ -0,0 +1,61 @@
+import logging
+import queue
+import time
+
+import pytest
+
+from bot_logging import RateLimitFilter, RingBuffer
+
+
+def make_record(msg, *args, level=logging.INFO, name='strategy'):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_repeats_of_the_same_message_are_dropped_and_counted():
+    rate_limit = RateLimitFilter(interval=60)
+    assert rate_limit.filter(make_record('Attacking %s', 'RED-1'))
+    assert not rate_limit.filter(make_record('Attacking %s', 'RED-1'))
+    assert not rate_limit.filter(make_record('Attacking %s', 'RED-1'))
+    rate_limit.seen[('strategy', 'Attacking RED-1')][0] -= 61
+    record = make_record('Attacking %s', 'RED-1')
+    assert rate_limit.filter(record)
+    assert record.getMessage() == 'Attacking RED-1 (and 2 more like this)'
+
+
+def test_messages_with_the_same_format_and_different_arguments_are_kept():
+    rate_limit = RateLimitFilter(interval=60)
+    assert rate_limit.filter(make_record('Attacking %s', 'RED-1'))
+    assert rate_limit.filter(make_record('Attacking %s', 'RED-2'))
+
+
+def test_warnings_are_never_dropped():
+    rate_limit = RateLimitFilter(interval=60)
+    assert rate_limit.filter(make_record('Kicked', level=logging.WARNING))
+    assert rate_limit.filter(make_record('Kicked', level=logging.WARNING))
+
+
+def test_old_messages_are_forgotten():
+    rate_limit = RateLimitFilter(interval=0.01, prune_every=0)
+    for i in range(100):
+        rate_limit.filter(make_record('Moving to %d', i))
+    time.sleep(0.02)
+    rate_limit.filter(make_record('Moving to %d', 100))
+    assert len(rate_limit.seen) == 1
+
+
+def test_the_ring_buffer_drops_the_oldest_and_reports_it():
+    buffer = RingBuffer(2)
+    for i in range(3):
+        buffer.put_nowait(i)
+    assert 'Dropped 1 log messages' in buffer.get().getMessage()
+    assert [buffer.get(), buffer.get()] == [1, 2]
+
+
+def test_the_ring_buffer_honors_block_and_timeout():
+    buffer = RingBuffer(2)
+    with pytest.raises(queue.Empty):
+        buffer.get(block=False)
+    started = time.monotonic()
+    with pytest.raises(queue.Empty):
+        buffer.get(timeout=0.05)
+    assert time.monotonic() - started >= 0.04
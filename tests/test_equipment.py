@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+from equipment import EquipmentManager
+from utilities import unequip_off_hand
+
+
+def make_world():
+    import simulator
+    sim_world = simulator.create_world(opponents=0, speed=0, blocking_goto=False)
+    manager = EquipmentManager(sim_world.bot)
+    sim_world.sync()
+    return sim_world, manager
+
+
+def make_manager():
+    _, manager = make_world()
+    calls = []
+    manager.listener = lambda kind, name, detail: calls.append([kind, name, detail])
+    return manager, calls
+
+
+def test_unequip_empties_the_hand_once():
+    manager, calls = make_manager()
+    manager.held['off-hand'] = 'Shield'
+    assert manager.unequip('off-hand')
+    assert manager.held['off-hand'] is None
+    assert not manager.unequip('off-hand')
+    assert calls == [['unequip', None, 'off-hand']] * 2
+
+
+def test_unequip_when_the_hand_is_unknown():
+    manager, _ = make_manager()
+    assert manager.unequip('off-hand')
+
+
+def test_hold_after_unequip_equips_again():
+    manager, _ = make_manager()
+    manager.held['off-hand'] = 'Shield'
+    manager.unequip('off-hand')
+    assert manager.hold(SimpleNamespace(), 'Shield', 'off-hand')
+
+
+def test_unequip_off_hand_goes_through_the_equipment_manager():
+    manager, calls = make_manager()
+    unequip_off_hand(SimpleNamespace(world=SimpleNamespace(equipment=manager)))
+    assert calls == [['unequip', None, 'off-hand']]
+    assert manager.held['off-hand'] is None
+
+
+def add_item(sim_world, name, display_name, custom_name=None):
+    import simulator
+    item = simulator.SimItem(name, display_name, custom_name)
+    sim_world.bot._inventory.append(item)
+    return item
+
+
+def test_holding_survives_the_slot_update_it_causes():
+    sim_world, manager = make_world()
+    shield = add_item(sim_world, 'shield', 'Shield')
+    assert manager.hold(shield, 'Shield', 'off-hand')
+    sim_world.sync()
+    assert manager.held['off-hand'] == 'Shield'
+    assert not manager.hold(shield, 'Shield', 'off-hand')
+    assert manager.holds_skipped == 1
+
+
+def test_picking_something_up_keeps_the_hands():
+    import simulator
+    sim_world, manager = make_world()
+    dirt = add_item(sim_world, 'dirt', 'Dirt')
+    manager.hold(dirt, 'Dirt')
+    sim_world._inventory_updated(None, add_item(sim_world, 'gravel', 'Gravel'), simulator.INVENTORY_SLOT)
+    sim_world.sync()
+    assert manager.held['hand'] == 'Dirt'
+
+
+def test_using_up_the_held_item_forgets_the_hand():
+    sim_world, manager = make_world()
+    potion = add_item(sim_world, 'potion', 'Potion', 'Healing Potion')
+    manager.hold(potion, 'Healing Potion')
+    sim_world.bot.mineflayer().activateItem()
+    sim_world.sync()
+    assert 'hand' not in manager.held
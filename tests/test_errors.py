@@ -0,0 +1,29 @@
+from errors import ErrorKind, classify, js_error_name
+from simulator import JavaScriptError, _JSError
+
+STACK = '''Error: The goal was changed before it could be completed!
+    at Pathfinder.setGoal (mineflayer-pathfinder/index.js:520:16)
+    at Pathfinder.goto (mineflayer-pathfinder/index.js:601:12)'''
+
+
+def test_name_is_read_from_the_error_not_its_stack():
+    error = _JSError('GoalChanged', 'The goal was changed before it could be completed!', 'Pathfinder.setGoal')
+    exc = JavaScriptError('goto', error)
+    assert str(error).startswith('Error: The goal')
+    assert js_error_name(exc) == 'GoalChanged'
+    assert classify(exc) is ErrorKind.INTERRUPTION
+
+
+def test_plain_error_stack_falls_back_to_the_message():
+    exc = JavaScriptError('goto', STACK)
+    assert js_error_name(exc) == 'GoalChanged'
+    assert classify(exc) is ErrorKind.INTERRUPTION
+    assert js_error_name(JavaScriptError('goto', 'Error: No path to the goal!')) == 'NoPath'
+
+
+def test_named_stack_and_other_errors():
+    assert js_error_name(JavaScriptError('goto', 'PathStopped: Path was stopped')) == 'PathStopped'
+    assert classify(JavaScriptError('dig', "Error: Cannot read properties of undefined (reading 'x')")) is ErrorKind.BUG
+    assert classify(JavaScriptError('chat', 'TimeoutError: timed out')) is ErrorKind.TRANSIENT
+    assert classify(ConnectionResetError()) is ErrorKind.TRANSIENT
+    assert classify(KeyError('x')) is ErrorKind.BUG
@@ -0,0 +1,57 @@
+import instrumentation
+
+
+class FakeBot:
+    def __init__(self, name):
+        self.name = name
+
+    def username(self):
+        return self.name
+
+
+def test_each_instrumented_bot_has_its_own_stats():
+    first = instrumentation.instrument(FakeBot('BLUE-1'), 'bot')
+    second = instrumentation.instrument(FakeBot('BLUE-2'), 'bot')
+    utils = instrumentation.instrument(FakeBot('utils'), 'rg_ctf_utils', instrumentation.stats_of(first))
+    first.username()
+    first.username()
+    utils.username()
+    second.username()
+
+    first_stats, second_stats = instrumentation.stats_of(first), instrumentation.stats_of(second)
+    assert first_stats is not second_stats
+    assert first_stats is instrumentation.stats_of(utils)
+    assert first_stats.report()['bridge_calls'] == 6
+    assert second_stats.report()['bridge_calls'] == 2
+
+    instrumentation.end_pass(first_stats)
+    assert (first_stats.passes, second_stats.passes) == (1, 0)
+
+
+def test_objects_that_are_not_instrumented_have_no_stats():
+    assert instrumentation.stats_of(FakeBot('BLUE-1')) is None
+    instrumentation.end_pass(None)
+
+
+def test_a_failed_pass_still_ends(monkeypatch):
+    import pytest
+    import simulator
+    import start
+    import strategy
+    from regression_games import RGCTFUtils
+    from snapshot import capture_snapshot
+    from world_state import WorldState
+
+    sim_world = simulator.create_world(opponents=1, speed=0, blocking_goto=False)
+    bot = instrumentation.instrument(sim_world.bot, 'bot')
+    world = WorldState(bot, RGCTFUtils(sim_world.bot))
+    snapshot = capture_snapshot(world)
+
+    def fail(*args):
+        raise RuntimeError('strategy bug')
+    monkeypatch.setattr(strategy, 'run_strategies', fail)
+
+    with pytest.raises(RuntimeError):
+        start.take_action(snapshot)
+    assert snapshot.bot is None
+    assert instrumentation.stats_of(bot).passes == 1
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from inventory import InventoryIndex
+
+
+def item(name, display_name=None, custom_name=None):
+    return SimpleNamespace(name=name, displayName=display_name or name.replace('_', ' ').title(), customName=custom_name)
+
+
+def test_best_of_a_category_follows_its_order():
+    index = InventoryIndex([item('dirt'), item('gravel')])
+    assert index.best('blocks')[1] == 'Gravel'
+    assert index.best('health') is None
+
+
+def test_shield_found_by_display_name():
+    shield = item('shield')
+    index = InventoryIndex([item('dirt'), shield])
+    assert index.best('shield') == (shield, 'Shield')
+
+
+def test_renamed_shield_found_by_raw_name():
+    shield = item('shield', custom_name='{"extra":[{"text":"Bulwark"}]}')
+    index = InventoryIndex([shield])
+    assert index.best('shield') == (shield, 'Bulwark')
+    assert 'shield' in index and 'Bulwark' in index
+
+
+def test_items_i_have_weigh_more():
+    index = InventoryIndex([item('dirt')])
+    assert index.owned_weight(SimpleNamespace(name='dirt')) > index.owned_weight(SimpleNamespace(name='gravel')) == 1
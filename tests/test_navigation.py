@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import navigation
+from records import Point
+
+GROUND = 60
+
+
+def ridge_world():
+    """
+    Flat ground to stand on at y 60, with a ridge across x 8 to 12 that is solid up to y 64, and a tunnel through it
+    at z 2
+    """
+    def solid(x, y, z):
+        if y < GROUND:
+            return True
+        if 8 <= x <= 12 and y <= 64:
+            return not (z == 2 and y < GROUND + 2)
+        return False
+
+    def block_at(position):
+        x, y, z = int(position.x), int(position.y), int(position.z)
+        return SimpleNamespace(boundingBox='block' if solid(x, y, z) else 'empty', name='stone' if solid(x, y, z) else 'air')
+
+    return SimpleNamespace(mineflayer=lambda: SimpleNamespace(blockAt=block_at))
+
+
+def build():
+    key_points = {'goal': Point(18, GROUND, 2), 'start': Point(2, GROUND, 2)}
+    return navigation.build_graph(ridge_world(), key_points, margin=2, min_y=GROUND - 2, max_y=GROUND + 8)
+
+
+def test_columns_over_the_tunnel_have_both_levels():
+    graph = build()
+    column = graph.column(Point(10.5, GROUND, 2.5))
+    assert [graph.levels[n] for n in range(graph.column_starts[column], graph.column_starts[column + 1])] == [GROUND, 65]
+    assert graph.levels[graph.node(Point(10.5, 65, 2.5))] == 65
+    assert graph.levels[graph.node(Point(10.5, GROUND, 2.5))] == GROUND
+
+
+def test_routes_go_through_the_tunnel():
+    route = build().route(Point(2.5, GROUND, 2.5), 'goal')
+    assert route[-1] == Point(18.5, GROUND, 2.5)
+    assert all(p.y == GROUND for p in route)
+    assert [p.z for p in route if 8 <= p.x <= 13] == [2.5] * 5
+
+
+def test_the_top_of_the_ridge_has_no_route_down():
+    # the drop is more than MAX_DROP
+    assert build().route(Point(10.5, 65, 0.5), 'goal') == []
+
+
+def test_waypoints_are_lookahead_nodes_along_the_route():
+    graph = build()
+    route = graph.route(Point(2.5, GROUND, 2.5), 'goal')
+    assert graph.waypoint(Point(2.5, GROUND, 2.5), Point(18, GROUND, 2), lookahead=4) == route[3]
+    # close enough to go straight there
+    assert graph.waypoint(Point(16.5, GROUND, 2.5), Point(18, GROUND, 2), lookahead=4) is None
+
+
+def test_saved_graphs_load_the_same(tmp_path):
+    graph = build()
+    path = str(tmp_path / 'nav.bin')
+    navigation.save_graph(graph, path)
+    loaded = navigation.load_graph(path)
+    assert list(loaded.column_starts) == list(graph.column_starts)
+    assert list(loaded.levels) == list(graph.levels)
+    assert loaded.key_points == graph.key_points
+    assert loaded.route(Point(2.5, GROUND, 2.5), 'goal') == graph.route(Point(2.5, GROUND, 2.5), 'goal')
@@ -0,0 +1,20 @@
+from types import SimpleNamespace
+
+import simulator
+from inventory import InventoryIndex
+from ranking import find_items
+from records import Point
+from strategy import LOOT_CANDIDATES
+
+
+def test_an_unowned_item_behind_owned_ones_is_found_with_enough_candidates():
+    sim_world = simulator.create_world(opponents=0, speed=0, blocking_goto=False)
+    me = sim_world.bot._entity
+    origin = Point(me._pos.x, me._pos.y, me._pos.z)
+    sim_world.items = [simulator.SimEntity('item', origin.offset(1 + i, 0, 0), item=simulator.SimItem('dirt', 'Dirt'))
+                       for i in range(12)]
+    sim_world.items.append(simulator.SimEntity('item', origin.offset(0, 0, 20), item=simulator.SimItem('shield', 'Shield')))
+    inventory = InventoryIndex([SimpleNamespace(name='dirt', displayName='Dirt', customName=None)])
+
+    assert find_items(sim_world.bot, origin, inventory, 1)[0].name == 'dirt'
+    assert find_items(sim_world.bot, origin, inventory, 1, candidate_count=LOOT_CANDIDATES)[0].name == 'shield'
@@ -0,0 +1,58 @@
+import pytest
+
+import replay
+
+
+def test_pack_round_trips_every_type():
+    value = {'tick': 7, 'health': 19.5, 'role': None, 'moving': True, 'arrived': False, 'name': 'Grass Block ✓',
+             'players': [['RED-1', 1.0, 65.0, -2.5, 20, None]], 'empty': [], 'nested': {'a': {'b': [1, -2 ** 40]}}}
+    assert replay.unpack(replay.pack(value)) == value
+
+
+def test_pack_keeps_tuples_as_lists():
+    assert replay.unpack(replay.pack((1, 2))) == [1, 2]
+
+
+def test_pack_rejects_other_types():
+    with pytest.raises(TypeError):
+        replay.pack({'position': object()})
+
+
+def test_unpack_rejects_unknown_tags():
+    with pytest.raises(ValueError):
+        replay.unpack(b'x\0\0\0\0')
+
+
+def test_read_records_ignores_a_record_cut_short(tmp_path):
+    path = tmp_path / 'match.rgr'
+    data = [replay.pack(record) for record in ({'version': replay.VERSION}, {'tick': 1}, {'tick': 2})]
+    framed = b''.join(replay.LENGTH.pack(len(d)) + d for d in data)
+    path.write_bytes(framed[:-3])
+    assert replay.read_records(str(path)) == [{'version': replay.VERSION}, {'tick': 1}]
+
+
+def test_each_bot_records_its_own_matches(tmp_path, monkeypatch):
+    import simulator
+    from regression_games import RGCTFUtils
+    from start import main_loop_pass
+    from world_state import WorldState
+
+    monkeypatch.setenv('RG_REPLAY_DIR', str(tmp_path))
+    worlds = []
+    for username in ('BLUE-1', 'BLUE-2'):
+        sim_world = simulator.create_world(username=username, opponents=1, speed=0, blocking_goto=False, seed=1)
+        world_state = WorldState(sim_world.bot, RGCTFUtils(sim_world.bot))
+        replay.install(world_state, world_state.rg_ctf_utils)
+        worlds.append((sim_world, world_state))
+    for _ in range(5):
+        for sim_world, world_state in worlds:
+            sim_world.step(1)
+            sim_world.sync()
+            main_loop_pass(world_state)
+    for _, world_state in worlds:
+        replay.end_match(world_state)
+
+    for _, world_state in worlds:
+        records = replay.read_records(world_state.recorder.path)
+        assert records[0]['username'] == world_state.username
+        assert len(records) == 6
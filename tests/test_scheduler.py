@@ -0,0 +1,92 @@
+import pytest
+
+from scheduler import TickScheduler, TICK_SECONDS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        assert seconds >= 0
+        self.now += seconds
+
+
+def make_scheduler(**options):
+    clock = FakeClock()
+    return TickScheduler(clock=clock, sleep=clock.sleep, report_every=0, **options), clock
+
+
+def run_passes(scheduler, clock, pass_times):
+    for pass_time in pass_times:
+        scheduler.wait()
+        clock.now += pass_time
+
+
+def test_passes_stay_on_the_tick_grid():
+    scheduler, clock = make_scheduler(adaptive=False)
+    start = clock.now
+    starts = []
+    for _ in range(10):
+        scheduler.wait()
+        starts.append(clock.now)
+        clock.now += 0.013
+    assert starts == pytest.approx([start + i * TICK_SECONDS for i in range(10)])
+    assert scheduler.overruns == 0
+    assert scheduler.skipped_ticks == 0
+
+
+def test_a_late_pass_skips_whole_ticks_and_stays_on_the_grid():
+    scheduler, clock = make_scheduler(adaptive=False)
+    start = clock.now
+    scheduler.wait()
+    # runs through the deadlines at 1, 2 and 3 ticks
+    clock.now += 3.5 * TICK_SECONDS
+    scheduler.wait()
+    assert scheduler.skipped_ticks == 2
+    assert scheduler.overruns == 1
+    assert clock.now == pytest.approx(start + 3.5 * TICK_SECONDS)
+    clock.now += 0.01
+    scheduler.wait()
+    assert clock.now == pytest.approx(start + 4 * TICK_SECONDS)
+
+
+def test_overruns_are_counted_against_the_budget():
+    scheduler, clock = make_scheduler(adaptive=False, budget=0.02)
+    run_passes(scheduler, clock, [0.01, 0.03, 0.01, 0.025])
+    scheduler.next_delay()
+    assert scheduler.passes == 4
+    assert scheduler.overruns == 2
+    assert scheduler.max_pass_time == pytest.approx(0.03)
+
+
+def test_the_listener_gets_every_pass_time():
+    scheduler, clock = make_scheduler(adaptive=False)
+    seen = []
+    scheduler.listener = seen.append
+    run_passes(scheduler, clock, [0.01, 0.02, 0.03])
+    scheduler.next_delay()
+    assert seen == pytest.approx([0.01, 0.02, 0.03])
+
+
+def test_the_period_adapts_to_slow_passes_and_recovers():
+    scheduler, clock = make_scheduler()
+    run_passes(scheduler, clock, [0.07] * 21)
+    assert scheduler.period == pytest.approx(2 * TICK_SECONDS)
+    run_passes(scheduler, clock, [0.07] * 100)
+    assert scheduler.period == pytest.approx(scheduler.max_period)
+    run_passes(scheduler, clock, [0.001] * 200)
+    assert scheduler.period == pytest.approx(TICK_SECONDS)
+
+
+def test_reset_starts_a_new_grid_and_keeps_the_stats():
+    scheduler, clock = make_scheduler(adaptive=False)
+    run_passes(scheduler, clock, [0.01] * 3)
+    clock.now += 10
+    scheduler.reset()
+    scheduler.wait()
+    assert scheduler.skipped_ticks == 0
+    assert scheduler.passes == 2
@@ -0,0 +1,89 @@
+import threading
+import urllib.request
+from types import SimpleNamespace
+
+import pytest
+
+import instrumentation
+import telemetry
+from scheduler import TickScheduler
+from telemetry import Histogram, MatchTelemetry, TelemetryRegistry, metrics_text
+
+
+def test_histogram_percentiles_are_within_the_bucket_width():
+    histogram = Histogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    assert histogram.count == 1000
+    assert histogram.maximum == pytest.approx(1.0)
+    for quantile in (0.5, 0.9, 0.99):
+        assert histogram.percentile(quantile) == pytest.approx(quantile, rel=1 / 32)
+
+
+def test_histogram_keeps_small_durations_exact():
+    histogram = Histogram()
+    for us in (3, 3, 7, 40):
+        histogram.record(us / 1e6)
+    assert histogram.percentile(0.5) == pytest.approx(3e-6)
+    assert histogram.percentile(1.0) == pytest.approx(40e-6)
+    assert histogram.report()['buckets'] == [[3, 2], [7, 1], [40, 1]]
+
+
+def test_empty_histogram():
+    assert Histogram().percentile(0.99) == 0.0
+    assert Histogram().report()['mean_ms'] == 0
+
+
+class FakeBot:
+    def __init__(self, name):
+        self.name = name
+
+    def username(self):
+        return self.name
+
+
+def make_telemetry(name):
+    bot = instrumentation.instrument(FakeBot(name), 'bot')
+    world_state = SimpleNamespace(bot=bot, username=name, telemetry=None,
+                                  movement=SimpleNamespace(goals_set=0, goals_kept=0, goals_replaced=0))
+    scheduler = TickScheduler(report_every=0)
+    return telemetry.install(world_state, scheduler), scheduler, bot
+
+
+def test_bridge_time_only_counts_the_calls_of_the_pass(monkeypatch):
+    monkeypatch.delenv('RG_TELEMETRY_PORT', raising=False)
+    match, scheduler, bot = make_telemetry('BLUE-1')
+    stats = instrumentation.stats_of(bot)
+    scheduler.begin_pass()
+    stats.record('bot.position()', 0.004)
+    # a goto running on another thread at the same time
+    background = threading.Thread(target=stats.record, args=('pathfinder.goto()', 0.5))
+    background.start()
+    background.join()
+    match.pass_ended(0.01)
+    assert match.bridge.total == pytest.approx(0.004)
+    assert match.python.total == pytest.approx(0.006)
+
+
+def test_one_registry_serves_every_bot(monkeypatch):
+    monkeypatch.delenv('RG_TELEMETRY_PORT', raising=False)
+    first, _, _ = make_telemetry('BLUE-1')
+    second, _, _ = make_telemetry('BLUE-2')
+    first.decided('handle_scoring_flag')
+    text = metrics_text([first, second])
+    assert text.count('# TYPE rg_overruns_total counter') == 1
+    assert 'rg_overruns_total{bot="BLUE-1"} 0' in text and 'rg_overruns_total{bot="BLUE-2"} 0' in text
+    assert 'rg_decisions_total{bot="BLUE-1",strategy="handle_scoring_flag"} 1' in text
+
+    registry = TelemetryRegistry()
+    registry.add(first)
+    registry.add(second)
+    server = registry.serve(0)
+    try:
+        assert registry.serve(0) is server
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.server_address[1]}/metrics') as response:
+            body = response.read().decode()
+        assert 'bot="BLUE-1"' in body and 'bot="BLUE-2"' in body
+    finally:
+        server.shutdown()
+        server.server_close()
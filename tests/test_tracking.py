@@ -0,0 +1,81 @@
+import math
+
+import pytest
+
+from records import Point, EntitySnapshot
+from tracking import CLOSE_LOOKAHEAD, MotionTracker, Track, intercept_time
+
+
+def test_intercept_time_of_a_target_standing_still():
+    assert intercept_time(3, 4, 0, 0, 0.5) == pytest.approx(10)
+
+
+def test_intercept_time_of_a_target_running_at_me():
+    assert intercept_time(10, 0, -0.5, 0, 0.5) == pytest.approx(10)
+
+
+def test_intercept_time_of_a_target_running_away():
+    # I close the gap at 0.1 blocks per tick
+    assert intercept_time(10, 0, 0.2, 0, 0.3) == pytest.approx(100)
+
+
+def test_intercept_time_of_a_target_as_fast_as_me():
+    assert intercept_time(10, 0, 0.3, 0, 0.3) is None
+    assert intercept_time(10, 0, -0.3, 0, 0.3) == pytest.approx(10 / 0.6)
+
+
+def test_intercept_time_of_a_faster_target():
+    assert intercept_time(10, 0, 0.5, 0, 0.3) is None
+    # crossing in front of me, faster than me but I can still cut them off
+    t = intercept_time(2, -10, 0, 0.5, 0.3)
+    assert t is not None and math.hypot(2, -10 + 0.5 * t) == pytest.approx(0.3 * t)
+    # but not if they cross too far away
+    assert intercept_time(10, -10, 0, 0.5, 0.3) is None
+
+
+def observe(tracker, tick, x):
+    tracker.observe(tick, {'RED-1': EntitySnapshot(None, 'RED-1', Point(x, 65, 0))})
+
+
+def test_velocity_is_per_game_tick_however_long_the_passes():
+    tracker = MotionTracker()
+    # a pass every 4 game ticks, with the player running at 0.25 blocks per tick
+    for i in range(5):
+        observe(tracker, 100 + i * 4, i)
+    vx, vz = tracker.tracks['RED-1'].velocity()
+    assert vx == pytest.approx(0.25) and vz == pytest.approx(0)
+
+
+def test_a_long_pass_keeps_the_track():
+    track = Track()
+    track.add(0, Point(0, 65, 0))
+    # 12 blocks in 40 ticks is a run, not a respawn
+    track.add(40, Point(12, 65, 0))
+    assert track.count == 2
+
+
+def test_a_respawn_starts_a_new_track():
+    track = Track()
+    track.add(0, Point(0, 65, 0))
+    track.add(1, Point(0.3, 65, 0))
+    track.add(2, Point(40, 65, 0))
+    assert track.count == 1
+
+
+def test_a_position_read_at_the_same_time_is_ignored():
+    track = Track()
+    track.add(5, Point(0, 65, 0))
+    track.add(5, Point(1, 65, 0))
+    assert track.count == 1
+
+
+def test_a_close_target_is_not_chased_far_ahead():
+    tracker = MotionTracker()
+    for i in range(5):
+        observe(tracker, i, 5 + i * 0.25)
+    target = EntitySnapshot(None, 'RED-1', Point(6, 65, 0))
+    # running away at almost my speed, so the intercept is a long way off
+    far = tracker.predict(target, Point(0, 65, 0))
+    close = tracker.predict(target, Point(0, 65, 0), max_lookahead=CLOSE_LOOKAHEAD)
+    assert far.x > 15
+    assert close.x == pytest.approx(6 + 0.25 * CLOSE_LOOKAHEAD)
@@ -0,0 +1,53 @@
+import simulator
+from regression_games import RGCTFUtils
+from world_state import WorldState
+
+
+def make_world_state():
+    sim_world = simulator.create_world(opponents=1, speed=0, blocking_goto=False)
+    world_state = WorldState(sim_world.bot, RGCTFUtils(sim_world.bot))
+    world_state.resync()
+    return sim_world, world_state
+
+
+def carry_flag(sim_world, carrier):
+    sim_world.flag_carrier = carrier
+    sim_world.flag_position = None
+
+
+def test_resync_keeps_another_players_flag_carrier():
+    sim_world, world_state = make_world_state()
+    opponent = [p for p in sim_world.players if p is not sim_world.bot._entity][0]
+    carry_flag(sim_world, opponent)
+    # only the FLAG_OBTAINED event says who has it
+    world_state.flag_carrier = opponent._username
+    world_state.resync()
+    assert world_state.flag_carrier == opponent._username
+    assert world_state.flag_location is None
+
+
+def test_resync_clears_the_carrier_when_the_flag_is_on_the_ground():
+    sim_world, world_state = make_world_state()
+    world_state.flag_carrier = 'RED-1'
+    world_state.resync()
+    assert world_state.flag_carrier is None
+    assert world_state.flag_location is not None
+
+
+def test_resync_sees_when_i_have_the_flag_and_when_i_lost_it():
+    sim_world, world_state = make_world_state()
+    carry_flag(sim_world, sim_world.bot._entity)
+    world_state.resync()
+    assert world_state.has_flag
+    opponent = [p for p in sim_world.players if p is not sim_world.bot._entity][0]
+    carry_flag(sim_world, opponent)
+    world_state.resync()
+    assert world_state.flag_carrier is None
+
+
+def test_game_tick_counts_the_worlds_ticks():
+    sim_world, world_state = make_world_state()
+    start = world_state.game_tick
+    sim_world.step(7)
+    sim_world.sync()
+    assert world_state.game_tick - start == 7
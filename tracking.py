@@ -0,0 +1,197 @@
+"""
+Motion tracking of the other players, for chasing them down.
+
+Heading for where a player is now means the goal moves every tick while they run, and the pathfinder plans a new path
+each time, only to end up behind them.  The MotionTracker keeps the last few positions of every player I can see, in a
+small ring buffer each, and estimates their velocity from them.  Positions are stamped with the game tick they were
+read at (counted from physicsTick events, see WorldState.game_tick) rather than the wall clock, since main loop passes
+can be longer than a tick or skip some, and the server's ticks can run slow under lag.  From that it predicts where I
+can intercept them (a flag carrier is assumed to be running for their score location, and won't run past it), and
+hands out a pursuit goal that only changes when the prediction moves by more than a few blocks.
+"""
+import math
+from array import array
+from typing import Dict, Optional, Tuple
+
+from records import Point, EntitySnapshot
+
+# how many positions are kept for each player
+HISTORY = 8
+
+# players that move further than this between two positions, plus the furthest they could have run in the time between
+# them, have died and respawned, or teleported
+JUMP_DISTANCE = 8
+
+# blocks per tick: faster than a player can run, even sprint jumping with a speed potion
+MAX_PLAYER_SPEED = 0.6
+
+# blocks per tick: my own speed when sprinting, and the speed a flag carrier is assumed to run at before I have seen
+# them move
+MY_SPEED = 0.28
+RUNNING_SPEED = 0.22
+
+# how far ahead to predict, in ticks.  Past about 3 seconds players change their minds.
+MAX_LOOKAHEAD = 60
+
+# how far ahead to predict for a player that is already close enough to fight, where a long guess only leads me away
+CLOSE_LOOKAHEAD = 10
+
+
+class Track:
+    """
+    The last HISTORY positions of one player with the game tick each was seen at, oldest overwritten first
+    """
+    __slots__ = ('ticks', 'xs', 'ys', 'zs', 'head', 'count')
+
+    def __init__(self, size: int = HISTORY):
+        self.ticks = array('d', [0.0]) * size
+        self.xs = array('d', [0.0]) * size
+        self.ys = array('d', [0.0]) * size
+        self.zs = array('d', [0.0]) * size
+        # where the next position goes, and how many of the slots are filled
+        self.head = 0
+        self.count = 0
+
+    def add(self, tick: float, position: Point):
+        size = len(self.xs)
+        if self.count:
+            last = (self.head - 1) % size
+            elapsed = tick - self.ticks[last]
+            if elapsed <= 0:
+                # already seen at this time
+                return
+            dx = position.x - self.xs[last]
+            dz = position.z - self.zs[last]
+            limit = JUMP_DISTANCE + MAX_PLAYER_SPEED * elapsed
+            if dx * dx + dz * dz > limit * limit:
+                self.count = 0
+        head = self.head
+        self.ticks[head] = tick
+        self.xs[head] = position.x
+        self.ys[head] = position.y
+        self.zs[head] = position.z
+        self.head = (head + 1) % size
+        self.count = min(self.count + 1, size)
+
+    def velocity(self) -> Optional[Tuple[float, float]]:
+        """
+        The x, z velocity in blocks per tick, a least squares fit over the positions kept.  None until there are at least
+        two positions.
+        """
+        count = self.count
+        if count < 2:
+            return None
+        ticks, xs, zs = self.ticks, self.xs, self.zs
+        # the slots from oldest to newest.  Negative indexes wrap around to the end of the buffers.
+        window = range(self.head - count, self.head)
+        mean_t = sum(ticks[i] for i in window) / count
+        mean_x = sum(xs[i] for i in window) / count
+        mean_z = sum(zs[i] for i in window) / count
+        var_t = vx = vz = 0.0
+        for i in window:
+            dt = ticks[i] - mean_t
+            var_t += dt * dt
+            vx += dt * (xs[i] - mean_x)
+            vz += dt * (zs[i] - mean_z)
+        if var_t == 0:
+            return None
+        return vx / var_t, vz / var_t
+
+
+def intercept_time(dx: float, dz: float, vx: float, vz: float, speed: float) -> Optional[float]:
+    """
+    The time, in ticks, at which I can first meet a target that is dx, dz away from me and moving at vx, vz, if I move
+    at speed.  None if I can't catch it.
+    """
+    # |d + v t| = speed t  =>  (v.v - speed^2) t^2 + 2 (d.v) t + d.d = 0
+    a = vx * vx + vz * vz - speed * speed
+    b = 2 * (dx * vx + dz * vz)
+    c = dx * dx + dz * dz
+    if abs(a) < 1e-9:
+        return -c / b if b < 0 else None
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return None
+    root = math.sqrt(discriminant)
+    times = [t for t in ((-b - root) / (2 * a), (-b + root) / (2 * a)) if t >= 0]
+    return min(times) if times else None
+
+
+class MotionTracker:
+    """
+    The tracks of every player I can see, and the pursuit goal for each player I'm chasing
+    """
+
+    def __init__(self, goal_threshold: float = 3):
+        """
+        Args:
+            goal_threshold: How far a new prediction has to be from the current pursuit goal to replace it.
+                Defaults to 3 blocks
+        """
+        self.goal_threshold = goal_threshold
+        self.tracks: Dict[str, Track] = {}
+        self._goals: Dict[str, Point] = {}
+
+    def observe(self, tick: int, players: Dict[str, EntitySnapshot]):
+        """
+        Add this tick's positions, and forget the players that are out of sight
+
+        Args:
+            tick: The game tick the positions were read at, see WorldState.game_tick
+            players: The players I can see, by name
+        """
+        tracks = self.tracks
+        if not tracks.keys() <= players.keys():
+            for name in [name for name in tracks if name not in players]:
+                del tracks[name]
+                self._goals.pop(name, None)
+        for name, player in players.items():
+            track = tracks.get(name)
+            if track is None:
+                track = tracks[name] = Track()
+            track.add(tick, player.position)
+
+    def predict(self, target: EntitySnapshot, origin: Point, destination: Optional[Point] = None, speed: float = MY_SPEED,
+                max_lookahead: float = MAX_LOOKAHEAD) -> Point:
+        """
+        Where I can intercept a player, moving from origin at speed.
+
+        Args:
+            target: The player
+            origin: My position
+            destination: Where the player is probably heading, like a flag carrier's score location.  They are assumed
+                to stop there, and to run toward it until I have seen them move. Defaults to unknown
+            speed: My speed in blocks per tick
+            max_lookahead: How far ahead to predict at most, in ticks.  Defaults to MAX_LOOKAHEAD
+        """
+        position = target.position
+        track = self.tracks.get(target.name)
+        velocity = track.velocity() if track else None
+        to_destination = None
+        if destination is not None:
+            ddx, ddz = destination.x - position.x, destination.z - position.z
+            to_destination = math.sqrt(ddx * ddx + ddz * ddz)
+            if velocity is None and to_destination > 0:
+                velocity = (ddx / to_destination * RUNNING_SPEED, ddz / to_destination * RUNNING_SPEED)
+        if velocity is None:
+            return position
+
+        vx, vz = velocity
+        t = intercept_time(position.x - origin.x, position.z - origin.z, vx, vz, speed)
+        t = max_lookahead if t is None else min(t, max_lookahead)
+        if to_destination is not None and math.sqrt(vx * vx + vz * vz) * t >= to_destination:
+            # they will have got there first, wait for them there
+            return Point(destination.x, position.y, destination.z)
+        return Point(position.x + vx * t, position.y, position.z + vz * t)
+
+    def pursuit_goal(self, target: EntitySnapshot, origin: Point, destination: Optional[Point] = None, speed: float = MY_SPEED,
+                     max_lookahead: float = MAX_LOOKAHEAD) -> Point:
+        """
+        The goal to chase a player toward, see predict.  It stays the same from tick to tick until the prediction moves
+        more than goal_threshold away from it.
+        """
+        predicted = self.predict(target, origin, destination, speed, max_lookahead)
+        goal = self._goals.get(target.name)
+        if goal is None or goal.distanceSquared(predicted) > self.goal_threshold ** 2:
+            goal = self._goals[target.name] = predicted
+        return goal
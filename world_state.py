@@ -0,0 +1,270 @@
+"""
+A cache of the world that is kept up to date by mineflayer and rg-ctf-utils events, instead of re-reading
+everything from the bot on every tick.
+"""
+from typing import Callable, Dict, List, Optional, Set
+from regression_games import RGBot, RGCTFUtils, RGEventHandler, CTFEvent, Item
+from records import Point, EntitySnapshot, point_from_vec3
+from ranking import find_players
+from blackboard import TeamBlackboard
+from block_cache import BlockCache
+from inventory import InventoryIndex
+from movement import MovementManager
+from equipment import EquipmentManager
+from tracking import MotionTracker
+
+# the refreshes due on a tick when nothing is due, shared so that those ticks allocate nothing
+_NO_REFRESHES: List[List[Callable[[], None]]] = []
+
+
+class WorldState:
+    """
+    Tracks my health and inventory, the flag, the match info and the positions of every other player that my bot can see.
+
+    Events update the cache as things change, so most ticks only need to read my own position.  Because events can
+    be missed (for example before we subscribed), everything is also re-read from the bot every resync_ticks.
+    """
+
+    def __init__(self, bot: RGBot, rg_ctf_utils: RGCTFUtils, resync_ticks: int = 100, blackboard: Optional[TeamBlackboard] = None):
+        self.bot = bot
+        self.rg_ctf_utils = rg_ctf_utils
+        # shared with the other bots on my team, see blackboard.py
+        self.blackboard = blackboard
+        self.resync_ticks = resync_ticks
+        # the number of main loop passes so far, which isn't the game tick: passes can take longer than a tick
+        self.tick = 0
+        # the number of game ticks (physicsTick events) seen so far, which the motion tracker times positions by
+        self.game_tick = 0
+
+        self.username: str = bot.username()
+        self.match_info: Optional[dict] = None
+        self.my_team_name: Optional[str] = None
+        self.other_team_name: Optional[str] = None
+        self.opponent_names: List[str] = []
+        self.teammate_names: List[str] = []
+        self.teammate_bot_names: List[str] = []
+
+        self.health: float = 0
+        self.inventory_index = InventoryIndex([])
+        self.inventory: List[Item] = []
+        self.inventory_names: List[str] = []
+        # both the raw item names and the display names, for fast membership tests
+        self.inventory_name_set: Set[str] = set()
+
+        self.flag_location: Optional[Point] = None
+        self.flag_carrier: Optional[str] = None
+
+        # every other player we know about by username, and the entity ids of those players
+        self.players: Dict[str, EntitySnapshot] = {}
+        self._player_ids: Dict[int, str] = {}
+        # where those players have been recently, see tracking.py
+        self.tracker = MotionTracker()
+
+        # the blocks in the regions that the strategies watch, kept up to date by blockUpdate events
+        self.blocks = BlockCache(bot)
+
+        # where my bot is heading, kept up to date by pathfinder events
+        self.movement = MovementManager(bot)
+
+        # my armor and what I'm holding, kept up to date by inventory and respawn events
+        self.equipment = EquipmentManager(bot)
+
+        # records every match for replay.py when RG_REPLAY_DIR is set, see replay.install
+        self.recorder = None
+        # the performance telemetry of every match when it is turned on, see telemetry.install
+        self.telemetry = None
+
+        self._inventory_dirty = True
+        self._resync_tick = None
+
+        self._subscribe()
+
+    @property
+    def has_flag(self) -> bool:
+        return self.flag_carrier == self.username
+
+    def begin_tick(self) -> List[List[Callable[[], None]]]:
+        """
+        Start a new tick, and return the refreshes that are due for it in stages.  Each stage has to finish before the
+        next one starts, but the refreshes within a stage don't depend on each other, so they can be run concurrently.
+        Don't change the list that is returned.
+        """
+        self.tick += 1
+        resync_due = self._resync_tick is None or self.tick - self._resync_tick >= self.resync_ticks
+        if not resync_due and not self._inventory_dirty and self.match_info:
+            # most ticks, events have kept everything up to date
+            return _NO_REFRESHES
+        stages = []
+        if resync_due or not self.match_info:
+            stages.append([self.refresh_match_info])
+        if resync_due:
+            self._resync_tick = self.tick
+            stages.append([self.refresh_inventory, self.refresh_health, self.refresh_flag, self.refresh_players])
+        elif self._inventory_dirty:
+            stages.append([self.refresh_inventory])
+        return stages
+
+    def refresh(self):
+        """
+        Called once at the start of each tick.  Re-reads anything that events have marked as changed,
+        and everything else when it is due for a resync.
+        """
+        for stage in self.begin_tick():
+            for refresh in stage:
+                refresh()
+
+    def resync(self):
+        """
+        Re-read everything from the bot
+        """
+        self._resync_tick = self.tick
+        self.refresh_match_info()
+        self.refresh_inventory()
+        self.refresh_health()
+        self.refresh_flag()
+        self.refresh_players()
+        self.blocks.invalidate()
+
+    def refresh_match_info(self):
+        match_info = self.bot.matchInfo()
+        self.match_info = match_info.valueOf() if match_info else None
+        if not self.match_info:
+            return
+
+        # find out which team I'm on, and who is on the other teams
+        self.my_team_name = self.bot.getMyTeam()
+        players = self.match_info.get('players', [])
+        other_team_names = [t['name'] for t in self.match_info.get('teams', []) if t['name'] != self.my_team_name]
+        self.other_team_name = other_team_names[0] if other_team_names else None
+        self.opponent_names = [p['username'] for p in players if p.get('team') in other_team_names]
+        teammates = [p for p in players if p.get('team') == self.my_team_name and p['username'] != self.username]
+        self.teammate_names = [p['username'] for p in teammates]
+        self.teammate_bot_names = [p['username'] for p in teammates if p.get('isBot')]
+
+    def refresh_inventory(self):
+        self._inventory_dirty = False
+        index = InventoryIndex(list(self.bot.getAllInventoryItems()))
+        self.inventory_index = index
+        self.inventory = index.items
+        self.inventory_names = index.names
+        self.inventory_name_set = index.name_set
+
+    def refresh_health(self):
+        self.health = self.bot.mineflayer().health
+
+    def refresh_flag(self):
+        self.flag_location = point_from_vec3(self.rg_ctf_utils.getFlagLocation())
+        if self.rg_ctf_utils.hasFlag():
+            self.flag_carrier = self.username
+        elif self.flag_location is not None or self.flag_carrier == self.username:
+            self.flag_carrier = None
+        # otherwise someone else is carrying the flag, and only the FLAG_OBTAINED event said who, so keep them until the
+        # events say it was dropped or scored
+
+    def refresh_players(self):
+        # search for everyone we can see, not just those in range, so that we recognize them when they move
+        names = self.opponent_names + self.teammate_names
+        players = {p.name: p for p in find_players(self.bot, names, Point(0, 0, 0), len(names), None)}
+        self._player_ids = {p.entity.id: p.name for p in players.values()}
+        self.players = players
+
+    def inventory_changed(self):
+        """
+        Mark the inventory as changed so that it is re-read next tick, call this after using up an item
+        """
+        self._inventory_dirty = True
+
+    def _track_player(self, entity):
+        name = entity.username
+        if name and name != self.username:
+            snapshot = EntitySnapshot(entity, name, point_from_vec3(entity.position))
+            held_item = entity.heldItem
+            snapshot.held_item_name = held_item.name if held_item else None
+            self.players[name] = snapshot
+            self._player_ids[entity.id] = name
+
+    def _subscribe(self):
+        bot = self.bot
+
+        @RGEventHandler(bot, 'entitySpawn')
+        def entity_spawn(self_, entity, *args):
+            if entity.type == 'player':
+                self._track_player(entity)
+
+        @RGEventHandler(bot, 'entityGone')
+        def entity_gone(self_, entity, *args):
+            name = self._player_ids.pop(entity.id, None)
+            if name:
+                self.players.pop(name, None)
+
+        @RGEventHandler(bot, 'entityMoved')
+        def entity_moved(self_, entity, *args):
+            # this fires constantly, so only look at the id unless it is a player we are tracking
+            name = self._player_ids.get(entity.id)
+            if name and name in self.players:
+                self.players[name].position = point_from_vec3(entity.position)
+
+        @RGEventHandler(bot, 'entityEquip')
+        def entity_equip(self_, entity, *args):
+            name = self._player_ids.get(entity.id)
+            if name and name in self.players:
+                held_item = entity.heldItem
+                self.players[name].held_item_name = held_item.name if held_item else None
+
+        @RGEventHandler(bot, 'playerUpdated')
+        def player_updated(self_, player, *args):
+            entity = player.entity
+            if entity:
+                self._track_player(entity)
+
+        @RGEventHandler(bot, 'playerCollect')
+        def player_collect(self_, collector, collected, *args):
+            if collector.username == self.username:
+                self._inventory_dirty = True
+
+        @RGEventHandler(bot.mineflayer().inventory, 'updateSlot')
+        def update_slot(self_, *args):
+            # an item was picked up, used up, dropped or moved, rebuild the inventory index next tick
+            self._inventory_dirty = True
+
+        @RGEventHandler(bot, 'physicsTick')
+        def physics_tick(self_, *args):
+            self.game_tick += 1
+
+        @RGEventHandler(bot, 'health')
+        def health(self_, *args):
+            self.health = bot.mineflayer().health
+
+        @RGEventHandler(bot, 'spawn')
+        def spawn(self_, *args):
+            # everything about me has been reset
+            self._resync_tick = None
+
+        @RGEventHandler(bot, 'death')
+        def death(self_, *args):
+            self._inventory_dirty = True
+
+        @RGEventHandler(bot, 'match_started')
+        def match_started(self_, *args):
+            self._resync_tick = None
+
+        @RGEventHandler(bot, CTFEvent.FLAG_OBTAINED)
+        def flag_obtained(self_, collector, *args):
+            self.flag_location = None
+            self.flag_carrier = collector
+            if collector == self.username:
+                self._inventory_dirty = True
+
+        @RGEventHandler(bot, CTFEvent.FLAG_SCORED)
+        def flag_scored(self_, team_name, *args):
+            if self.flag_carrier == self.username:
+                self._inventory_dirty = True
+            self.flag_location = None
+            self.flag_carrier = None
+
+        @RGEventHandler(bot, CTFEvent.FLAG_AVAILABLE)
+        def flag_available(self_, position, *args):
+            if self.flag_carrier == self.username:
+                self._inventory_dirty = True
+            self.flag_location = point_from_vec3(position)
+            self.flag_carrier = None